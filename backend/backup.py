@@ -0,0 +1,297 @@
+import os
+import gzip
+import time
+import shutil
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import database as db
+from jobs import get_job_queue, JobQueue, JobContext
+
+logger = logging.getLogger(__name__)
+
+# Pasta dos snapshots (padrão: data/backups, ao lado do banco)
+BACKUP_DIR = os.getenv("BACKUP_DIR") or os.path.join(os.path.dirname(db.DATABASE_PATH), "backups")
+# Intervalo entre backups automáticos (horas) e quantos snapshots manter
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+# Comprimir os snapshots com gzip
+BACKUP_COMPRESS = os.getenv("BACKUP_COMPRESS", "1").lower() not in ("0", "false", "no")
+
+# Páginas copiadas por passo e pausa entre passos: entre um passo e outro o
+# banco fica livre para as escritas da API
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.01
+# Se o banco mudar durante a cópia a API de backup recomeça do início;
+# depois de tantos recomeços copia tudo num único passo (snapshot de leitura)
+MAX_BACKUP_RESTARTS = 3
+# Espera depois de iniciar a API antes do primeiro backup automático (segundos)
+STARTUP_DELAY = 60
+# Tentativas de cada job de backup
+BACKUP_ATTEMPTS = 3
+
+SNAPSHOT_PREFIX = "codequest-"
+# Sufixo da cópia do banco de arquivo que acompanha cada snapshot
+ARCHIVE_SUFFIX = ".archive"
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class BackupManager:
+    # Faz backups online do banco com a API de backup do SQLite, numa thread,
+    # em passos pequenos; guarda os últimos BACKUP_KEEP snapshots. Cada backup
+    # (agendado ou pedido pela API) é um job "backup" da fila
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        database_path: str,
+        archive_path: Optional[str] = None,
+        backup_dir: str = BACKUP_DIR,
+        interval_hours: float = BACKUP_INTERVAL_HOURS,
+        keep: int = BACKUP_KEEP,
+        compress: bool = BACKUP_COMPRESS
+    ):
+        self.database_path = database_path
+        self.archive_path = archive_path
+        self.backup_dir = backup_dir
+        self.interval = timedelta(hours=interval_hours)
+        self.keep = max(1, keep)
+        self.compress = compress
+        self.queue = queue
+        queue.register("backup", self._handle, concurrency=1, max_attempts=BACKUP_ATTEMPTS)
+
+        self.running = False
+        self.progress: Optional[Dict] = None
+        self.last_started_at: Optional[datetime] = None
+        self.last_finished_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_snapshot: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.next_run_at: Optional[datetime] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self._cancelled = threading.Event()
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        if self._task:
+            return
+
+        self._cancelled.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Backup automático iniciado ({self.backup_dir})")
+
+    async def stop(self):
+        if not self._task:
+            return
+
+        # Interrompe uma cópia em andamento no próximo passo
+        self._cancelled.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+        logger.info("Backup automático parado")
+
+    # Enfileira um backup. Retorna (job, criado); não cria outro se já há um
+    # na fila ou rodando
+    async def enqueue(self) -> Tuple[Dict, bool]:
+        return await self.queue.enqueue("backup", dedupe_key="backup")
+
+    async def _handle(self, ctx: JobContext) -> Dict:
+        name = await self.run_backup()
+        if not name:
+            raise RuntimeError(self.last_error or "Backup interrompido")
+        return {"snapshot": name}
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "progress": self.progress,
+            "last_started_at": self.last_started_at,
+            "last_finished_at": self.last_finished_at,
+            "last_duration_seconds": self.last_duration,
+            "last_snapshot": self.last_snapshot,
+            "last_error": self.last_error,
+            "next_run_at": self.next_run_at,
+            "backup_dir": self.backup_dir,
+            "keep": self.keep,
+            "compress": self.compress,
+            "snapshots": self.snapshots()
+        }
+
+    # Snapshots existentes, do mais novo para o mais antigo
+    def snapshots(self) -> List[Dict]:
+        if not os.path.isdir(self.backup_dir):
+            return []
+
+        snapshots = []
+        for name in sorted(os.listdir(self.backup_dir), reverse=True):
+            if not name.startswith(SNAPSHOT_PREFIX) or not name.endswith((".db", ".db.gz")):
+                continue
+            if ARCHIVE_SUFFIX in name:
+                continue
+            stat = os.stat(os.path.join(self.backup_dir, name))
+            snapshots.append({
+                "name": name,
+                "size": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime)
+            })
+        return snapshots
+
+    async def _run(self):
+        # Próximo backup: um intervalo depois do snapshot mais recente
+        snapshots = await asyncio.to_thread(self.snapshots)
+        if snapshots:
+            self.next_run_at = max(
+                snapshots[0]["created_at"] + self.interval,
+                datetime.now() + timedelta(seconds=STARTUP_DELAY)
+            )
+        else:
+            self.next_run_at = datetime.now() + timedelta(seconds=STARTUP_DELAY)
+
+        while True:
+            await asyncio.sleep(max(0.0, (self.next_run_at - datetime.now()).total_seconds()))
+            try:
+                await self.enqueue()
+            except Exception as e:
+                logger.error(f"Erro ao agendar backup: {e}")
+            self.next_run_at = datetime.now() + self.interval
+
+    # Faz um backup agora e retorna o nome do snapshot (None se falhou)
+    async def run_backup(self) -> Optional[str]:
+        async with self._lock:
+            self.running = True
+            self.progress = None
+            self.last_started_at = datetime.now()
+            started = time.perf_counter()
+
+            try:
+                name = await asyncio.to_thread(self._backup)
+                self.last_snapshot = name
+                self.last_error = None
+                logger.info(f"Backup concluído: {name}")
+                return name
+            except BackupCancelled:
+                logger.info("Backup interrompido")
+                return None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Erro no backup: {e}")
+                return None
+            finally:
+                self.running = False
+                self.progress = None
+                self.last_finished_at = datetime.now()
+                self.last_duration = time.perf_counter() - started
+
+    # ================
+    # Executado na thread
+
+    def _backup(self) -> str:
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+        stamp = f"{SNAPSHOT_PREFIX}{datetime.now():%Y%m%d-%H%M%S}"
+        name = self._snapshot(self.database_path, f"{stamp}.db")
+
+        # O banco de arquivo vai junto, com o mesmo carimbo
+        if self.archive_path and os.path.exists(self.archive_path):
+            self._snapshot(self.archive_path, f"{stamp}{ARCHIVE_SUFFIX}.db")
+
+        self._rotate()
+        return name
+
+    # Copia `source` para a pasta de backups como `name` (comprimido se
+    # configurado) e retorna o nome final
+    def _snapshot(self, source: str, name: str) -> str:
+        path = os.path.join(self.backup_dir, name)
+        tmp_path = f"{path}.tmp"
+
+        try:
+            self._copy(source, tmp_path)
+
+            if self.compress:
+                name += ".gz"
+                with open(tmp_path, "rb") as src, gzip.open(f"{path}.gz.tmp", "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.remove(tmp_path)
+                tmp_path = f"{path}.gz.tmp"
+
+            os.replace(tmp_path, os.path.join(self.backup_dir, name))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return name
+
+    # Copia o banco `source` para `path` com a API de backup e confere a cópia
+    def _copy(self, source_path: str, path: str):
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(path)
+        try:
+            restarts = 0
+            last_remaining = None
+
+            def progress(status, remaining, total):
+                nonlocal restarts, last_remaining
+                if self._cancelled.is_set():
+                    raise BackupCancelled()
+
+                # Páginas restantes aumentaram: o banco mudou e a cópia recomeçou
+                if last_remaining is not None and remaining > last_remaining:
+                    restarts += 1
+                    if restarts > MAX_BACKUP_RESTARTS:
+                        raise _TooManyRestarts()
+                last_remaining = remaining
+                self.progress = {"remaining_pages": remaining, "total_pages": total}
+
+            try:
+                source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP)
+            except _TooManyRestarts:
+                # Em WAL um passo único só segura uma leitura: não bloqueia escritas
+                logger.info("Banco mudou durante o backup; copiando em um único passo")
+                source.backup(target, pages=-1)
+
+            # Snapshot autocontido (sem -wal) e íntegro
+            target.execute("PRAGMA journal_mode = DELETE")
+            result = target.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise RuntimeError(f"Snapshot corrompido: {result}")
+        finally:
+            target.close()
+            source.close()
+
+    # Mantém só os `keep` snapshots mais recentes (e suas cópias do arquivo)
+    def _rotate(self):
+        for snapshot in self.snapshots()[self.keep:]:
+            name = snapshot["name"]
+            os.remove(os.path.join(self.backup_dir, name))
+
+            stamp, extension = name.split(".", 1)
+            archive = os.path.join(self.backup_dir, f"{stamp}{ARCHIVE_SUFFIX}.{extension}")
+            if os.path.exists(archive):
+                os.remove(archive)
+
+            logger.info(f"Backup antigo removido: {name}")
+
+
+# Criar uma instância única do gerenciador de backups
+backup_manager = BackupManager(get_job_queue(), db.DATABASE_PATH, db.ARCHIVE_DATABASE_PATH)
+
+
+def get_backup_manager() -> BackupManager:
+    return backup_manager
@@ -0,0 +1,521 @@
+"""
+Benchmarks do backend do CodeQuest.
+
+Sempre rodam sobre um banco temporário (nunca o data/codequest.db real).
+
+Uso:
+    python benchmark.py indexes [--sessions 1000000]
+    python benchmark.py spotify-load [--concurrency 20] [--upstream-delay 2]
+    python benchmark.py music-ingest [--rows 5000] [--batch-size 1000]
+    python benchmark.py completion [--operations 500]
+    python benchmark.py search [--sessions 1000000]
+    python benchmark.py transfer [--sessions 500000]
+    python benchmark.py playlist [--sessions 500000]
+"""
+
+import os
+import time
+import random
+import shutil
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta
+
+# O banco temporário precisa estar definido antes de importar database
+BENCH_DIR = tempfile.mkdtemp(prefix="codequest-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(BENCH_DIR, "data", "codequest.db")
+
+import database as db
+from db_pool import CONNECTION_PRAGMAS, DATABASE_PRAGMAS
+from migrations import run_migrations
+
+
+# ================
+# Helpers
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(db.DATABASE_PATH)
+    for pragma in DATABASE_PRAGMAS + CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+# Nomes de faixa/artista/álbum: "Track N", "Artist N"...
+def _numbered_names(rng: random.Random, track: int) -> tuple:
+    return f"Track {track}", f"Artist {track % 500}", f"Album {track % 2000}"
+
+# Nomes com vocabulário de frequência Zipf, como texto real (para a busca)
+def _vocabulary_names(words: int = 20000):
+    rng = random.Random(7)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(words)]
+    weights = [1 / (i + 1) for i in range(words)]
+    phrase = lambda size: " ".join(rng.choices(vocabulary, weights, k=size))
+    tracks = [phrase(rng.randint(1, 4)) for _ in range(20001)]
+    artists = [phrase(2) for _ in range(500)]
+    albums = [phrase(2) for _ in range(2000)]
+
+    def names(rng: random.Random, track: int) -> tuple:
+        return tracks[track], artists[track % 500], albums[track % 2000]
+
+    names.vocabulary = vocabulary
+    return names
+
+# Popula o banco com quests, checkpoints e sessões de música intercaladas no tempo
+def _populate(conn: sqlite3.Connection, quests: int, checkpoints_per_quest: int, sessions: int, names=_numbered_names):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+
+    conn.executemany(
+        "INSERT INTO quests (title, description, status, created_at) VALUES (?, ?, ?, ?)",
+        (
+            (f"Quest {i}", f"Descrição {i}", rng.choice(["active", "paused", "completed"]),
+             (start + timedelta(hours=i)).isoformat(sep=" "))
+            for i in range(quests)
+        )
+    )
+    conn.executemany(
+        "INSERT INTO checkpoints (quest_id, title, order_index, completed) VALUES (?, ?, ?, ?)",
+        (
+            (q + 1, f"Checkpoint {c}", c + 1, rng.random() < 0.5)
+            for q in range(quests)
+            for c in range(checkpoints_per_quest)
+        )
+    )
+    total_checkpoints = quests * checkpoints_per_quest
+    conn.executemany(
+        "INSERT INTO music_sessions (checkpoint_id, track_name, artist, album, spotify_uri, played_at, duration_ms) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (rng.randint(1, total_checkpoints), *names(rng, t),
+             f"spotify:track:{t}", (start + timedelta(seconds=i * 30)).isoformat(sep=" "),
+             rng.randint(120000, 300000))
+            for i in range(sessions)
+            for t in (rng.randint(0, 20000),)
+        )
+    )
+    conn.commit()
+
+# Executa `fn` algumas vezes e retorna a média em ms
+async def _time_async(fn, *args, repeat: int = 20) -> float:
+    await fn(*args)  # aquecimento
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000
+
+def _print_table(title: str, rows):
+    print(f"\n{title}")
+    print(f"{'consulta':<32}{'antes (ms)':>14}{'depois (ms)':>14}{'ganho':>10}")
+    for name, before, after in rows:
+        gain = before / after if after else float("inf")
+        print(f"{name:<32}{before:>14.2f}{after:>14.2f}{gain:>9.1f}x")
+
+# ================
+# indexes: consultas por quest/checkpoint antes e depois dos índices
+
+async def _index_queries(quest_id: int, checkpoint_id: int) -> dict:
+    return {
+        "get_checkpoints_by_quest": await _time_async(db.get_checkpoints_by_quest, quest_id),
+        "get_music_by_checkpoint": await _time_async(db.get_music_by_checkpoint, checkpoint_id),
+        "get_music_by_quest": await _time_async(db.get_music_by_quest, quest_id),
+        "get_quest_stats": await _time_async(db.get_quest_stats, quest_id),
+    }
+
+def bench_indexes(args):
+    conn = _connect()
+    # Schema sem os índices (migração 3 em diante fica para depois)
+    run_migrations(conn, target=2)
+
+    print(f"Populando {args.sessions} sessões de música em {BENCH_DIR} ...")
+    started = time.perf_counter()
+    _populate(conn, args.quests, args.checkpoints, args.sessions)
+    print(f"Populado em {time.perf_counter() - started:.1f}s")
+
+    quest_id = args.quests // 2
+    checkpoint_id = quest_id * args.checkpoints
+
+    async def measure() -> dict:
+        try:
+            return await _index_queries(quest_id, checkpoint_id)
+        finally:
+            await db.pool.close()
+
+    before = asyncio.run(measure())
+
+    started = time.perf_counter()
+    version = run_migrations(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+    print(f"Migrado para v{version} em {time.perf_counter() - started:.1f}s")
+
+    after = asyncio.run(measure())
+
+    _print_table("Índices secundários", [(name, before[name], after[name]) for name in before])
+
+# ================
+# spotify-load: latência do /health enquanto chamadas ao Spotify estão em andamento
+
+async def _health_latencies(client, samples: int) -> list:
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+async def _spotify_load(args):
+    import httpx
+    from main import app
+    from spotify_service import get_spotify_service, SPOTIFY_API_URL
+
+    spotify = get_spotify_service()
+
+    # Spotify falso: toda chamada demora `upstream_delay` segundos
+    async def slow_upstream(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(args.upstream_delay)
+        return httpx.Response(200, json={"id": "bench", "product": "premium"})
+
+    async def fake_token():
+        return "bench-token"
+
+    spotify._client = httpx.AsyncClient(base_url=SPOTIFY_API_URL, transport=httpx.MockTransport(slow_upstream))
+    spotify.get_access_token = fake_token
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        idle = await _health_latencies(client, args.samples)
+
+        upstream = [asyncio.create_task(client.get("/spotify/user-tier")) for _ in range(args.concurrency)]
+        await asyncio.sleep(0.05)
+        loaded = await _health_latencies(client, args.samples)
+        in_flight = sum(not task.done() for task in upstream)
+
+        await asyncio.gather(*upstream)
+
+    await spotify.close()
+
+    print(f"\n/health com {args.concurrency} chamadas ao Spotify de {args.upstream_delay}s em andamento")
+    print(f"{'':<22}{'p50 (ms)':>10}{'p95 (ms)':>10}{'max (ms)':>10}")
+    for name, values in (("sem carga", idle), ("com carga", loaded)):
+        p95 = statistics.quantiles(values, n=20)[-1]
+        print(f"{name:<22}{statistics.median(values):>10.2f}{p95:>10.2f}{max(values):>10.2f}")
+    print(f"chamadas ainda em andamento ao fim da medição: {in_flight}/{args.concurrency}")
+
+def bench_spotify_load(args):
+    asyncio.run(_spotify_load(args))
+
+# ================
+# music-ingest: músicas/s por POST /music/track vs POST /music/tracks/batch
+
+def _track_payloads(rows: int, checkpoints: int) -> list:
+    return [
+        {
+            "checkpoint_id": i % checkpoints + 1,
+            "track_name": f"Track {i}",
+            "artist": f"Artist {i % 50}",
+            "album": f"Album {i % 200}",
+            "spotify_uri": f"spotify:track:{i}",
+            "duration_ms": 180000
+        }
+        for i in range(rows)
+    ]
+
+async def _music_ingest(args):
+    import httpx
+    from main import app
+
+    conn = _connect()
+    run_migrations(conn)
+    _populate(conn, quests=10, checkpoints_per_quest=args.checkpoints // 10 or 1, sessions=0)
+    conn.close()
+
+    checkpoints = (args.checkpoints // 10 or 1) * 10
+    payloads = _track_payloads(args.rows, checkpoints)
+    results = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        start = time.perf_counter()
+        for payload in payloads:
+            response = await client.post("/music/track", json=payload)
+            response.raise_for_status()
+        results.append(("POST /music/track (1 por vez)", time.perf_counter() - start))
+
+        start = time.perf_counter()
+        for offset in range(0, len(payloads), args.batch_size):
+            response = await client.post("/music/tracks/batch", json={"tracks": payloads[offset:offset + args.batch_size]})
+            response.raise_for_status()
+            assert not response.json()["errors"]
+        results.append((f"POST /music/tracks/batch ({args.batch_size})", time.perf_counter() - start))
+
+    await db.pool.close()
+
+    print(f"\nIngestão de {args.rows} músicas")
+    print(f"{'caminho':<36}{'tempo (s)':>12}{'músicas/s':>14}")
+    for name, elapsed in results:
+        print(f"{name:<36}{elapsed:>12.2f}{args.rows / elapsed:>14.0f}")
+    print(f"ganho: {results[0][1] / results[1][1]:.1f}x")
+
+def bench_music_ingest(args):
+    asyncio.run(_music_ingest(args))
+# ================
+# completion: concluir quest/checkpoint em várias escritas vs numa transação
+
+async def _complete_quest_separately(quest_id: int):
+    await db.get_quest(quest_id)
+    await db.update_quest_status(quest_id, "completed")
+    await db.add_xp(25)
+    await db.increment_quests_completed()
+
+async def _complete_checkpoint_separately(checkpoint_id: int):
+    await db.get_checkpoint(checkpoint_id)
+    await db.complete_checkpoint(checkpoint_id)
+    await db.add_xp(5)
+
+async def _latencies(fn, ids) -> list:
+    latencies = []
+    for item_id in ids:
+        start = time.perf_counter()
+        await fn(item_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+async def _completion(args):
+    conn = _connect()
+    run_migrations(conn)
+    _populate(conn, quests=args.operations * 2, checkpoints_per_quest=1, sessions=0)
+    conn.execute("UPDATE quests SET status = 'active'")
+    conn.execute("UPDATE checkpoints SET completed = 0")
+    conn.commit()
+    conn.close()
+
+    half = args.operations
+    first, second = range(1, half + 1), range(half + 1, 2 * half + 1)
+    # Checkpoints têm o mesmo id da quest (1 por quest)
+    rows = [
+        ("quest", await _latencies(_complete_quest_separately, first), await _latencies(db.complete_quest, second)),
+        ("checkpoint + XP", await _latencies(_complete_checkpoint_separately, first), await _latencies(db.complete_checkpoint_with_xp, second)),
+    ]
+    await db.pool.close()
+
+    print(f"\nConclusão de {args.operations} quests/checkpoints (latência por operação)")
+    print(f"{'operação':<18}{'separado p50':>14}{'p95':>8}{'transação p50':>16}{'p95':>8}")
+    for name, before, after in rows:
+        p95 = lambda values: statistics.quantiles(values, n=20)[-1]
+        print(f"{name:<18}{statistics.median(before):>14.3f}{p95(before):>8.3f}{statistics.median(after):>16.3f}{p95(after):>8.3f}")
+
+def bench_completion(args):
+    asyncio.run(_completion(args))
+# ================
+# search: FTS5 vs LIKE sobre o histórico de músicas
+
+async def _like_search(text: str):
+    pattern = f"%{text}%"
+    async with db.pool.reader() as conn:
+        async with conn.execute(
+            """
+            SELECT * FROM music_sessions
+            WHERE track_name LIKE ? OR artist LIKE ? OR album LIKE ?
+            LIMIT 20
+            """,
+            (pattern, pattern, pattern)
+        ) as cursor:
+            return await cursor.fetchall()
+
+def bench_search(args):
+    conn = _connect()
+    run_migrations(conn, target=6)
+
+    names = _vocabulary_names()
+    print(f"Populando {args.sessions} sessões de música em {BENCH_DIR} ...")
+    _populate(conn, args.quests, args.checkpoints, args.sessions, names=names)
+
+    started = time.perf_counter()
+    run_migrations(conn)
+    conn.close()
+    print(f"Índice FTS5 construído em {time.perf_counter() - started:.1f}s")
+
+    # Palavras do vocabulário por frequência: a 1ª é a mais comum
+    vocabulary = names.vocabulary
+    terms = [
+        ("palavra mais comum", vocabulary[0]),
+        ("palavra frequente", vocabulary[20]),
+        ("palavra rara", vocabulary[5000]),
+        ("duas palavras", f"{vocabulary[1]} {vocabulary[3]}"),
+        ("prefixo", vocabulary[0][:3]),
+    ]
+
+    async def measure():
+        try:
+            return [
+                (name, await _time_async(_like_search, text, repeat=5), await _time_async(db.search, text, repeat=5))
+                for name, text in terms
+            ]
+        finally:
+            await db.pool.close()
+
+    _print_table("Busca: LIKE vs FTS5 (top 20)", asyncio.run(measure()))
+
+    # Músicas: ranking sobre todo o histórico vs janela padrão de candidatos
+    async def measure_window():
+        default = db._SEARCH_QUERIES["music"]
+        rows = []
+        try:
+            for name, text in terms:
+                db._SEARCH_QUERIES["music"] = db._music_query(0)
+                full = await _time_async(db.search, text, ["music"], repeat=5)
+                db._SEARCH_QUERIES["music"] = default
+                rows.append((name, full, await _time_async(db.search, text, ["music"], repeat=5)))
+            return rows
+        finally:
+            db._SEARCH_QUERIES["music"] = default
+            await db.pool.close()
+
+    _print_table(
+        f"Busca de músicas: histórico inteiro vs {db.MUSIC_SEARCH_CANDIDATES} candidatos (padrão)",
+        asyncio.run(measure_window())
+    )
+# ================
+# transfer: throughput e pico de memória do export/import NDJSON
+
+async def _file_chunks(path: str, size: int = 64 * 1024):
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+# Pico de memória (RSS) do processo até agora, em MB
+def _max_rss_mb() -> float:
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def _transfer(args, export_path: str):
+    from transfer import export_ndjson, import_ndjson
+
+    baseline = _max_rss_mb()
+
+    start = time.perf_counter()
+    with open(export_path, "wb") as f:
+        async for chunk in export_ndjson():
+            f.write(chunk)
+    export_time = time.perf_counter() - start
+    export_peak = _max_rss_mb()
+
+    # Importa no mesmo banco (ids remapeados): dobra os dados
+    start = time.perf_counter()
+    result = await import_ndjson(_file_chunks(export_path))
+    import_time = time.perf_counter() - start
+    import_peak = _max_rss_mb()
+
+    await db.pool.close()
+
+    size_mb = os.path.getsize(export_path) / 1024 / 1024
+    print(f"\nArquivo NDJSON: {size_mb:.1f} MB, {args.sessions} sessões ({result['error_count']} erros na importação)")
+    print(f"RSS máximo antes: {baseline:.1f} MB")
+    print(f"{'etapa':<12}{'tempo (s)':>12}{'linhas/s':>12}{'RSS máximo (MB)':>18}")
+    for name, elapsed, peak in (("export", export_time, export_peak), ("import", import_time, import_peak)):
+        print(f"{name:<12}{elapsed:>12.2f}{args.sessions / elapsed:>12.0f}{peak:>18.1f}")
+
+def bench_transfer(args):
+    conn = _connect()
+    run_migrations(conn)
+    print(f"Populando {args.sessions} sessões de música em {BENCH_DIR} ...")
+    _populate(conn, args.quests, args.checkpoints, args.sessions)
+    conn.close()
+
+    asyncio.run(_transfer(args, os.path.join(BENCH_DIR, "export.ndjson")))
+
+# ================
+# playlist: lista de sessões + dedup em Python vs GROUP BY em streaming
+
+async def _playlist_python(quest_id: int) -> int:
+    unique_tracks = {}
+    for session in await db.get_music_by_quest(quest_id):
+        unique_tracks.setdefault(session["spotify_uri"], session)
+    return len(unique_tracks)
+
+async def _playlist_sql(quest_id: int) -> int:
+    tracks = 0
+    async for batch in db.stream_quest_playlist(quest_id):
+        tracks += len(batch)
+    return tracks
+
+def bench_playlist(args):
+    conn = _connect()
+    run_migrations(conn)
+    print(f"Populando {args.sessions} sessões de música em {args.quests} quest(s) ...")
+    _populate(conn, args.quests, args.checkpoints, args.sessions)
+    conn.close()
+
+    async def measure():
+        try:
+            results = []
+            for name, fn in (("lista + dedup em Python", _playlist_python), ("GROUP BY em streaming", _playlist_sql)):
+                elapsed = await _time_async(fn, 1, repeat=3)
+                tracemalloc.start()
+                tracks = await fn(1)
+                peak = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+                results.append((name, elapsed, peak, tracks))
+            return results
+        finally:
+            await db.pool.close()
+
+    print(f"\n{'playlist da quest 1':<28}{'tempo (ms)':>12}{'pico heap (MB)':>16}{'faixas':>10}")
+    for name, elapsed, peak, tracks in asyncio.run(measure()):
+        print(f"{name:<28}{elapsed:>12.1f}{peak:>16.1f}{tracks:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do backend do CodeQuest")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    indexes = commands.add_parser("indexes", help="consultas antes/depois dos índices secundários")
+    indexes.add_argument("--sessions", type=int, default=1_000_000)
+    indexes.add_argument("--quests", type=int, default=1000)
+    indexes.add_argument("--checkpoints", type=int, default=10)
+    indexes.set_defaults(run=bench_indexes)
+
+    spotify_load = commands.add_parser("spotify-load", help="latência do /health com chamadas lentas ao Spotify")
+    spotify_load.add_argument("--concurrency", type=int, default=20)
+    spotify_load.add_argument("--upstream-delay", type=float, default=2.0)
+    spotify_load.add_argument("--samples", type=int, default=200)
+    spotify_load.set_defaults(run=bench_spotify_load)
+
+    music_ingest = commands.add_parser("music-ingest", help="músicas/s pelo endpoint unitário vs em lote")
+    music_ingest.add_argument("--rows", type=int, default=5000)
+    music_ingest.add_argument("--batch-size", type=int, default=1000)
+    music_ingest.add_argument("--checkpoints", type=int, default=100)
+    music_ingest.set_defaults(run=bench_music_ingest)
+
+    completion = commands.add_parser("completion", help="latência de concluir quest/checkpoint")
+    completion.add_argument("--operations", type=int, default=500)
+    completion.set_defaults(run=bench_completion)
+
+    search = commands.add_parser("search", help="busca FTS5 vs LIKE no histórico de músicas")
+    search.add_argument("--sessions", type=int, default=1_000_000)
+    search.add_argument("--quests", type=int, default=1000)
+    search.add_argument("--checkpoints", type=int, default=10)
+    search.set_defaults(run=bench_search)
+
+    transfer = commands.add_parser("transfer", help="export/import NDJSON: throughput e memória")
+    transfer.add_argument("--sessions", type=int, default=500_000)
+    transfer.add_argument("--quests", type=int, default=1000)
+    transfer.add_argument("--checkpoints", type=int, default=10)
+    transfer.set_defaults(run=bench_transfer)
+
+    playlist = commands.add_parser("playlist", help="playlist da quest: dedup em Python vs GROUP BY")
+    playlist.add_argument("--sessions", type=int, default=500_000)
+    playlist.add_argument("--quests", type=int, default=5)
+    playlist.add_argument("--checkpoints", type=int, default=10)
+    playlist.set_defaults(run=bench_playlist)
+
+    args = parser.parse_args()
+    try:
+        args.run(args)
+    finally:
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
+import re
+import json
 import sqlite3
-import aiosqlite
+import base64
 import logging
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from models import Quest, Checkpoint, MusicSession
+from db_pool import ConnectionPool, CONNECTION_PRAGMAS, DATABASE_PRAGMAS
+from migrations import run_migrations, recount_counters, rebuild_listening_rollups, create_archive_schema
+from leveling import SQL_FUNCTIONS, CHECKPOINT_XP, QUEST_XP
+from metrics import instrument_module
 
 import os
 import sys
 
+logger = logging.getLogger(__name__)
+
 # Detectar caminho portátil
 if getattr(sys, 'frozen', False):
     # Executável PyInstaller
@@ -22,147 +30,195 @@ DATABASE_PATH = os.getenv('DATABASE_PATH') or os.path.join(base_path, 'data', 'c
 # Garantir que a pasta existe
 os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
 
-print(f"[Database] Usando caminho: {DATABASE_PATH}")
+# Banco de arquivo (quests antigas), anexado como `archive` em todas as conexões
+ARCHIVE_DATABASE_PATH = os.getenv('ARCHIVE_DATABASE_PATH') or os.path.join(
+    os.path.dirname(DATABASE_PATH), 'codequest-archive.db'
+)
 
 
 def init_db():
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
 
-    # Tabela QUESTS
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS quests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            status TEXT DEFAULT 'active',
-            is_syncing INTEGER DEFAULT 0,
-            loot_retrieved INTEGER DEFAULT 0
-        )
-    """)
+    # WAL: leitores não bloqueiam enquanto o tracking de músicas escreve
+    for pragma in DATABASE_PRAGMAS + CONNECTION_PRAGMAS:
+        cursor.execute(pragma)
 
-    # Migração: Adicionar coluna is_syncing se não existir
-    try:
-        cursor.execute("ALTER TABLE quests ADD COLUMN is_syncing INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass # Coluna já existe
-    
-    # Migração: Adicionar coluna loot_retrieved se não existir
-    try:
-        cursor.execute("ALTER TABLE quests ADD COLUMN loot_retrieved INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass # Coluna já existe
-    
-    # Tabela CHECKPOINTS
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS checkpoints (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            quest_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            order_index INTEGER NOT NULL,
-            completed BOOLEAN DEFAULT 0,
-            completed_at TIMESTAMP,
-            FOREIGN KEY (quest_id) REFERENCES quests(id) ON DELETE CASCADE
-        )
-    """)
-    
-    # Tabela MUSIC_SESSIONS
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS music_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            checkpoint_id INTEGER NOT NULL,
-            track_name TEXT NOT NULL,
-            artist TEXT NOT NULL,
-            album TEXT,
-            spotify_uri TEXT NOT NULL,
-            played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            duration_ms INTEGER,
-            FOREIGN KEY (checkpoint_id) REFERENCES checkpoints(id) ON DELETE CASCADE
-        )
-    """)
-    
-    # Tabela USER_STATS
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_stats (
-            id INTEGER PRIMARY KEY DEFAULT 1,
-            level INTEGER DEFAULT 1,
-            xp INTEGER DEFAULT 0,
-            xp_to_next_level INTEGER DEFAULT 50,
-            quests_completed INTEGER DEFAULT 0
-        )
-    """)
-    
-    # Migração: user_stats columns
-    try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN xp_to_next_level INTEGER DEFAULT 50")
-    except sqlite3.OperationalError:
-        pass 
+    # Banco de arquivo (também em WAL), anexado antes das migrações: algumas
+    # também alteram o arquivo
+    cursor.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DATABASE_PATH,))
+    # (lê o resultado: um statement aberto impede o COMMIT das migrações)
+    cursor.execute("PRAGMA archive.journal_mode = WAL").fetchone()
 
-    try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN quests_completed INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass
+    # Cria/atualiza as tabelas pelas migrações versionadas
+    version = run_migrations(conn)
 
-    # Inicializa user stats se não existir
-    cursor.execute("INSERT OR IGNORE INTO user_stats (id, level, xp, xp_to_next_level, quests_completed) VALUES (1, 1, 0, 50, 0)")
-    
+    create_archive_schema(cursor)
     conn.commit()
+
     conn.close()
-    logging.info("Database inicializado com sucesso!")
+    logger.info(f"Database inicializado com sucesso! (schema v{version}, {DATABASE_PATH})")
+
+# Confere os contadores materializados contra as tabelas e corrige
+# divergências; os rollups de escuta (das quests não arquivadas) são
+# reconstruídos do zero
+def repair_counters() -> int:
+    conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DATABASE_PATH,))
+        create_archive_schema(cursor)
+
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            fixed = recount_counters(cursor, with_archive=True)
+            rebuild_listening_rollups(cursor)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    logger.info(f"Contadores verificados: {fixed} valor(es) corrigido(s)")
+    return fixed
+
+# Pool de conexões compartilhado (aberto no lifespan do main.py)
+pool = ConnectionPool(
+    DATABASE_PATH,
+    readers=int(os.getenv('DATABASE_READERS', '4')),
+    functions=SQL_FUNCTIONS,
+    attach={"archive": ARCHIVE_DATABASE_PATH}
+)
 
 # ================
 # QUESTS
 
-# Criar uma nova quest e retornar seu ID
-async def create_quest(title: str, description: Optional[str] = None) -> int:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+# Criar uma nova quest (com os checkpoints, se vierem) e retornar seu ID
+async def create_quest(title: str, description: Optional[str] = None, checkpoints: Optional[List[str]] = None) -> int:
+    async with pool.writer() as db:
         cursor = await db.execute(
             "INSERT INTO quests (title, description, status) VALUES (?, ?, ?)",
             (title, description, "active")
-        
         )
-        await db.commit()
+        quest_id = cursor.lastrowid
 
-        return cursor.lastrowid
+        if checkpoints:
+            await db.executemany(
+                "INSERT INTO checkpoints (quest_id, title, order_index) VALUES (?, ?, ?)",
+                [(quest_id, checkpoint_title, index + 1) for index, checkpoint_title in enumerate(checkpoints)]
+            )
+
+        return quest_id
     
-# Obter uma quest pelo ID
-async def get_quest(quest_id: int) -> Optional[Quest]:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        cursor = await db.execute(
+# Obter uma quest pelo ID (procura também no arquivo se include_archived)
+async def get_quest(quest_id: int, include_archived: bool = False) -> Optional[Quest]:
+    async with pool.reader() as db:
+        async with db.execute(
             "SELECT * FROM quests WHERE id = ?",
             (quest_id,)
-        )
-        row = await cursor.fetchone()
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        if not row and include_archived:
+            async with db.execute(
+                "SELECT *, 1 AS archived FROM archive.quests WHERE id = ?",
+                (quest_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
 
         return dict(row) if row else None
     
 # Listar todas as quests
 async def get_all_quests() -> List[dict]:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        cursor = await db.execute("SELECT * FROM quests ORDER BY created_at DESC")
-        rows = await cursor.fetchall()
+    async with pool.reader() as db:
+        async with db.execute("SELECT * FROM quests ORDER BY created_at DESC") as cursor:
+            rows = await cursor.fetchall()
 
         return [dict(row) for row in rows]
     
+# Cursor opaco da paginação: posição (created_at, id) da última quest da página
+def _encode_cursor(created_at: str, quest_id: int) -> str:
+    raw = f"{created_at}|{quest_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        created_at, quest_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return created_at, int(quest_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+
+# Listar quests por página (mais recentes primeiro), opcionalmente filtrando por status
+async def get_quests_page(
+        statuses: Optional[List[str]] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    conditions = []
+    params = []
+
+    if statuses:
+        conditions.append(f"status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+
+    if cursor:
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    async with pool.reader() as db:
+        # Busca um item a mais para saber se existe próxima página
+        async with db.execute(
+            f"SELECT * FROM quests {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            (*params, limit + 1)
+        ) as db_cursor:
+            rows = await db_cursor.fetchall()
+
+    quests = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = quests[-1]
+        next_cursor = _encode_cursor(last["created_at"], last["id"])
+
+    return quests, next_cursor
+
 # Atualizar o status de uma quest
 async def update_quest_status(quest_id: int, status: str) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         completed_at = datetime.now().isoformat() if status == "completed" else None
-        await db.execute(
+        cursor = await db.execute(
             "UPDATE quests SET status = ?, completed_at = ? WHERE id = ?",
             (status, completed_at, quest_id)
         )
-        await db.commit()
 
-        return True
+        return cursor.rowcount > 0
+
+# Conclui a quest, dá o XP e conta a conclusão numa única transação.
+# Idempotente: se já estava concluída não altera nada. None se não existe
+async def complete_quest(quest_id: int) -> Optional[dict]:
+    async with pool.writer() as db:
+        async with db.execute(
+            "UPDATE quests SET status = 'completed', completed_at = ? WHERE id = ? AND status IS NOT 'completed' RETURNING id",
+            (datetime.now().isoformat(), quest_id)
+        ) as cursor:
+            updated = await cursor.fetchone()
+
+        if not updated:
+            async with db.execute("SELECT 1 FROM quests WHERE id = ?", (quest_id,)) as cursor:
+                exists = await cursor.fetchone()
+            return {"already_completed": True, "xp": None} if exists else None
+
+        xp = await _award_xp(db, QUEST_XP, quests_completed=1)
+        return {"already_completed": False, "xp": xp}
 
 # Atualizar o estado de sync de uma quest
 async def update_quest_sync(quest_id: int, is_syncing: bool) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         sync_val = 1 if is_syncing else 0
         
         # Se estamos ativando o sync, desativamos todos os outros (apenas 1 sync por vez)
@@ -173,41 +229,45 @@ async def update_quest_sync(quest_id: int, is_syncing: bool) -> bool:
             "UPDATE quests SET is_syncing = ? WHERE id = ?",
             (sync_val, quest_id)
         )
-        await db.commit()
         return True
 
+# Quest com sync ativo (no máximo uma)
+async def get_syncing_quest() -> Optional[dict]:
+    async with pool.reader() as db:
+        async with db.execute("SELECT * FROM quests WHERE is_syncing = 1 LIMIT 1") as cursor:
+            row = await cursor.fetchone()
+
+        return dict(row) if row else None
+
 # Atualizar o estado de loot_retrieved de uma quest
 async def update_quest_loot_retrieved(quest_id: int, retrieved: bool) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         val = 1 if retrieved else 0
         await db.execute(
             "UPDATE quests SET loot_retrieved = ? WHERE id = ?",
             (val, quest_id)
         )
-        await db.commit()
         return True
 
 # Deleta uma quest e seus checkpoints associados
 async def delete_quest(quest_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         await db.execute(
             "DELETE FROM quests WHERE id = ?",
             (quest_id,)
         )
-        await db.commit()
 
         return True
 
 # Atualizar uma quest (título/descrição)
 async def update_quest(quest_id: int, title: str = None, description: str = None) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         if title is not None and description is not None:
             await db.execute("UPDATE quests SET title = ?, description = ? WHERE id = ?", (title, description, quest_id))
         elif title is not None:
             await db.execute("UPDATE quests SET title = ? WHERE id = ?", (title, quest_id))
         elif description is not None:
             await db.execute("UPDATE quests SET description = ? WHERE id = ?", (description, quest_id))
-        await db.commit()
         return True
 
 # ================
@@ -215,68 +275,146 @@ async def update_quest(quest_id: int, title: str = None, description: str = None
 
 # Criar novo checkpoint e retornar seu ID
 async def create_checkpoint(quest_id: int, title: str, order_index: int) -> int:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         cursor = await db.execute(
             "INSERT INTO checkpoints (quest_id, title, order_index) VALUES (?, ?, ?)",
             (quest_id, title, order_index)
         )
-        await db.commit()
-
-        await db.commit()
 
         return cursor.lastrowid
 
 # Atualizar um checkpoint
 async def update_checkpoint(checkpoint_id: int, title: str = None, order_index: int = None) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         if title is not None and order_index is not None:
             await db.execute("UPDATE checkpoints SET title = ?, order_index = ? WHERE id = ?", (title, order_index, checkpoint_id))
         elif title is not None:
             await db.execute("UPDATE checkpoints SET title = ? WHERE id = ?", (title, checkpoint_id))
         elif order_index is not None:
             await db.execute("UPDATE checkpoints SET order_index = ? WHERE id = ?", (order_index, checkpoint_id))
-        await db.commit()
         return True
 
 # Deletar um checkpoint
 async def delete_checkpoint(checkpoint_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         await db.execute("DELETE FROM checkpoints WHERE id = ?", (checkpoint_id,))
-        await db.commit()
         return True
 
-# Obter checkpoints de uma quest
-async def get_checkpoints_by_quest(quest_id: int) -> List[dict]:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        cursor = await db.execute(
-            "SELECT * FROM checkpoints WHERE quest_id = ? ORDER BY order_index",
+# Obter checkpoints de uma quest (archived: lê do banco de arquivo)
+async def get_checkpoints_by_quest(quest_id: int, archived: bool = False) -> List[dict]:
+    schema = "archive" if archived else "main"
+    async with pool.reader() as db:
+        async with db.execute(
+            f"SELECT * FROM {schema}.checkpoints WHERE quest_id = ? ORDER BY order_index",
             (quest_id,)
-        )
-        rows = await cursor.fetchall()
+        ) as cursor:
+            rows = await cursor.fetchall()
         
         return [dict(row) for row in rows]
     
 # Checkpoint completo
 async def complete_checkpoint(checkpoint_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         await db.execute(
             "UPDATE checkpoints SET completed = 1, completed_at = ? WHERE id = ?",
             (datetime.now().isoformat(), checkpoint_id)
         )
-        await db.commit()
 
         return True
     
+# Conclui o checkpoint e dá o XP numa única transação. Idempotente como
+# complete_quest; None se o checkpoint não existe
+async def complete_checkpoint_with_xp(checkpoint_id: int) -> Optional[dict]:
+    async with pool.writer() as db:
+        async with db.execute(
+            "UPDATE checkpoints SET completed = 1, completed_at = ? WHERE id = ? AND IFNULL(completed, 0) = 0 RETURNING quest_id, completed_at",
+            (datetime.now().isoformat(), checkpoint_id)
+        ) as cursor:
+            updated = await cursor.fetchone()
+
+        if not updated:
+            async with db.execute("SELECT quest_id FROM checkpoints WHERE id = ?", (checkpoint_id,)) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                return None
+            return {"quest_id": row["quest_id"], "already_completed": True, "completed_at": None, "xp": None}
+
+        xp = await _award_xp(db, CHECKPOINT_XP)
+        return {
+            "quest_id": updated["quest_id"],
+            "already_completed": False,
+            "completed_at": updated["completed_at"],
+            "xp": xp
+        }
+
+# Aplica a lista completa de checkpoints de uma quest numa única transação:
+# renomeia/reordena os existentes, cria os novos e remove os ausentes.
+# Retorna a lista final (None se a quest não existe)
+async def replace_checkpoints(quest_id: int, checkpoints: List[dict]) -> Optional[List[dict]]:
+    async with pool.writer() as db:
+        async with db.execute("SELECT 1 FROM quests WHERE id = ?", (quest_id,)) as cursor:
+            if not await cursor.fetchone():
+                return None
+
+        async with db.execute("SELECT id FROM checkpoints WHERE quest_id = ?", (quest_id,)) as cursor:
+            existing = {row["id"] for row in await cursor.fetchall()}
+
+        kept = [checkpoint["id"] for checkpoint in checkpoints if checkpoint.get("id") is not None]
+        if len(kept) != len(set(kept)):
+            raise ValueError("Checkpoint repetido na lista")
+        unknown = set(kept) - existing
+        if unknown:
+            raise ValueError(f"Checkpoint não pertence à quest: {sorted(unknown)}")
+
+        removed = existing - set(kept)
+        if removed:
+            await db.executemany(
+                "DELETE FROM checkpoints WHERE id = ?",
+                [(checkpoint_id,) for checkpoint_id in removed]
+            )
+
+        await db.executemany(
+            "UPDATE checkpoints SET title = ?, order_index = ? WHERE id = ?",
+            [
+                (checkpoint["title"], index + 1, checkpoint["id"])
+                for index, checkpoint in enumerate(checkpoints)
+                if checkpoint.get("id") is not None
+            ]
+        )
+        await db.executemany(
+            "INSERT INTO checkpoints (quest_id, title, order_index) VALUES (?, ?, ?)",
+            [
+                (quest_id, checkpoint["title"], index + 1)
+                for index, checkpoint in enumerate(checkpoints)
+                if checkpoint.get("id") is None
+            ]
+        )
+
+        async with db.execute(
+            "SELECT * FROM checkpoints WHERE quest_id = ? ORDER BY order_index",
+            (quest_id,)
+        ) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
 # Busca checkpoint pelo ID
 async def get_checkpoint(checkpoint_id: int) -> Optional[dict]:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        cursor = await db.execute(
+    async with pool.reader() as db:
+        async with db.execute(
             "SELECT * FROM checkpoints WHERE id = ?",
             (checkpoint_id,)
-        )
-        row = await cursor.fetchone()
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        return dict(row) if row else None
+    
+# Primeiro checkpoint ainda não completo de uma quest
+async def get_active_checkpoint(quest_id: int) -> Optional[dict]:
+    async with pool.reader() as db:
+        async with db.execute(
+            "SELECT * FROM checkpoints WHERE quest_id = ? AND NOT completed ORDER BY order_index LIMIT 1",
+            (quest_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
 
         return dict(row) if row else None
     
@@ -292,147 +430,952 @@ async def create_music_session(
         spotify_uri: str,
         duration_ms: int
 ) -> int:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         cursor = await db.execute(
             "INSERT INTO music_sessions (checkpoint_id, track_name, artist, album, spotify_uri, duration_ms) VALUES (?, ?, ?, ?, ?, ?)",
             (checkpoint_id, track_name, artist, album, spotify_uri, duration_ms)
         )
-        await db.commit()
 
         return cursor.lastrowid
     
+# Mesmo formato do CURRENT_TIMESTAMP (UTC), para ordenar junto com as demais
+def _format_played_at(played_at: Optional[datetime]) -> Optional[str]:
+    if played_at is None:
+        return None
+    if played_at.tzinfo:
+        played_at = played_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return played_at.isoformat(sep=" ", timespec="seconds")
+
+# Registra várias músicas numa única transação. Retorna os ids inseridos na
+# ordem recebida e, por índice, as que foram recusadas
+async def create_music_sessions(sessions: List[dict]) -> Tuple[List[Tuple[int, int, int]], Dict[int, str]]:
+    async with pool.writer() as db:
+        # Valida todos os checkpoints de uma vez
+        checkpoint_ids = sorted({session["checkpoint_id"] for session in sessions})
+        async with db.execute(
+            "SELECT id, quest_id FROM checkpoints WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(checkpoint_ids),)
+        ) as cursor:
+            quest_by_checkpoint = {row["id"]: row["quest_id"] for row in await cursor.fetchall()}
+
+        rows = []
+        accepted = []
+        errors = {}
+        for index, session in enumerate(sessions):
+            if session["checkpoint_id"] not in quest_by_checkpoint:
+                errors[index] = "Checkpoint não encontrado"
+                continue
+
+            accepted.append(index)
+            rows.append((
+                session["checkpoint_id"],
+                session["track_name"],
+                session["artist"],
+                session.get("album") or "",
+                session["spotify_uri"],
+                _format_played_at(session.get("played_at")),
+                session["duration_ms"]
+            ))
+
+        if not rows:
+            return [], errors
+
+        new_ids = await _insert_many(
+            db,
+            "INSERT INTO music_sessions (checkpoint_id, track_name, artist, album, spotify_uri, played_at, duration_ms) VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)",
+            rows
+        )
+
+        inserted = [
+            (index, session_id, quest_by_checkpoint[sessions[index]["checkpoint_id"]])
+            for session_id, index in zip(new_ids, accepted)
+        ]
+        return inserted, errors
+
 # Obtem todas as musicas do checkpoint
 async def get_music_by_checkpoint(checkpoint_id: int) -> List[dict]:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        cursor = await db.execute(
+    async with pool.reader() as db:
+        async with db.execute(
             "SELECT * FROM music_sessions WHERE checkpoint_id = ? ORDER BY played_at",
             (checkpoint_id,)
-        )
-        rows = await cursor.fetchall()
+        ) as cursor:
+            rows = await cursor.fetchall()
 
         return [dict(row) for row in rows]
 
-# Obtem todas as musicas de uma quest
-async def get_music_by_quest(quest_id: int) -> List[dict]:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        cursor = await db.execute(
-            """SELECT m.* FROM music_sessions m
-            JOIN checkpoints c ON m.checkpoint_id = c.id
+# Obtem todas as musicas de uma quest (archived: lê do banco de arquivo)
+async def get_music_by_quest(quest_id: int, archived: bool = False) -> List[dict]:
+    schema = "archive" if archived else "main"
+    async with pool.reader() as db:
+        async with db.execute(
+            f"""SELECT m.* FROM {schema}.music_sessions m
+            JOIN {schema}.checkpoints c ON m.checkpoint_id = c.id
             WHERE c.quest_id = ?
             ORDER BY m.played_at""",
             (quest_id,)
-        )
-        rows = await cursor.fetchall()
+        ) as cursor:
+            rows = await cursor.fetchall()
 
         return [dict(row) for row in rows]
 
-# ================
-# STATS
+# Faixas agregadas por página ao gerar a playlist. Cada página refaz o GROUP
+# BY da quest inteira (~0,4 s para 100 mil sessões), então páginas grandes
+# significam menos passadas; o leitor do pool só fica preso durante uma
+PLAYLIST_PAGE_SIZE = 5000
 
-# Retorna estatísticas de uma quest
-async def get_quest_stats(quest_id: int) -> dict:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
+# Faixas únicas de uma quest, agregadas no SQL (uma linha por spotify_uri),
+# na ordem em que foram ouvidas pela primeira vez. Gera lotes de linhas para
+# a resposta ser enviada em streaming sem montar a lista inteira. Cada lote
+# é uma consulta com o leitor emprestado só durante ela (um cliente lento
+# não segura a conexão); a página seguinte continua depois da última faixa
+async def stream_quest_playlist(
+    quest_id: int,
+    archived: bool = False,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> AsyncIterator[List[dict]]:
+    schema = "archive" if archived else "main"
+    remaining = limit
+    after = None
 
-        # Total de checkpoints
-        cursor = await db.execute(
-            "SELECT COUNT(*) as total FROM checkpoints WHERE quest_id = ?",
+    while remaining is None or remaining > 0:
+        size = PLAYLIST_PAGE_SIZE if remaining is None else min(PLAYLIST_PAGE_SIZE, remaining)
+        # (checkpoints também tem first_played_at: no HAVING vai o MIN explícito)
+        having = "HAVING (MIN(m.played_at), m.spotify_uri) > (?, ?)" if after else ""
+        async with pool.reader() as db:
+            async with db.execute(
+                f"""
+                SELECT m.spotify_uri, MAX(m.track_name) AS track_name, MAX(m.artist) AS artist,
+                       MAX(m.album) AS album, COUNT(*) AS play_count,
+                       MIN(m.played_at) AS first_played_at, MAX(m.played_at) AS last_played_at,
+                       COALESCE(SUM(m.duration_ms), 0) AS listened_ms
+                FROM {schema}.checkpoints c
+                JOIN {schema}.music_sessions m ON m.checkpoint_id = c.id
+                WHERE c.quest_id = ?
+                GROUP BY m.spotify_uri
+                {having}
+                ORDER BY first_played_at, m.spotify_uri
+                LIMIT ? OFFSET ?
+                """,
+                (quest_id, *(after or ()), size, 0 if after else offset)
+            ) as cursor:
+                rows = [dict(row) for row in await cursor.fetchall()]
+
+        if rows:
+            yield rows
+        if len(rows) < size:
+            break
+
+        if remaining is not None:
+            remaining -= len(rows)
+        after = (rows[-1]["first_played_at"], rows[-1]["spotify_uri"])
+
+# Quantidade de faixas diferentes ouvidas numa quest
+async def count_quest_unique_tracks(quest_id: int, archived: bool = False) -> int:
+    schema = "archive" if archived else "main"
+    async with pool.reader() as db:
+        async with db.execute(
+            f"""
+            SELECT COUNT(DISTINCT m.spotify_uri)
+            FROM {schema}.checkpoints c
+            JOIN {schema}.music_sessions m ON m.checkpoint_id = c.id
+            WHERE c.quest_id = ?
+            """,
+            (quest_id,)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+# ================
+# SYNC DA PLAYLIST DO SPOTIFY (ver playlist_sync.py)
+#
+# quests.spotify_playlist_id guarda a playlist da quest; playlist_tracks, as
+# faixas já enviadas; playlist_synced_session_id, até qual sessão o último
+# sync completo conferiu
+
+# Playlist da quest e posição do sync (None se a quest não existe)
+async def get_playlist_sync_state(quest_id: int) -> Optional[dict]:
+    async with pool.reader() as db:
+        async with db.execute(
+            """
+            SELECT id, title, spotify_playlist_id, spotify_playlist_url, spotify_snapshot_id,
+                   playlist_synced_session_id,
+                   (SELECT COUNT(*) FROM playlist_tracks p WHERE p.quest_id = quests.id) AS pushed_tracks
+            FROM quests WHERE id = ?
+            """,
             (quest_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        return dict(row) if row else None
+
+# Faixas da quest que ainda não estão na playlist, na ordem em que foram
+# ouvidas, olhando só as sessões depois de `after_session_id`. Retorna também
+# o id da última sessão considerada (novo cursor quando o sync terminar)
+async def get_pending_playlist_tracks(quest_id: int, after_session_id: int) -> Tuple[List[str], int]:
+    async with pool.reader() as db:
+        # Limite fixado antes: sessões gravadas durante a leitura ficam para o próximo sync
+        async with db.execute(
+            """
+            SELECT COALESCE(MAX(m.id), ?) FROM checkpoints c
+            JOIN music_sessions m ON m.checkpoint_id = c.id
+            WHERE c.quest_id = ? AND m.id > ?
+            """,
+            (after_session_id, quest_id, after_session_id)
+        ) as cursor:
+            until_session_id = (await cursor.fetchone())[0]
+
+        async with db.execute(
+            """
+            SELECT m.spotify_uri, MIN(m.id) AS first_session_id
+            FROM checkpoints c
+            JOIN music_sessions m ON m.checkpoint_id = c.id
+            WHERE c.quest_id = :quest_id AND m.id > :after AND m.id <= :until
+              AND m.spotify_uri NOT IN (SELECT spotify_uri FROM playlist_tracks WHERE quest_id = :quest_id)
+            GROUP BY m.spotify_uri
+            ORDER BY first_session_id
+            """,
+            {"quest_id": quest_id, "after": after_session_id, "until": until_session_id}
+        ) as cursor:
+            uris = [row[0] for row in await cursor.fetchall()]
+
+        return uris, until_session_id
+
+async def set_quest_playlist(quest_id: int, playlist_id: str, playlist_url: Optional[str]):
+    async with pool.writer() as db:
+        await db.execute(
+            "UPDATE quests SET spotify_playlist_id = ?, spotify_playlist_url = ? WHERE id = ?",
+            (playlist_id, playlist_url, quest_id)
         )
-        total = (await cursor.fetchone())["total"]
 
-        # Checkpoints completos
-        cursor = await db.execute(
-            "SELECT COUNT(*) as completed FROM checkpoints WHERE quest_id = ? AND completed = 1",
+# Registra um lote enviado ao Spotify e o snapshot da playlist depois dele
+async def mark_playlist_tracks_pushed(quest_id: int, uris: List[str], snapshot_id: Optional[str]):
+    async with pool.writer() as db:
+        await db.executemany(
+            "INSERT OR IGNORE INTO playlist_tracks (quest_id, spotify_uri) VALUES (?, ?)",
+            [(quest_id, uri) for uri in uris]
+        )
+        await db.execute(
+            "UPDATE quests SET spotify_snapshot_id = COALESCE(?, spotify_snapshot_id) WHERE id = ?",
+            (snapshot_id, quest_id)
+        )
+
+async def advance_playlist_cursor(quest_id: int, session_id: int):
+    async with pool.writer() as db:
+        await db.execute(
+            "UPDATE quests SET playlist_synced_session_id = MAX(playlist_synced_session_id, ?) WHERE id = ?",
+            (session_id, quest_id)
+        )
+
+# Esquece a playlist (ex.: removida no Spotify); o próximo sync cria outra
+async def reset_quest_playlist(quest_id: int):
+    async with pool.writer() as db:
+        await db.execute(
+            """
+            UPDATE quests SET spotify_playlist_id = NULL, spotify_playlist_url = NULL,
+                spotify_snapshot_id = NULL, playlist_synced_session_id = 0
+            WHERE id = ?
+            """,
             (quest_id,)
         )
-        completed = (await cursor.fetchone())["completed"]
+        await db.execute("DELETE FROM playlist_tracks WHERE quest_id = ?", (quest_id,))
 
-        # Musicas tocadas
+# ================
+# JOBS (fila persistente, ver jobs.py)
+
+_JOB_JSON_FIELDS = ("payload", "state", "progress", "result")
+
+def _job(row) -> dict:
+    job = dict(row)
+    for field in _JOB_JSON_FIELDS:
+        if job[field] is not None:
+            job[field] = json.loads(job[field])
+    return job
+
+def _json_or_none(value) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False, default=str)
+
+# Enfileira um job. Com dedupe_key, se já existe um ativo (na fila ou
+# rodando) com a mesma chave, retorna ele. Retorna (job, criado)
+async def enqueue_job(
+    job_type: str,
+    payload: Optional[dict] = None,
+    max_attempts: int = 3,
+    dedupe_key: Optional[str] = None
+) -> Tuple[dict, bool]:
+    async with pool.writer() as db:
+        if dedupe_key:
+            async with db.execute(
+                "SELECT * FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')",
+                (dedupe_key,)
+            ) as cursor:
+                existing = await cursor.fetchone()
+            if existing:
+                return _job(existing), False
+
+        async with db.execute(
+            "INSERT INTO jobs (type, payload, max_attempts, dedupe_key) VALUES (?, ?, ?, ?) RETURNING *",
+            (job_type, json.dumps(payload or {}, ensure_ascii=False), max_attempts, dedupe_key)
+        ) as cursor:
+            return _job(await cursor.fetchone()), True
+
+# Pega o próximo job pronto de um dos tipos e marca como rodando
+async def claim_job(job_types: List[str]) -> Optional[dict]:
+    async with pool.writer() as db:
+        async with db.execute(
+            """
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = datetime('now')
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE status = 'queued' AND run_at <= datetime('now')
+                  AND type IN (SELECT value FROM json_each(?))
+                ORDER BY run_at, id
+                LIMIT 1
+            )
+            RETURNING *
+            """,
+            (json.dumps(job_types),)
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        return _job(row) if row else None
+
+# Segundos até o próximo job agendado de um dos tipos (None se não há)
+async def next_job_delay(job_types: List[str]) -> Optional[float]:
+    async with pool.reader() as db:
+        async with db.execute(
+            """
+            SELECT (julianday(MIN(run_at)) - julianday('now')) * 86400 FROM jobs
+            WHERE status = 'queued' AND type IN (SELECT value FROM json_each(?))
+            """,
+            (json.dumps(job_types),)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+async def complete_job(job_id: int, result: Optional[dict] = None):
+    async with pool.writer() as db:
+        await db.execute(
+            """
+            UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, finished_at = datetime('now')
+            WHERE id = ?
+            """,
+            (_json_or_none(result), job_id)
+        )
+
+# Registra a falha: volta para a fila depois de `retry_in` segundos ou, sem
+# retry_in, termina como 'failed'
+async def fail_job(job_id: int, error: str, retry_in: Optional[float] = None):
+    async with pool.writer() as db:
+        if retry_in is None:
+            await db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = datetime('now') WHERE id = ?",
+                (error, job_id)
+            )
+        else:
+            await db.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, run_at = datetime('now', ?) WHERE id = ?",
+                (error, f"+{retry_in:.3f} seconds", job_id)
+            )
+
+# Devolve à fila um job interrompido pelo desligamento (não conta a tentativa)
+async def requeue_job(job_id: int):
+    async with pool.writer() as db:
+        await db.execute(
+            "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0) WHERE id = ? AND status = 'running'",
+            (job_id,)
+        )
+
+# Jobs que estavam rodando quando o processo caiu voltam para a fila
+async def requeue_interrupted_jobs() -> int:
+    async with pool.writer() as db:
+        cursor = await db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        return cursor.rowcount
+
+# Grava o estado (para retomar numa nova tentativa) e/ou o progresso do job
+async def update_job(job_id: int, state: Optional[dict] = None, progress: Optional[dict] = None):
+    async with pool.writer() as db:
+        await db.execute(
+            """
+            UPDATE jobs SET state = COALESCE(?, state), progress = COALESCE(?, progress)
+            WHERE id = ?
+            """,
+            (_json_or_none(state), _json_or_none(progress), job_id)
+        )
+
+async def get_job(job_id: int) -> Optional[dict]:
+    async with pool.reader() as db:
+        async with db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)) as cursor:
+            row = await cursor.fetchone()
+
+        return _job(row) if row else None
+
+# Job mais recente com a chave (ativo ou terminado)
+async def get_latest_job(dedupe_key: str) -> Optional[dict]:
+    async with pool.reader() as db:
+        async with db.execute(
+            "SELECT * FROM jobs WHERE dedupe_key = ? ORDER BY id DESC LIMIT 1",
+            (dedupe_key,)
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        return _job(row) if row else None
+
+async def list_jobs(status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50) -> List[dict]:
+    async with pool.reader() as db:
+        async with db.execute(
+            """
+            SELECT * FROM jobs
+            WHERE (:status IS NULL OR status = :status) AND (:type IS NULL OR type = :type)
+            ORDER BY id DESC
+            LIMIT :limit
+            """,
+            {"status": status, "type": job_type, "limit": limit}
+        ) as cursor:
+            return [_job(row) for row in await cursor.fetchall()]
+
+# Remove jobs terminados há mais de `days` dias
+async def purge_finished_jobs(days: int) -> int:
+    async with pool.writer() as db:
         cursor = await db.execute(
             """
-            SELECT COUNT(*) as songs FROM music_sessions m
-            JOIN checkpoints c ON m.checkpoint_id = c.id
-            WHERE c.quest_id = ?
+            DELETE FROM jobs
+            WHERE status IN ('succeeded', 'failed') AND finished_at < datetime('now', ?)
             """,
-            (quest_id,)
+            (f"-{days} days",)
         )
-        songs = (await cursor.fetchone())["songs"]
+        return cursor.rowcount
+
+# ================
+# BUSCA
+
+SEARCH_TYPES = ["quest", "checkpoint", "music"]
+
+# Marcadores do trecho destacado
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+
+# Texto do usuário -> consulta FTS5 segura: cada palavra entre aspas (sem
+# operadores) e a última como prefixo, para buscar enquanto digita
+def _fts_query(text: str) -> str:
+    words = re.findall(r"\w+", text)
+    if not words:
+        raise ValueError("Busca vazia")
+
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def _snippet(fts: str) -> str:
+    return f"snippet({fts}, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 12)"
+
+# Músicas: o ranking (bm25) considera só as N ocorrências mais recentes do
+# termo. Com menos de N ocorrências o histórico inteiro entra; com mais, já
+# há candidatos de sobra para a página. Sem o limite, um termo presente em
+# 500 mil sessões leva ~1 s; com 2000, ~0,1 s. MUSIC_SEARCH_CANDIDATES=0
+# ranqueia todo o histórico
+MUSIC_SEARCH_CANDIDATES = int(os.getenv("MUSIC_SEARCH_CANDIDATES", "2000"))
+
+# Consulta de músicas; `candidates` > 0 ranqueia só as ocorrências mais recentes
+def _music_query(candidates: int) -> str:
+    matches = f"SELECT rowid, rank, {_snippet('music_sessions_fts')} AS snippet FROM music_sessions_fts WHERE music_sessions_fts MATCH :query"
+    if candidates > 0:
+        matches = f"""
+            SELECT * FROM (
+                {matches}
+                ORDER BY rowid DESC LIMIT MAX(:limit, {candidates})
+            )
+        """
+    return f"""
+        SELECT 'music' AS type, m.id, c.quest_id, m.checkpoint_id,
+               m.track_name AS title, m.artist AS subtitle, f.snippet, m.played_at AS date, f.rank
+        FROM (
+            {matches}
+            ORDER BY rank LIMIT :limit
+        ) f
+        JOIN music_sessions m ON m.id = f.rowid
+        JOIN checkpoints c ON c.id = m.checkpoint_id
+    """
+
+# Cada tipo busca só os seus `limit` melhores pelo bm25 e só depois junta
+# com as tabelas de origem. O rank de tabelas FTS diferentes não está na
+# mesma escala: o resultado vem agrupado por tipo (na ordem de SEARCH_TYPES)
+# e ordenado pelo rank dentro de cada tipo
+_SEARCH_QUERIES = {
+    "quest": f"""
+        SELECT 'quest' AS type, q.id, q.id AS quest_id, NULL AS checkpoint_id,
+               q.title, q.status AS subtitle, f.snippet, q.created_at AS date, f.rank
+        FROM (
+            SELECT rowid, rank, {_snippet("quests_fts")} AS snippet
+            FROM quests_fts WHERE quests_fts MATCH :query
+            ORDER BY rank LIMIT :limit
+        ) f
+        JOIN quests q ON q.id = f.rowid
+    """,
+    "checkpoint": f"""
+        SELECT 'checkpoint' AS type, c.id, c.quest_id, c.id AS checkpoint_id,
+               c.title, q.title AS subtitle, f.snippet, c.completed_at AS date, f.rank
+        FROM (
+            SELECT rowid, rank, {_snippet("checkpoints_fts")} AS snippet
+            FROM checkpoints_fts WHERE checkpoints_fts MATCH :query
+            ORDER BY rank LIMIT :limit
+        ) f
+        JOIN checkpoints c ON c.id = f.rowid
+        JOIN quests q ON q.id = c.quest_id
+    """,
+    "music": _music_query(MUSIC_SEARCH_CANDIDATES),
+}
+
+# Busca textual: por tipo e, dentro dele, por relevância; retorna (resultados, próximo offset)
+async def search(
+    text: str,
+    types: Optional[List[str]] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> Tuple[List[dict], Optional[int]]:
+    query = _fts_query(text)
+    # Sem repetir tipos (type=music&type=music)
+    selected = [search_type for search_type in SEARCH_TYPES if not types or search_type in types]
+
+    sql = " UNION ALL ".join(
+        f"SELECT {position} AS type_order, * FROM ({_SEARCH_QUERIES[search_type]})"
+        for position, search_type in enumerate(selected)
+    )
+    sql += " ORDER BY type_order, rank, id LIMIT :page_limit OFFSET :offset"
+
+    async with pool.reader() as db:
+        async with db.execute(sql, {
+            "query": query,
+            # Um a mais por tipo para saber se há próxima página
+            "limit": offset + limit + 1,
+            "page_limit": limit + 1,
+            "offset": offset
+        }) as cursor:
+            rows = [dict(row) for row in await cursor.fetchall()]
+
+    for row in rows:
+        del row["type_order"]
+
+    next_offset = offset + limit if len(rows) > limit else None
+    return rows[:limit], next_offset
+
+# ================
+# STATS
+
+# Retorna estatísticas de uma quest (contadores mantidos por triggers)
+async def get_quest_stats(quest_id: int) -> dict:
+    async with pool.reader() as db:
+        async with db.execute(
+            "SELECT total_checkpoints, completed_checkpoints, songs_played, listened_ms FROM quests WHERE id = ?",
+            (quest_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        total = row["total_checkpoints"] if row else 0
+        completed = row["completed_checkpoints"] if row else 0
 
         return {
             "total_checkpoints": total,
             "completed_checkpoints": completed,
             "progress_percentage": (completed / total * 100) if total > 0 else 0,
-            "total_songs_played": songs
+            "total_time_minutes": row["listened_ms"] / 60000 if row else 0,
+            "total_songs_played": row["songs_played"] if row else 0
         }
 
+# Resumo de todas as quests (checkpoints, progresso e músicas) em uma única consulta
+async def get_quests_summary() -> List[dict]:
+    async with pool.reader() as db:
+        async with db.execute(
+            "SELECT * FROM quests ORDER BY created_at DESC, id DESC"
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        summaries = []
+        for row in rows:
+            quest = dict(row)
+            total = quest.pop("total_checkpoints")
+            completed = quest.pop("completed_checkpoints")
+            songs = quest.pop("songs_played")
+            listened_ms = quest.pop("listened_ms")
+
+            summaries.append({
+                "quest": quest,
+                "total_checkpoints": total,
+                "completed_checkpoints": completed,
+                "progress_percentage": (completed / total * 100) if total > 0 else 0,
+                "total_time_minutes": listened_ms / 60000,
+                "total_songs_played": songs
+            })
+
+        return summaries
+
+# ================
+# ARQUIVO
+#
+# Quests concluídas (com loot resgatado) há mais de N dias saem das tabelas
+# quentes para o banco `archive`, junto com checkpoints, músicas, rollups e
+# as faixas já enviadas à playlist do Spotify.
+# Em WAL uma transação que escreve em dois bancos não é atômica entre eles,
+# então a cópia e a remoção são commits separados: uma queda no meio deixa
+# a quest nos dois (a próxima execução regrava a cópia), nunca em nenhum
+
+# Janela padrão do arquivamento (dias desde a conclusão)
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+# Quests movidas por transação (o escritor fica livre entre os lotes)
+ARCHIVE_BATCH_SIZE = 50
+
+# Colunas copiadas de cada tabela (as mesmas nos dois bancos)
+ARCHIVE_COLUMNS = {
+    "quests": [
+        "id", "title", "description", "created_at", "completed_at", "status", "is_syncing", "loot_retrieved",
+        "total_checkpoints", "completed_checkpoints", "songs_played", "listened_ms",
+        "spotify_playlist_id", "spotify_playlist_url", "spotify_snapshot_id", "playlist_synced_session_id"
+    ],
+    "checkpoints": [
+        "id", "quest_id", "title", "order_index", "completed", "completed_at",
+        "songs_played", "listened_ms", "first_played_at"
+    ],
+    "music_sessions": ["id", "checkpoint_id", "track_name", "artist", "album", "spotify_uri", "played_at", "duration_ms"],
+    "listening_daily": ["quest_id", "day", "plays", "duration_ms"],
+    "listening_artists": ["quest_id", "artist", "plays", "duration_ms"],
+    "listening_tracks": ["quest_id", "spotify_uri", "track_name", "artist", "plays", "duration_ms"],
+    "playlist_tracks": ["quest_id", "spotify_uri", "pushed_at"],
+}
+
+# Filtro de cada tabela pelas quests do lote (ids em JSON)
+_BATCH_QUESTS = "(SELECT value FROM json_each(:ids))"
+_ARCHIVE_FILTERS = {
+    "quests": f"id IN {_BATCH_QUESTS}",
+    "checkpoints": f"quest_id IN {_BATCH_QUESTS}",
+    "music_sessions": f"checkpoint_id IN (SELECT id FROM main.checkpoints WHERE quest_id IN {_BATCH_QUESTS})",
+    "listening_daily": f"quest_id IN {_BATCH_QUESTS}",
+    "listening_artists": f"quest_id IN {_BATCH_QUESTS}",
+    "listening_tracks": f"quest_id IN {_BATCH_QUESTS}",
+    "playlist_tracks": f"quest_id IN {_BATCH_QUESTS}",
+}
+
+# Move para o arquivo as quests concluídas há mais de `older_than_days` dias
+# com loot resgatado. Retorna quantas linhas de cada tabela foram movidas
+async def archive_quests(older_than_days: int, batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict[str, int]:
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+    moved = {table: 0 for table in ("quests", "checkpoints", "music_sessions")}
+
+    while True:
+        # 1) Copia o lote para o arquivo
+        async with pool.writer() as db:
+            async with db.execute(
+                """
+                SELECT id FROM quests
+                WHERE status = 'completed' AND loot_retrieved = 1 AND is_syncing = 0
+                  AND completed_at < ?
+                ORDER BY completed_at
+                LIMIT ?
+                """,
+                (cutoff, batch_size)
+            ) as cursor:
+                quest_ids = [row[0] for row in await cursor.fetchall()]
+
+            if not quest_ids:
+                break
+
+            params = {"ids": json.dumps(quest_ids)}
+            for table, columns in ARCHIVE_COLUMNS.items():
+                names = ", ".join(columns)
+                cursor = await db.execute(
+                    f"INSERT OR REPLACE INTO archive.{table} ({names}) "
+                    f"SELECT {names} FROM main.{table} WHERE {_ARCHIVE_FILTERS[table]}",
+                    params
+                )
+                if table in moved:
+                    moved[table] += cursor.rowcount
+
+        # 2) Remove das tabelas quentes só o que já está no arquivo. A cascata
+        # dispara os triggers de contadores; o total de músicas do usuário não
+        # muda ao arquivar, então é devolvido
+        async with pool.writer() as db:
+            archived = f"id IN {_BATCH_QUESTS} AND id IN (SELECT id FROM archive.quests)"
+            async with db.execute(
+                f"SELECT COALESCE(SUM(songs_played), 0) FROM quests WHERE {archived}",
+                params
+            ) as cursor:
+                songs = (await cursor.fetchone())[0]
+
+            await db.execute(f"DELETE FROM quests WHERE {archived}", params)
+            await db.execute(
+                "UPDATE user_stats SET total_songs_played = total_songs_played + ? WHERE id = 1",
+                (songs,)
+            )
+
+        if len(quest_ids) < batch_size:
+            break
+
+    logger.info(
+        f"Arquivamento concluído: {moved['quests']} quest(s), {moved['checkpoints']} checkpoint(s), "
+        f"{moved['music_sessions']} música(s)"
+    )
+    return moved
+
+# Quantidade de linhas no arquivo
+async def get_archive_stats() -> Dict[str, int]:
+    async with pool.reader() as db:
+        stats = {}
+        for table in ("quests", "checkpoints", "music_sessions"):
+            async with db.execute(f"SELECT COUNT(*) FROM archive.{table}") as cursor:
+                stats[table] = (await cursor.fetchone())[0]
+        return stats
+
+# ================
+# IMPORTAÇÃO (ver transfer.py)
+#
+# Cada função grava um lote numa transação. Com AUTOINCREMENT e um único
+# escritor os ids de um executemany são sequenciais
+
+async def _insert_many(db, sql: str, rows: List[tuple]) -> List[int]:
+    await db.executemany(sql, rows)
+    async with db.execute("SELECT last_insert_rowid()") as cursor:
+        last_id = (await cursor.fetchone())[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+# rows: (title, description, created_at, completed_at, status, loot_retrieved)
+async def import_quests(rows: List[tuple]) -> List[int]:
+    async with pool.writer() as db:
+        return await _insert_many(
+            db,
+            """INSERT INTO quests (title, description, created_at, completed_at, status, loot_retrieved)
+               VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?)""",
+            rows
+        )
+
+# rows: (quest_id, title, order_index, completed, completed_at)
+async def import_checkpoints(rows: List[tuple]) -> List[int]:
+    async with pool.writer() as db:
+        return await _insert_many(
+            db,
+            "INSERT INTO checkpoints (quest_id, title, order_index, completed, completed_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+
+# rows: (checkpoint_id, track_name, artist, album, spotify_uri, played_at, duration_ms)
+async def import_music_sessions(rows: List[tuple]):
+    async with pool.writer() as db:
+        await db.executemany(
+            """INSERT INTO music_sessions (checkpoint_id, track_name, artist, album, spotify_uri, played_at, duration_ms)
+               VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)""",
+            rows
+        )
+
+# Substitui XP e quests concluídas pelos valores importados
+async def restore_user_stats(total_xp: int, quests_completed: int):
+    async with pool.writer() as db:
+        await db.execute(
+            """
+            UPDATE user_stats SET
+                total_xp = :total_xp,
+                level = xp_level(:total_xp),
+                xp = xp_progress(:total_xp),
+                xp_to_next_level = xp_required(xp_level(:total_xp)),
+                quests_completed = :quests_completed
+            WHERE id = 1
+            """,
+            {"total_xp": total_xp, "quests_completed": quests_completed}
+        )
+
+# ================
+# ANALYTICS
+#
+# Só lê os rollups (listening_*) e os contadores de quests/checkpoints,
+# mantidos pelos triggers de music_sessions; nunca varre music_sessions.
+# Os rollups das quests arquivadas continuam contando (archive.listening_*)
+
+# Minutos ouvidos por dia (local), de todas as quests ou de uma
+async def get_daily_listening(days: int, quest_id: Optional[int] = None) -> List[dict]:
+    async with pool.reader() as db:
+        async with db.execute(
+            """
+            SELECT day, SUM(plays) AS plays, SUM(duration_ms) / 60000.0 AS minutes
+            FROM (SELECT * FROM main.listening_daily UNION ALL SELECT * FROM archive.listening_daily)
+            WHERE day >= date('now', 'localtime', :since)
+              AND (:quest_id IS NULL OR quest_id = :quest_id)
+            GROUP BY day
+            ORDER BY day
+            """,
+            {"since": f"-{days - 1} days", "quest_id": quest_id}
+        ) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+# Artistas e faixas mais ouvidos, de todas as quests ou de uma
+async def get_top_listening(limit: int, quest_id: Optional[int] = None) -> dict:
+    async with pool.reader() as db:
+        async with db.execute(
+            """
+            SELECT artist, SUM(plays) AS plays, SUM(duration_ms) / 60000.0 AS minutes
+            FROM (SELECT * FROM main.listening_artists UNION ALL SELECT * FROM archive.listening_artists)
+            WHERE :quest_id IS NULL OR quest_id = :quest_id
+            GROUP BY artist
+            ORDER BY plays DESC, minutes DESC, artist
+            LIMIT :limit
+            """,
+            {"quest_id": quest_id, "limit": limit}
+        ) as cursor:
+            artists = [dict(row) for row in await cursor.fetchall()]
+
+        async with db.execute(
+            """
+            SELECT spotify_uri, MAX(track_name) AS track_name, MAX(artist) AS artist,
+                   SUM(plays) AS plays, SUM(duration_ms) / 60000.0 AS minutes
+            FROM (SELECT * FROM main.listening_tracks UNION ALL SELECT * FROM archive.listening_tracks)
+            WHERE :quest_id IS NULL OR quest_id = :quest_id
+            GROUP BY spotify_uri
+            ORDER BY plays DESC, minutes DESC, spotify_uri
+            LIMIT :limit
+            """,
+            {"quest_id": quest_id, "limit": limit}
+        ) as cursor:
+            tracks = [dict(row) for row in await cursor.fetchall()]
+
+        return {"top_artists": artists, "top_tracks": tracks}
+
+# Tempo de foco por checkpoint: música ouvida nele e tempo entre a primeira
+# música e a conclusão (completed_at é local, played_at é UTC)
+async def get_checkpoint_focus(quest_id: int) -> List[dict]:
+    async with pool.reader() as db:
+        async with db.execute(
+            """
+            SELECT id AS checkpoint_id, title, order_index, completed, completed_at,
+                   songs_played, listened_ms / 60000.0 AS listened_minutes,
+                   first_played_at,
+                   CASE WHEN completed_at IS NOT NULL AND first_played_at IS NOT NULL
+                        THEN MAX(0, (julianday(completed_at) - julianday(first_played_at, 'localtime')) * 1440)
+                   END AS focus_minutes
+            FROM checkpoints
+            WHERE quest_id = ?
+            ORDER BY order_index
+            """,
+            (quest_id,)
+        ) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
 # ================
 # USER STATS
 
 async def get_user_stats() -> dict:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        cursor = await db.execute("SELECT * FROM user_stats WHERE id = 1")
+    async with pool.reader() as db:
+        # total_songs_played é mantido pelos triggers de music_sessions
+        async with db.execute("SELECT * FROM user_stats WHERE id = 1") as cursor:
+            row = await cursor.fetchone()
+
+        return dict(row)
+
+# Soma XP numa única instrução atômica; nível, progresso e XP do próximo
+# nível saem do total acumulado em forma fechada (ver leveling.py)
+async def _award_xp(db, amount: int, quests_completed: int = 0) -> dict:
+    async with db.execute(
+        """
+        UPDATE user_stats SET
+            total_xp = total_xp + :amount,
+            level = xp_level(total_xp + :amount),
+            xp = xp_progress(total_xp + :amount),
+            xp_to_next_level = xp_required(xp_level(total_xp + :amount)),
+            quests_completed = quests_completed + :quests_completed
+        WHERE id = 1
+        RETURNING level, xp, xp_to_next_level, level > xp_level(total_xp - :amount) AS leveled_up
+        """,
+        {"amount": amount, "quests_completed": quests_completed}
+    ) as cursor:
         row = await cursor.fetchone()
-        
-        # Count total songs played across all sessions
-        cursor_songs = await db.execute("SELECT COUNT(*) as total FROM music_sessions")
-        total_songs = (await cursor_songs.fetchone())["total"]
-        
-        stats = dict(row)
-        stats["total_songs_played"] = total_songs
-        return stats
+
+    if not row:
+        logger.error("user_stats (id 1) não encontrado")
+        return {}
+
+    stats = dict(row)
+    stats["leveled_up"] = bool(stats["leveled_up"])
+    return stats
 
 async def add_xp(amount: int) -> dict:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = sqlite3.Row
-        
-        # Get current stats
-        cursor = await db.execute("SELECT * FROM user_stats WHERE id = 1")
-        row = await cursor.fetchone()
-        if not row:
-            print(">>> ERRO: User stats ID 1 not found!")
-            return {}
-            
-        stats = dict(row)
-        print(f">>> CURRENT STATS: {stats}")
-        
-        new_xp = stats["xp"] + amount
-        level = stats["level"]
-        xp_needed = stats["xp_to_next_level"]
-        
-        # Level up logic
-        leveled_up = False
-        while new_xp >= xp_needed:
-            new_xp -= xp_needed
-            level += 1
-            # Next level requirement increases by 25
-            xp_needed += 25
-            leveled_up = True
-            
-        await db.execute(
-            """UPDATE user_stats 
-               SET xp = ?, level = ?, xp_to_next_level = ? 
-               WHERE id = 1""",
-            (new_xp, level, xp_needed)
-        )
-        await db.commit()
-        
-        return {
-            "level": level,
-            "xp": new_xp,
-            "xp_to_next_level": xp_needed,
-            "leveled_up": leveled_up
-        }
+    async with pool.writer() as db:
+        return await _award_xp(db, amount)
+
+# Reconstrói XP e quests concluídas a partir do histórico (checkpoints e
+# quests concluídos), numa única passada
+async def recompute_xp() -> dict:
+    async with pool.writer() as db:
+        async with db.execute(
+            """
+            WITH
+            -- Quests arquivadas também contam (o XP delas não some)
+            completed_quests AS (
+                SELECT COUNT(*) AS n FROM (
+                    SELECT id FROM main.quests WHERE status = 'completed'
+                    UNION ALL
+                    SELECT id FROM archive.quests WHERE status = 'completed'
+                )
+            ),
+            completed_checkpoints AS (
+                SELECT COUNT(*) AS n FROM (
+                    SELECT id FROM main.checkpoints WHERE completed = 1
+                    UNION ALL
+                    SELECT id FROM archive.checkpoints WHERE completed = 1
+                )
+            ),
+            history AS (
+                SELECT
+                    (SELECT n FROM completed_quests) AS quests,
+                    :checkpoint_xp * (SELECT n FROM completed_checkpoints)
+                        + :quest_xp * (SELECT n FROM completed_quests) AS total
+            )
+            UPDATE user_stats SET
+                total_xp = (SELECT total FROM history),
+                level = xp_level((SELECT total FROM history)),
+                xp = xp_progress((SELECT total FROM history)),
+                xp_to_next_level = xp_required(xp_level((SELECT total FROM history))),
+                quests_completed = (SELECT quests FROM history)
+            WHERE id = 1
+            RETURNING level, xp, xp_to_next_level, total_xp, quests_completed
+            """,
+            {"checkpoint_xp": CHECKPOINT_XP, "quest_xp": QUEST_XP}
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        return dict(row) if row else {}
 
 async def increment_quests_completed():
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with pool.writer() as db:
         await db.execute("UPDATE user_stats SET quests_completed = quests_completed + 1 WHERE id = 1")
-        await db.commit()
+
+# Duração, contagem e erros de cada função async acima (GET /metrics)
+instrument_module(globals())
 
 # ================
 # Inicializa o banco
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
+
+    # python database.py repair-counters
+    if "repair-counters" in sys.argv[1:]:
+        print(f"{repair_counters()} valor(es) corrigido(s)")
+
+    # python database.py recompute-xp
+    if "recompute-xp" in sys.argv[1:]:
+        import asyncio
+
+        async def _recompute():
+            try:
+                return await recompute_xp()
+            finally:
+                await pool.close()
+
+        print(f"XP recalculado: {asyncio.run(_recompute())}")
+
+    # python database.py archive [dias]
+    if "archive" in sys.argv[1:]:
+        import asyncio
+
+        args = sys.argv[sys.argv.index("archive") + 1:]
+        days = int(args[0]) if args and args[0].isdigit() else ARCHIVE_AFTER_DAYS
+
+        async def _archive():
+            try:
+                return await archive_quests(days)
+            finally:
+                await pool.close()
+
+        print(f"Arquivado: {asyncio.run(_archive())}")
@@ -0,0 +1,234 @@
+import asyncio
+import sqlite3
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from metrics import db_write_batch
+
+logger = logging.getLogger(__name__)
+
+# Pragmas aplicados uma única vez, quando cada conexão é aberta
+CONNECTION_PRAGMAS = [
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+]
+
+# Pragmas persistentes no arquivo, aplicados pelo init_db
+DATABASE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+]
+
+# Máximo de escritas agrupadas em um único commit
+MAX_WRITE_BATCH = 64
+
+
+class _WriteRequest:
+    # Uma escrita na fila do escritor: recebe a conexão, devolve quando termina
+    # e espera o commit do lote em que entrou
+
+    def __init__(self):
+        loop = asyncio.get_running_loop()
+        self.granted = loop.create_future()
+        self.released = loop.create_future()
+        self.committed = loop.create_future()
+
+    def fail(self, error: BaseException):
+        if not self.granted.done():
+            self.granted.set_exception(error)
+        # Um bloco que já falhou não espera pelo commit
+        elif self.released.done() and self.released.result() and not self.committed.done():
+            self.committed.set_exception(error)
+
+
+class ConnectionPool:
+    # Mantém conexões aiosqlite de longa duração: um escritor e N leitores
+
+    def __init__(
+        self,
+        database_path: str,
+        readers: int = 4,
+        functions: Optional[Dict[str, Tuple[int, Callable]]] = None,
+        attach: Optional[Dict[str, str]] = None
+    ):
+        self.database_path = database_path
+        self.size = max(1, readers)
+        # Funções SQL definidas em Python: nome -> (nº de argumentos, função)
+        self.functions = functions or {}
+        # Bancos anexados em todas as conexões: apelido -> caminho
+        self.attach = attach or {}
+        self._readers: Optional[asyncio.Queue] = None
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._write_task: Optional[asyncio.Task] = None
+        self._open_lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self, **kwargs) -> aiosqlite.Connection:
+        conn = aiosqlite.connect(self.database_path, **kwargs)
+        # Thread daemon: scripts que usam o pool sem fechá-lo não travam na saída
+        conn.daemon = True
+        await conn
+        conn.row_factory = sqlite3.Row
+
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+
+        for alias, path in self.attach.items():
+            await conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+
+        for name, (num_params, func) in self.functions.items():
+            await conn.create_function(name, num_params, func, deterministic=True)
+
+        return conn
+
+    # Abre as conexões (chamado no lifespan, ou sob demanda no primeiro uso)
+    async def open(self):
+        async with self._open_lock:
+            if self.is_open:
+                return
+
+            self._readers = asyncio.Queue()
+            self._all_readers = []
+            for _ in range(self.size):
+                conn = await self._connect()
+                self._all_readers.append(conn)
+                self._readers.put_nowait(conn)
+
+            # O escritor controla as transações manualmente (BEGIN/SAVEPOINT/COMMIT)
+            self._writer = await self._connect(isolation_level=None)
+            self._write_queue = asyncio.Queue()
+            self._write_task = asyncio.create_task(self._write_loop())
+            logger.info(f"Pool SQLite aberto: 1 escritor, {self.size} leitores")
+
+    # Fecha todas as conexões, esperando as escritas pendentes
+    async def close(self):
+        async with self._open_lock:
+            if not self.is_open:
+                return
+
+            self._write_queue.put_nowait(None)
+            await self._write_task
+
+            for conn in self._all_readers:
+                await conn.close()
+            await self._writer.close()
+
+            self._readers = None
+            self._all_readers = []
+            self._writer = None
+            self._write_queue = None
+            self._write_task = None
+            logger.info("Pool SQLite fechado")
+
+    # Empresta uma conexão de leitura
+    @asynccontextmanager
+    async def reader(self):
+        if not self.is_open:
+            await self.open()
+
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    # Conexão avulsa, fora do pool, fechada na saída. Para leituras
+    # longas no ritmo do cliente (exportação), que não devem ocupar um leitor
+    @asynccontextmanager
+    async def dedicated(self):
+        conn = await self._connect()
+        try:
+            yield conn
+        finally:
+            await conn.close()
+
+    # Empresta a conexão de escrita dentro de um savepoint do lote atual.
+    # Só retorna depois do commit; em caso de erro apenas este bloco é desfeito
+    @asynccontextmanager
+    async def writer(self):
+        if not self.is_open:
+            await self.open()
+
+        request = _WriteRequest()
+        self._write_queue.put_nowait(request)
+
+        try:
+            conn = await request.granted
+        except asyncio.CancelledError:
+            if not request.released.done():
+                request.released.set_result(False)
+            raise
+
+        try:
+            yield conn
+        except BaseException:
+            request.released.set_result(False)
+            raise
+
+        request.released.set_result(True)
+        await request.committed
+
+    # Tarefa única que executa todas as escritas e agrupa os commits
+    async def _write_loop(self):
+        stopping = False
+
+        while not stopping:
+            request = await self._write_queue.get()
+            if request is None:
+                break
+
+            batch = []
+            try:
+                await self._writer.execute("BEGIN IMMEDIATE")
+
+                while request is not None:
+                    await self._run_write(request)
+                    batch.append(request)
+
+                    if len(batch) >= MAX_WRITE_BATCH or self._write_queue.empty():
+                        break
+
+                    request = self._write_queue.get_nowait()
+                    if request is None:
+                        stopping = True
+
+                await self._writer.execute("COMMIT")
+                db_write_batch.observe(len(batch))
+            except Exception as e:
+                logger.error(f"Erro no lote de escritas SQLite: {e}")
+                if self._writer.in_transaction:
+                    await self._writer.execute("ROLLBACK")
+                if request is not None and request not in batch:
+                    request.fail(e)
+                for pending in batch:
+                    pending.fail(e)
+                continue
+
+            for done in batch:
+                if not done.committed.done():
+                    done.committed.set_result(None)
+
+    # Entrega a conexão a uma escrita e aplica ou desfaz seu savepoint
+    async def _run_write(self, request: _WriteRequest):
+        if request.granted.done():
+            # Quem pediu desistiu antes de receber a conexão
+            return
+
+        await self._writer.execute("SAVEPOINT write_request")
+        request.granted.set_result(self._writer)
+
+        if await request.released:
+            await self._writer.execute("RELEASE write_request")
+        else:
+            await self._writer.execute("ROLLBACK TO write_request")
+            await self._writer.execute("RELEASE write_request")
@@ -0,0 +1,93 @@
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento publicados para as janelas
+TRACK_CHANGED = "track_changed"
+MUSIC_TRACKED = "music_tracked"
+CHECKPOINT_COMPLETED = "checkpoint_completed"
+XP_CHANGED = "xp_changed"
+QUEST_STATUS_CHANGED = "quest_status_changed"
+PLAYLIST_SYNC_PROGRESS = "playlist_sync_progress"
+
+# Eventos guardados por cliente antes de descartar os mais antigos
+CLIENT_QUEUE_SIZE = 100
+# Intervalo do comentário de keep-alive do SSE (segundos)
+HEARTBEAT_INTERVAL = 15
+
+
+class EventBus:
+    # Distribui eventos para todos os clientes conectados. Cada cliente tem a
+    # própria fila limitada: se ele não consome, os eventos mais antigos dele
+    # são descartados e o publish nunca espera
+
+    def __init__(self, queue_size: int = CLIENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._clients: Set[asyncio.Queue] = set()
+        self.dropped = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._clients.discard(queue)
+
+    def publish(self, event_type: str, data: Optional[Dict] = None):
+        event = make_event(event_type, data)
+
+        for queue in self._clients:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    # Gera o stream SSE de um cliente até ele desconectar
+    async def stream(self, initial: Optional[Dict] = None):
+        queue = self.subscribe()
+        logger.info(f"Cliente de eventos conectado ({self.client_count} ativos)")
+
+        try:
+            if initial:
+                yield format_sse(initial)
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(queue)
+            logger.info(f"Cliente de eventos desconectado ({self.client_count} ativos)")
+
+
+def make_event(event_type: str, data: Optional[Dict] = None) -> Dict:
+    return {
+        "type": event_type,
+        "data": data or {},
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def format_sse(event: Dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+# Criar uma instância única do barramento
+event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    return event_bus
@@ -0,0 +1,219 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import database as db
+from logs import request_id
+
+logger = logging.getLogger(__name__)
+
+# Workers que executam jobs em paralelo
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Espera antes de tentar de novo: dobra a cada tentativa, até o máximo (segundos)
+JOB_RETRY_BACKOFF = 5.0
+MAX_JOB_RETRY_DELAY = 600.0
+# Sem jobs agendados, os workers conferem a fila a cada intervalo (segundos)
+JOB_IDLE_INTERVAL = 60.0
+# Jobs terminados ficam no histórico por tantos dias
+JOB_HISTORY_DAYS = 7
+
+
+class PermanentJobError(Exception):
+    # Falha que não adianta repetir: o job termina como 'failed' na hora
+    pass
+
+
+class JobContext:
+    # O que o handler recebe: payload, tentativa atual e estado salvo da
+    # tentativa anterior (para retomar em vez de recomeçar)
+
+    def __init__(self, job: Dict):
+        self.id = job["id"]
+        self.type = job["type"]
+        self.payload = job["payload"]
+        self.attempt = job["attempts"]
+        self.state = job["state"] or {}
+
+    async def save_state(self, state: Dict):
+        self.state = state
+        await db.update_job(self.id, state=state)
+
+    async def progress(self, progress: Dict):
+        await db.update_job(self.id, progress=progress)
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[Dict]]]
+
+
+class _JobType:
+    def __init__(self, handler: JobHandler, concurrency: int, max_attempts: int):
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.running = 0
+
+
+class JobQueue:
+    # Fila persistente (tabela jobs) executada por um pool de workers asyncio.
+    # Cada tipo de job tem seu handler, limite de concorrência e tentativas
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = max(1, workers)
+        self._types: Dict[str, _JobType] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._claim_lock: Optional[asyncio.Lock] = None
+
+    def register(self, job_type: str, handler: JobHandler, concurrency: int = 1, max_attempts: int = 3):
+        self._types[job_type] = _JobType(handler, concurrency, max_attempts)
+
+    async def start(self):
+        if self._tasks:
+            return
+
+        self._wake = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+
+        requeued = await db.requeue_interrupted_jobs()
+        if requeued:
+            logger.info(f"{requeued} job(s) interrompido(s) voltaram para a fila")
+        await db.purge_finished_jobs(JOB_HISTORY_DAYS)
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Fila de jobs iniciada: {self.workers} worker(s)")
+
+    # Cancela os workers; jobs em andamento voltam para a fila
+    async def stop(self):
+        if not self._tasks:
+            return
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._tasks = []
+        logger.info("Fila de jobs parada")
+
+    # Enfileira um job e acorda os workers. Retorna (job, criado)
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Optional[Dict] = None,
+        dedupe_key: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        if job_type not in self._types:
+            raise ValueError(f"Tipo de job desconhecido: {job_type}")
+
+        job, created = await db.enqueue_job(
+            job_type, payload, self._types[job_type].max_attempts, dedupe_key
+        )
+        self.wake()
+        return job, created
+
+    def wake(self):
+        if self._wake:
+            self._wake.set()
+
+    # Tipos com vaga livre (abaixo do limite de concorrência)
+    def _available_types(self) -> List[str]:
+        return [name for name, job_type in self._types.items() if job_type.running < job_type.concurrency]
+
+    async def _claim(self) -> Tuple[Optional[Dict], List[str]]:
+        # A vaga é reservada sob o lock: dois workers não passam do limite
+        async with self._claim_lock:
+            available = self._available_types()
+            job = await db.claim_job(available) if available else None
+            if job:
+                self._types[job["type"]].running += 1
+            return job, available
+
+    async def _worker(self):
+        while True:
+            self._wake.clear()
+            try:
+                job, available = await self._claim()
+            except Exception as e:
+                logger.error(f"Erro ao buscar job na fila: {e}")
+                job, available = None, []
+
+            if job:
+                try:
+                    await self._execute(job)
+                except Exception as e:
+                    # Erro ao gravar o resultado: o worker continua vivo
+                    logger.error(f"Erro ao finalizar job {job['id']} ({job['type']}): {e}")
+                    await self._release(job, str(e) or type(e).__name__)
+                finally:
+                    self._types[job["type"]].running -= 1
+                    # Uma vaga liberada pode destravar jobs parados
+                    self.wake()
+                continue
+
+            try:
+                delay = await db.next_job_delay(available) if available else None
+            except Exception as e:
+                logger.error(f"Erro ao consultar a fila de jobs: {e}")
+                delay = None
+            timeout = JOB_IDLE_INTERVAL if delay is None else min(max(delay, 0.0), JOB_IDLE_INTERVAL)
+            waiter = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=timeout)
+            finally:
+                waiter.cancel()
+
+    # Job cujo resultado não foi gravado: conta como tentativa falha (nova
+    # tentativa com backoff, ou 'failed' no fim). Se nem isso der, ele fica
+    # 'running' e volta para a fila na próxima inicialização
+    async def _release(self, job: Dict, error: str):
+        try:
+            if job["attempts"] < self._types[job["type"]].max_attempts:
+                await db.fail_job(job["id"], error, retry_in=_retry_delay(job))
+            else:
+                await db.fail_job(job["id"], error)
+        except Exception as e:
+            logger.error(f"Erro ao devolver job {job['id']} para a fila: {e}")
+
+    async def _execute(self, job: Dict):
+        # Logs do job (banco, Spotify) saem com o id dele
+        token = request_id.set(f"job-{job['id']}")
+        try:
+            await self._run_handler(job)
+        finally:
+            request_id.reset(token)
+
+    async def _run_handler(self, job: Dict):
+        job_type = self._types[job["type"]]
+        ctx = JobContext(job)
+
+        try:
+            result = await job_type.handler(ctx)
+        except asyncio.CancelledError:
+            await asyncio.shield(db.requeue_job(job["id"]))
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if isinstance(e, PermanentJobError) or job["attempts"] >= job_type.max_attempts:
+                await db.fail_job(job["id"], error)
+                logger.error(f"Job {job['id']} ({job['type']}) falhou: {error}")
+            else:
+                delay = _retry_delay(job)
+                await db.fail_job(job["id"], error, retry_in=delay)
+                logger.warning(f"Job {job['id']} ({job['type']}) falhou, nova tentativa em {delay:.0f}s: {error}")
+            return
+
+        await db.complete_job(job["id"], result)
+        logger.info(f"Job {job['id']} ({job['type']}) concluído")
+
+
+# Espera antes da próxima tentativa: dobra a cada tentativa, até o máximo
+def _retry_delay(job: Dict) -> float:
+    return min(JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1), MAX_JOB_RETRY_DELAY)
+
+
+# Criar uma instância única da fila
+job_queue = JobQueue()
+
+
+def get_job_queue() -> JobQueue:
+    return job_queue
@@ -0,0 +1,63 @@
+from math import isqrt
+
+# ================
+# XP E NÍVEIS
+#
+# Do nível L para o L+1 são necessários BASE_XP + XP_STEP * (L - 1) de XP
+# (50, 75, 100, ...). Com n = L - 1, o XP acumulado para chegar ao nível L é
+# a soma da progressão aritmética: n * (2 * BASE_XP + XP_STEP * (n - 1)) / 2
+
+BASE_XP = 50
+XP_STEP = 25
+
+# Recompensas
+CHECKPOINT_XP = 5
+QUEST_XP = 25
+
+
+# XP necessário para passar do nível `level` para o próximo
+def xp_required(level: int) -> int:
+    return BASE_XP + XP_STEP * (level - 1)
+
+# XP acumulado desde o nível 1 até alcançar `level`
+def xp_for_level(level: int) -> int:
+    n = level - 1
+    return n * (2 * BASE_XP + XP_STEP * (n - 1)) // 2
+
+# Nível alcançado com `total_xp` acumulado (sem iterar nível a nível)
+def level_for_xp(total_xp: int) -> int:
+    if total_xp <= 0:
+        return 1
+
+    # Raiz da equação XP_STEP/2 * n² + (BASE_XP - XP_STEP/2) * n - total_xp = 0
+    a = XP_STEP
+    b = 2 * BASE_XP - XP_STEP
+    n = (isqrt(b * b + 8 * a * total_xp) - b) // (2 * a)
+
+    # Corrige o arredondamento da raiz inteira
+    while xp_for_level(n + 2) <= total_xp:
+        n += 1
+    while n > 0 and xp_for_level(n + 1) > total_xp:
+        n -= 1
+
+    return n + 1
+
+# XP dentro do nível atual
+def xp_progress(total_xp: int) -> int:
+    return max(0, total_xp) - xp_for_level(level_for_xp(total_xp))
+
+# Estado completo (mesmos campos de user_stats)
+def level_state(total_xp: int) -> dict:
+    level = level_for_xp(total_xp)
+    return {
+        "level": level,
+        "xp": max(0, total_xp) - xp_for_level(level),
+        "xp_to_next_level": xp_required(level)
+    }
+
+# Funções registradas nas conexões do pool para calcular o nível no próprio UPDATE
+SQL_FUNCTIONS = {
+    "xp_level": (1, level_for_xp),
+    "xp_progress": (1, xp_progress),
+    "xp_required": (1, xp_required),
+}
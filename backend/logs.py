@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import queue
+import uuid
+import atexit
+import logging
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# Logs da API: os módulos usam logging.getLogger(__name__) e só enfileiram o
+# registro; uma thread formata e grava no console e num arquivo rotativo
+# (JSON por linha) ao lado do banco. Requisição nenhuma espera por I/O de log
+
+# Nível geral e níveis por módulo ("spotify_service=DEBUG,db_pool=WARNING")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# O httpx registra cada requisição (o tracker consulta o Spotify a cada segundo)
+DEFAULT_LEVELS = {"httpx": "WARNING", "httpcore": "WARNING"}
+# Arquivo rotativo: tamanho máximo (bytes) e quantos arquivos antigos manter
+LOG_FILE_NAME = "codequest.log"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Id da requisição (ou do job) atual; as tasks criadas dentro dela herdam
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+# Atributos padrão do LogRecord (o resto veio de extra= e vai para o JSON)
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+_listener: Optional[QueueListener] = None
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    # A fila é em memória: o registro vai inteiro e a mensagem só é montada
+    # na thread do listener (o QueueHandler padrão formata antes de enfileirar)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    # Uma linha JSON por registro, com os campos passados em extra=
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# Configura o logging da API (uma vez por processo). `log_dir` recebe o
+# arquivo rotativo; sem console no executável portátil (stdout é os.devnull)
+def setup_logging(log_dir: str, console: bool = True) -> Optional[str]:
+    global _listener
+    if _listener:
+        return None
+
+    handlers = []
+    if console:
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s"))
+        handlers.append(stream)
+
+    log_path = os.getenv("LOG_FILE") or os.path.join(log_dir, LOG_FILE_NAME)
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    except OSError as e:
+        log_path = None
+        print(f"Não foi possível abrir o arquivo de log: {e}", file=sys.stderr)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(_RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    for name, level in {**DEFAULT_LEVELS, **_parse_levels(LOG_LEVELS)}.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Esvazia a fila antes de o processo sair
+    atexit.register(_listener.stop)
+    return log_path
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+# ================
+# Id por requisição
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class RequestIdMiddleware:
+    # Middleware ASGI: dá um id a cada requisição (ou usa o X-Request-ID
+    # recebido), devolve no cabeçalho e escreve uma linha de acesso com
+    # status e duração. Logs do banco e do Spotify na mesma requisição
+    # saem com o mesmo id
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.encode())
+        current = incoming.decode("latin-1")[:64] if incoming else new_request_id()
+        token = request_id.set(current)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode(), current.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if self.logger.isEnabledFor(logging.INFO):
+                duration_ms = (time.perf_counter() - started) * 1000
+                self.logger.info(
+                    "%s %s %s (%.1f ms)", scope["method"], scope["path"], status, duration_ms,
+                    extra={"method": scope["method"], "path": scope["path"], "status": status,
+                           "duration_ms": round(duration_ms, 1)}
+                )
+            request_id.reset(token)
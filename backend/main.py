@@ -1,28 +1,59 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from models import (
     QuestCreate,
     Quest,
     QuestWithCheckpoints,
+    QuestPage,
     QuestSummary,
+    QuestStats,
     CheckpointCreate,
     Checkpoint, 
     QuestUpdate,
     CheckpointUpdate,
+    CheckpointListUpdate,
     MusicSession,
     MusicTrackRequest,
-    PlaylistCreate
+    MusicTrackBatch,
+    MusicTrackBatchResult,
+    PlaylistCreate,
+    SearchPage,
+    DailyListening,
+    TopListening,
+    QuestAnalytics,
+    Job
 )
 from spotify_endpoints import router as spotify_router
+from playback_tracker import get_playback_tracker
+from spotify_service import get_spotify_service
+from transfer import export_ndjson, import_ndjson
+from backup import get_backup_manager
+from playlist_sync import get_playlist_sync
+from jobs import get_job_queue, JobContext
+from metrics import get_registry, MetricsMiddleware, CONTENT_TYPE
+from logs import setup_logging, RequestIdMiddleware
+from events import (
+    get_event_bus,
+    make_event,
+    TRACK_CHANGED,
+    MUSIC_TRACKED,
+    CHECKPOINT_COMPLETED,
+    XP_CHANGED,
+    QUEST_STATUS_CHANGED
+)
 import database as db
+import asyncio
+import json
 import logging
-import requests
 import sys
 import os
 
+logger = logging.getLogger(__name__)
+
 # Redirecionar stdout/stderr para nulo se não existirem (evita erro isatty no PyInstaller)
 if sys.stdout is None:
     sys.stdout = open(os.devnull, "w")
@@ -31,14 +62,32 @@ if sys.stderr is None:
 if sys.stdin is None:
     sys.stdin = open(os.devnull, "r")
 
+# Logs em fila (sem I/O nas requisições) e arquivo rotativo ao lado do banco;
+# sem console no executável portátil
+setup_logging(os.path.dirname(db.DATABASE_PATH), console = not getattr(sys, 'frozen', False))
+
+VALID_STATUSES = ["active", "paused", "completed"]
+MAX_TRACK_BATCH = 5000
+MAX_PLAYLIST_PAGE = 1000
+
 # Configurações
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     db.init_db()
-    logging.info("CodeQuest API rodando!")
+    await db.pool.open()
+    await get_spotify_service().start()
+    await get_playback_tracker().start()
+    await get_job_queue().start()
+    await get_backup_manager().start()
+    logger.info("CodeQuest API rodando!")
 
     yield
-    logging.info("CodeQuest API parado!")
+    await get_job_queue().stop()
+    await get_backup_manager().stop()
+    await get_playback_tracker().stop()
+    await get_spotify_service().close()
+    await db.pool.close()
+    logger.info("CodeQuest API parado!")
 
 # Inicializar app
 app = FastAPI(
@@ -57,6 +106,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latência e status por rota (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Id por requisição nos logs e no cabeçalho X-Request-ID (por fora das métricas)
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(spotify_router)
 
 # Endpoints Root
@@ -81,13 +136,31 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+# Métricas no formato do Prometheus: latência por rota, chamadas ao banco
+# e ao Spotify
+@app.get("/metrics")
+async def get_metrics():
+    return Response(get_registry().render(), media_type = CONTENT_TYPE)
+
+# Stream de eventos (SSE): reprodução, músicas registradas, checkpoints, XP e status das quests
+@app.get("/events")
+async def stream_events():
+    # O cliente recebe o estado atual da reprodução assim que conecta
+    initial = make_event(TRACK_CHANGED, get_playback_tracker().snapshot())
+
+    return StreamingResponse(
+        get_event_bus().stream(initial),
+        media_type = "text/event-stream",
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ================
 # Endpoint QUESTS
 
 # Cria nova quest
 @app.post("/quests", response_model = Quest, status_code = 201)
 async def create_quest(quest: QuestCreate):
-    quest_id = await db.create_quest(quest.title, quest.description)
+    quest_id = await db.create_quest(quest.title, quest.description, quest.checkpoints)
     created_quest = await db.get_quest(quest_id)
     
     if not created_quest:
@@ -95,17 +168,40 @@ async def create_quest(quest: QuestCreate):
         
     return created_quest
 
-# Retornar todas as quest
-@app.get("/quests", response_model = List[Quest])
-async def get_all_quests():
-    quests = await db.get_all_quests()
+# Retornar quests paginadas (cursor em created_at,id), com filtro opcional de status
+@app.get("/quests", response_model = QuestPage)
+async def get_all_quests(
+    status: Optional[List[str]] = Query(None),
+    limit: int = Query(50, ge = 1, le = 200),
+    cursor: Optional[str] = None
+):
+    if status and any(s not in VALID_STATUSES for s in status):
+        raise HTTPException(
+            status_code = 400,
+            detail = f"Status inválido. Use: {', '.join(VALID_STATUSES)}"
+        )
+
+    try:
+        quests, next_cursor = await db.get_quests_page(status, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+
+    return {
+        "items": quests,
+        "next_cursor": next_cursor
+    }
+
+# Resumo de todas as quests para a tela principal (uma única consulta)
+@app.get("/quests/summary", response_model = List[QuestSummary])
+async def get_quests_summary():
+    summaries = await db.get_quests_summary()
 
-    return quests
+    return summaries
 
 # Retornar quest especifica
 @app.get("/quests/{quest_id}", response_model = QuestWithCheckpoints)
-async def get_quest_details(quest_id: int):
-    quest = await db.get_quest(quest_id)
+async def get_quest_details(quest_id: int, include_archived: bool = False):
+    quest = await db.get_quest(quest_id, include_archived)
 
     if not quest:
         raise HTTPException(
@@ -113,7 +209,7 @@ async def get_quest_details(quest_id: int):
             detail = "Quest não encontrada"
         )
     
-    checkpoints = await db.get_checkpoints_by_quest(quest_id)
+    checkpoints = await db.get_checkpoints_by_quest(quest_id, archived = bool(quest.get("archived")))
 
     return {
         "quest": quest,
@@ -128,11 +224,13 @@ async def update_quest_sync(quest_id: int, is_syncing: bool):
         raise HTTPException(status_code=404, detail="Quest não encontrada")
         
     await db.update_quest_sync(quest_id, is_syncing)
+    # Registra a música atual logo, sem esperar o próximo ciclo do tracker
+    get_playback_tracker().wake()
     updated_quest = await db.get_quest(quest_id)
     return updated_quest
 
 # Retorna estatisticas
-@app.get("/quests/{quest_id}/stats", response_model = dict)
+@app.get("/quests/{quest_id}/stats", response_model = QuestStats)
 async def get_quest_stats(quest_id: int):
     quest = await db.get_quest(quest_id)
 
@@ -142,12 +240,7 @@ async def get_quest_stats(quest_id: int):
             detail = "Quest não encontrada"
         )
     
-    stats = await db.get_quest_stats(quest_id)
-
-    return {
-        "quest": quest,
-        **stats
-    }
+    return await db.get_quest_stats(quest_id)
 
 # Atualizar dados básicos da quest (título/descrição)
 @app.patch("/quests/{quest_id}", response_model=Quest)
@@ -192,31 +285,34 @@ async def delete_checkpoint(checkpoint_id: int):
 # Atualiza status da quest
 @app.patch('/quests/{quest_id}/status')
 async def update_quest_status(quest_id: int, status: str):
-    valid_statuses = ["active", "paused", "completed"]
-
-    if status not in valid_statuses:
+    if status not in VALID_STATUSES:
         raise HTTPException(
             status_code = 400,
-            detail = f"Status inválido. Use: {', '.join(valid_statuses)}"
+            detail = f"Status inválido. Use: {', '.join(VALID_STATUSES)}"
         )
     
-    quest = await db.get_quest(quest_id)
+    # Concluir: status, XP e contador numa única transação
+    if status == "completed":
+        result = await db.complete_quest(quest_id)
+        if result is None:
+            raise HTTPException(
+                status_code = 404,
+                detail = "Quest não encontrada"
+            )
 
-    if not quest:
+        if not result["already_completed"]:
+            get_event_bus().publish(QUEST_STATUS_CHANGED, {"quest_id": quest_id, "status": status})
+            get_event_bus().publish(XP_CHANGED, result["xp"])
+
+        return {"message": "Status atualizado"}
+
+    if not await db.update_quest_status(quest_id, status):
         raise HTTPException(
             status_code = 404,
             detail = "Quest não encontrada"
         )
-    
-    await db.update_quest_status(quest_id, status)
 
-    # Se completou, dar XP
-    print(f">>> UPDATE STATUS: Checking completion. Status={status}")
-    if status == "completed":
-        print(f">>> QUEST COMPLETED! Awarding XP...")
-        await db.add_xp(25)
-        await db.increment_quests_completed()
-        print(f">>> XP AWARDED and COUNT INCREMENTED")
+    get_event_bus().publish(QUEST_STATUS_CHANGED, {"quest_id": quest_id, "status": status})
 
     return {"message": "Status atualizado"}
 
@@ -264,32 +360,53 @@ async def create_checkpoint(quest_id: int, checkpoint: CheckpointCreate):
         "message": "Checkpoint criado com sucesso!"
     }
 
+# Substituir a lista de checkpoints (criar, renomear, reordenar e remover) de uma vez
+@app.put("/quests/{quest_id}/checkpoints", response_model = List[Checkpoint])
+async def replace_checkpoints(quest_id: int, update: CheckpointListUpdate):
+    try:
+        checkpoints = await db.replace_checkpoints(
+            quest_id,
+            [checkpoint.model_dump() for checkpoint in update.checkpoints]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+
+    if checkpoints is None:
+        raise HTTPException(
+            status_code = 404,
+            detail = "Quest não encontrada"
+        )
+
+    return checkpoints
+
 # Marcar um checkpoint como compelto
 @app.patch("/checkpoints/{checkpoint_id}/complete")
 async def complete_checkpoint(checkpoint_id: int):
-    checkpoint = await db.get_checkpoint(checkpoint_id)
+    # Conclusão e XP numa única transação
+    result = await db.complete_checkpoint_with_xp(checkpoint_id)
 
-    if not checkpoint:
+    if result is None:
         raise HTTPException(
             status_code = 404,
             detail = "Checkpoint não encontrado"
         )
     
-    if checkpoint["completed"]:
+    if result["already_completed"]:
         return {
             "message": "Checkpoint já está completo!",
             "checkpoint_id": checkpoint_id
         }
-    
-    await db.complete_checkpoint(checkpoint_id)
-    
-    # Award 5 XP per checkpoint
-    await db.add_xp(5)
+
+    get_event_bus().publish(CHECKPOINT_COMPLETED, {
+        "checkpoint_id": checkpoint_id,
+        "quest_id": result["quest_id"]
+    })
+    get_event_bus().publish(XP_CHANGED, result["xp"])
 
     return {
         "message": "Checkpoint completo!",
         "checkpoint_id": checkpoint_id,
-        "completed_at": datetime.now().isoformat()    
+        "completed_at": result["completed_at"]
     }
 
 # Retornar todas as musicas tocadas
@@ -311,6 +428,146 @@ async def get_checkpoint_music(checkpoint_id: int):
         "total_songs": len(music_sessions)
     }
 
+# ================
+# Endpoint EXPORT / IMPORT (NDJSON em streaming)
+
+# Exporta quests, checkpoints, músicas e stats, uma linha JSON por registro
+@app.get("/export")
+async def export_data():
+    filename = f"codequest-{datetime.now():%Y%m%d-%H%M%S}.ndjson"
+
+    return StreamingResponse(
+        export_ndjson(),
+        media_type = "application/x-ndjson",
+        headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Importa um arquivo gerado pelo /export (ids remapeados, gravação em lotes)
+@app.post("/import")
+async def import_data(request: Request, restore_stats: bool = False):
+    try:
+        return await import_ndjson(request.stream(), restore_stats)
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+
+# ================
+# Endpoint ARCHIVE (quests antigas saem das tabelas quentes)
+
+async def _archive_job(ctx: JobContext) -> dict:
+    return await db.archive_quests(ctx.payload["older_than_days"])
+
+get_job_queue().register("archive", _archive_job, concurrency = 1, max_attempts = 3)
+
+# Enfileira o arquivamento das quests concluídas, com loot resgatado, há mais
+# de `older_than_days` dias (leitura com include_archived=true). O resultado
+# (linhas movidas por tabela) sai no job
+@app.post("/archive", response_model = Job, status_code = 202)
+async def archive_quests(older_than_days: int = Query(db.ARCHIVE_AFTER_DAYS, ge = 0)):
+    job, _ = await get_job_queue().enqueue("archive", {"older_than_days": older_than_days}, dedupe_key = "archive")
+    return job
+
+# ================
+# Endpoint BACKUP (cópia online com a API de backup do SQLite)
+
+# Estado do backup atual/último, último job e snapshots guardados
+@app.get("/backup/status")
+async def get_backup_status():
+    status = await asyncio.to_thread(get_backup_manager().status)
+    status["job"] = await db.get_latest_job("backup")
+    return status
+
+# Enfileira um backup agora (ou retorna o que já está na fila/rodando)
+@app.post("/backup", response_model = Job, status_code = 202)
+async def trigger_backup():
+    job, _ = await get_backup_manager().enqueue()
+    return job
+
+# ================
+# Endpoint JOBS (fila em background)
+
+@app.get("/jobs", response_model = List[Job])
+async def list_jobs(
+    status: Optional[str] = Query(None, pattern = "^(queued|running|succeeded|failed)$"),
+    type: Optional[str] = None,
+    limit: int = Query(50, ge = 1, le = 500)
+):
+    return await db.list_jobs(status, type, limit)
+
+@app.get("/jobs/{job_id}", response_model = Job)
+async def get_job(job_id: int):
+    job = await db.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code = 404, detail = "Job não encontrado")
+    return job
+
+# ================
+# Endpoint ANALYTICS (lê só os rollups de escuta)
+
+# Minutos ouvidos por dia nos últimos `days` dias
+@app.get("/analytics/daily", response_model = List[DailyListening])
+async def get_daily_listening(days: int = Query(30, ge = 1, le = 366)):
+    return await db.get_daily_listening(days)
+
+# Artistas e faixas mais ouvidos em todas as quests
+@app.get("/analytics/top", response_model = TopListening)
+async def get_top_listening(limit: int = Query(10, ge = 1, le = 100)):
+    return await db.get_top_listening(limit)
+
+# Analytics de uma quest: por dia, mais ouvidos e foco por checkpoint
+@app.get("/quests/{quest_id}/analytics", response_model = QuestAnalytics)
+async def get_quest_analytics(
+    quest_id: int,
+    days: int = Query(30, ge = 1, le = 366),
+    limit: int = Query(10, ge = 1, le = 100)
+):
+    quest = await db.get_quest(quest_id)
+    if not quest:
+        raise HTTPException(
+            status_code = 404,
+            detail = "Quest não encontrada"
+        )
+
+    stats = await db.get_quest_stats(quest_id)
+    top = await db.get_top_listening(limit, quest_id)
+
+    return {
+        "quest_id": quest_id,
+        "total_minutes": stats["total_time_minutes"],
+        "total_songs_played": stats["total_songs_played"],
+        "daily": await db.get_daily_listening(days, quest_id),
+        "top_artists": top["top_artists"],
+        "top_tracks": top["top_tracks"],
+        "checkpoints": await db.get_checkpoint_focus(quest_id)
+    }
+
+# ================
+# Endpoint BUSCA
+
+# Busca em quests, checkpoints e histórico de músicas (FTS5), por tipo e relevância
+@app.get("/search", response_model = SearchPage)
+async def search(
+    q: str,
+    type: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge = 1, le = 100),
+    offset: int = Query(0, ge = 0)
+):
+    if type and any(t not in db.SEARCH_TYPES for t in type):
+        raise HTTPException(
+            status_code = 400,
+            detail = f"Tipo inválido. Use: {', '.join(db.SEARCH_TYPES)}"
+        )
+
+    try:
+        items, next_offset = await db.search(q, type, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+
+    return {
+        "query": q,
+        "items": items,
+        "next_offset": next_offset
+    }
+
 # ================
 # Endpoint MUSIC
 
@@ -334,52 +591,140 @@ async def track_music(request: MusicTrackRequest):
         request.duration_ms
     )
 
+    get_event_bus().publish(MUSIC_TRACKED, {
+        "id": session_id,
+        "quest_id": checkpoint["quest_id"],
+        "checkpoint_id": request.checkpoint_id,
+        "spotify_uri": request.spotify_uri
+    })
+
     return {
         "id": session_id,
         "message": f"Musica registrada: {request.track_name} - {request.artist}"
     }
 
-# Retornar todas as musicas durante a quest
+# Registrar várias músicas de uma vez (ex.: histórico acumulado offline)
+@app.post("/music/tracks/batch", response_model = MusicTrackBatchResult)
+async def track_music_batch(batch: MusicTrackBatch):
+    if len(batch.tracks) > MAX_TRACK_BATCH:
+        raise HTTPException(
+            status_code = 400,
+            detail = f"Máximo de {MAX_TRACK_BATCH} músicas por lote"
+        )
+
+    if not batch.tracks:
+        return {"inserted": 0, "ids": [], "errors": []}
+
+    inserted, errors = await db.create_music_sessions([track.model_dump() for track in batch.tracks])
+
+    ids = [None] * len(batch.tracks)
+    # Um evento por checkpoint afetado, com a última música do lote
+    latest_by_checkpoint = {}
+    for index, session_id, quest_id in inserted:
+        ids[index] = session_id
+        track = batch.tracks[index]
+        latest_by_checkpoint[track.checkpoint_id] = {
+            "id": session_id,
+            "quest_id": quest_id,
+            "checkpoint_id": track.checkpoint_id,
+            "spotify_uri": track.spotify_uri
+        }
+
+    for event in latest_by_checkpoint.values():
+        get_event_bus().publish(MUSIC_TRACKED, event)
+
+    return {
+        "inserted": len(inserted),
+        "ids": ids,
+        "errors": [
+            {"index": index, "checkpoint_id": batch.tracks[index].checkpoint_id, "detail": detail}
+            for index, detail in sorted(errors.items())
+        ]
+    }
+
+# Retornar as músicas únicas da quest (agregadas no SQL), com contagem de
+# plays, primeira/última vez e tempo ouvido. A resposta sai em streaming;
+# sem `limit` vem a playlist inteira
 @app.get("/quests/{quest_id}/playlist")
-async def get_quest_playlist(quest_id: int):
-    quest = await db.get_quest(quest_id)
+async def get_quest_playlist(
+    quest_id: int,
+    include_archived: bool = False,
+    limit: Optional[int] = Query(None, ge = 1, le = MAX_PLAYLIST_PAGE),
+    offset: int = Query(0, ge = 0)
+):
+    quest = await db.get_quest(quest_id, include_archived)
 
     if not quest:
         raise HTTPException(
             status_code = 404,
             detail = "Quest não encontrada"
         )
-    
-    music_sessions = await db.get_music_by_quest(quest_id)
 
-    # Remover duplicada
-    unique_tracks = {}
+    archived = bool(quest.get("archived"))
+    unique_songs = await db.count_quest_unique_tracks(quest_id, archived)
+
+    async def body():
+        header = json.dumps({
+            "quest": quest,
+            "total_songs_played": quest["songs_played"],
+            "unique_songs": unique_songs,
+            "limit": limit,
+            "offset": offset
+        }, ensure_ascii = False, default = str)
+        yield (header[:-1] + ', "playlist": [').encode("utf-8")
+
+        first = True
+        async for tracks in db.stream_quest_playlist(quest_id, archived, limit, offset):
+            chunk = ",".join(json.dumps(track, ensure_ascii = False) for track in tracks)
+            yield (chunk if first else "," + chunk).encode("utf-8")
+            first = False
+
+        yield b"]}"
+
+    return StreamingResponse(body(), media_type = "application/json")
+
+# Envia para a playlist da quest no Spotify (criada no primeiro sync) só as
+# faixas que ainda não estão lá. Roda como job; progresso pelo GET, pelo
+# /jobs/{id} e pelo evento playlist_sync_progress
+@app.post("/quests/{quest_id}/playlist/sync", response_model = Job, status_code = 202)
+async def sync_quest_playlist(quest_id: int, playlist_name: Optional[str] = None):
+    quest = await db.get_quest(quest_id)
+    if not quest:
+        raise HTTPException(status_code = 404, detail = "Quest não encontrada")
 
-    for session in music_sessions:
-        uri = session["spotify_uri"]
+    if not await get_spotify_service().is_authenticated():
+        raise HTTPException(status_code = 401, detail = "Usuário não autenticado")
 
-        if uri not in unique_tracks:
-            unique_tracks[uri] = session
+    # Se já há um sync na fila/rodando para a quest, retorna ele
+    job, _ = await get_playlist_sync().start_sync(quest_id, playlist_name or f"CodeQuest - {quest['title']}")
+    return job
 
-    return {
-        "quest": quest,
-        "total_songs_played": len(music_sessions),
-        "unique_songs": len(unique_tracks),
-        "playlist": list(unique_tracks.values())
+# Estado do sync da playlist: último job e o que já está na playlist
+@app.get("/quests/{quest_id}/playlist/sync")
+async def get_quest_playlist_sync(quest_id: int):
+    state = await db.get_playlist_sync_state(quest_id)
+    if not state:
+        raise HTTPException(status_code = 404, detail = "Quest não encontrada")
 
+    return {
+        "quest_id": quest_id,
+        "playlist_id": state["spotify_playlist_id"],
+        "playlist_url": state["spotify_playlist_url"],
+        "snapshot_id": state["spotify_snapshot_id"],
+        "pushed_tracks": state["pushed_tracks"],
+        "job": await get_playlist_sync().status(quest_id)
     }
 
 # Marcar loot como resgatado
 @app.post("/quests/{quest_id}/retrieve_loot", response_model=Quest)
 async def retrieve_quest_loot(quest_id: int):
-    print(f">>> RETRIEVE_LOOT CHAMADO PARA QUEST {quest_id}")
     quest = await db.get_quest(quest_id)
     if not quest:
         raise HTTPException(status_code=404, detail="Quest não encontrada")
     
     await db.update_quest_loot_retrieved(quest_id, True)
     updated = await db.get_quest(quest_id)
-    print(f">>> LOOT ATUALIZADO! loot_retrieved={updated.get('loot_retrieved')}")
+    logger.debug("Loot da quest %s resgatado", quest_id)
     
     return updated
 
@@ -390,31 +735,6 @@ async def get_user_stats():
     stats = await db.get_user_stats()
     return stats
 
-@app.get('/spotify/user-tier')
-async def get_user_tier():
-    """
-    Retorna o tier do usuário Spotify (premium ou free)
-    """
-    token = await db.get_spotify_token()
-    if not token:
-        raise HTTPException(status_code=401, detail="Não autenticado no Spotify")
-    
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get("https://api.spotify.com/v1/me", headers=headers)
-    
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code, 
-            detail="Erro ao buscar dados do usuário"
-        )
-    
-    user_data = response.json()
-    product = user_data.get("product", "free")  # "premium" ou "free"
-    
-    return {
-        "tier": product,
-        "is_premium": product == "premium"
-    }
 if __name__ == "__main__":
     import uvicorn
     
@@ -427,5 +747,9 @@ if __name__ == "__main__":
         port=8000,
         reload=not is_frozen,
         log_level="info",
-        use_colors=not is_frozen
+        use_colors=not is_frozen,
+        # Logs do uvicorn passam pelo setup_logging; o acesso é registrado
+        # pelo RequestIdMiddleware (com id e duração)
+        log_config=None,
+        access_log=False
     )
@@ -0,0 +1,279 @@
+import time
+import bisect
+import functools
+import inspect
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Métricas em memória no formato texto do Prometheus (GET /metrics).
+# Registrar uma amostra é só somar num dicionário; o texto só é montado
+# quando alguém lê o endpoint
+
+# Limites dos histogramas de latência (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Escritas agrupadas por commit no pool SQLite
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# O Starlette acrescenta o charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+STARTED_AT = time.time()
+
+# Chamadas ao banco acima disso viram aviso no log (segundos)
+SLOW_DB_CALL = 0.5
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def _label_text(self, values: Tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._label_text(labels)} {_number(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    # Valor lido na hora da coleta (sem custo por requisição)
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, collect: Callable[[], float]):
+        super().__init__(name, help)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_number(self.collect())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagem por faixa (+Inf no fim), soma]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = self._label_text(labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# ================
+# Métricas da API
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "codequest_http_requests_total", "Requisições HTTP por rota e status", ("method", "route", "status")
+))
+http_latency = registry.register(Histogram(
+    "codequest_http_request_duration_seconds", "Latência até o início da resposta, por rota", ("method", "route")
+))
+db_calls = registry.register(Histogram(
+    "codequest_db_call_duration_seconds", "Duração das chamadas ao database.py, por função", ("function",)
+))
+db_errors = registry.register(Counter(
+    "codequest_db_errors_total", "Chamadas ao database.py que terminaram em exceção", ("function",)
+))
+db_write_batch = registry.register(Histogram(
+    "codequest_db_write_batch_size", "Escritas agrupadas em cada commit do pool", buckets=BATCH_BUCKETS
+))
+spotify_latency = registry.register(Histogram(
+    "codequest_spotify_request_duration_seconds", "Duração das chamadas HTTP ao Spotify", ("method", "endpoint")
+))
+spotify_responses = registry.register(Counter(
+    "codequest_spotify_responses_total", "Respostas do Spotify por status (inclui 429)", ("endpoint", "status")
+))
+spotify_errors = registry.register(Counter(
+    "codequest_spotify_errors_total", "Chamadas ao Spotify sem resposta (erro de rede)", ("endpoint",)
+))
+registry.register(Gauge(
+    "codequest_uptime_seconds", "Tempo desde que o processo subiu", lambda: time.time() - STARTED_AT
+))
+
+
+def get_registry() -> Registry:
+    return registry
+
+
+# ================
+# Instrumentação
+
+# Envolve as funções async públicas de um módulo (database.py) para medir
+# duração e erros de cada uma
+def instrument_module(namespace: Dict, exclude: Sequence[str] = ()):
+    for name, func in list(namespace.items()):
+        if name.startswith("_") or name in exclude or getattr(func, "__module__", None) != namespace["__name__"]:
+            continue
+        if inspect.iscoroutinefunction(func):
+            namespace[name] = _timed(func)
+        elif inspect.isasyncgenfunction(func):
+            namespace[name] = _timed_stream(func)
+
+
+def _timed(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            db_errors.inc(name)
+            raise
+        finally:
+            _observe_db(name, time.perf_counter() - started)
+
+    return wrapper
+
+
+def _timed_stream(func):
+    # Geradores: mede do início até o último lote (inclui quem consome)
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        stream = func(*args, **kwargs)
+        try:
+            async for item in stream:
+                yield item
+        except Exception:
+            db_errors.inc(name)
+            raise
+        finally:
+            # Fecha já o gerador original (devolve a conexão ao pool)
+            await stream.aclose()
+            _observe_db(name, time.perf_counter() - started)
+
+    return wrapper
+
+
+def _observe_db(name: str, duration: float):
+    db_calls.observe(duration, name)
+    if duration >= SLOW_DB_CALL:
+        logger.warning("Chamada lenta ao banco: %s (%.0f ms)", name, duration * 1000)
+
+
+class MetricsMiddleware:
+    # Middleware ASGI: latência e status por rota. Usa o caminho da rota
+    # ("/quests/{quest_id}") e não o da URL, para não criar uma série por id.
+    # A latência vai até o início da resposta (streams e SSE não inflam)
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[Callable, str]] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            method = scope["method"]
+            route = self._route(scope)
+            http_latency.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, str(status))
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                record()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+
+        if self._routes is None:
+            app = scope["app"]
+            self._routes = {
+                route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")
+            }
+        return self._routes.get(endpoint, getattr(endpoint, "__name__", "unknown"))
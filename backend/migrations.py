@@ -0,0 +1,666 @@
+import sqlite3
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# ================
+# MIGRAÇÕES
+#
+# Cada migração recebe um cursor e roda dentro da sua própria transação.
+# A versão aplicada fica registrada em schema_version; nunca altere uma
+# migração já publicada, adicione uma nova no final da lista.
+
+def _column_exists(cursor: sqlite3.Cursor, table: str, column: str) -> bool:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+def _add_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    if not _column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+# 1: tabelas base
+def _create_base_schema(cursor: sqlite3.Cursor):
+    # Tabela QUESTS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS quests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            status TEXT DEFAULT 'active',
+            is_syncing INTEGER DEFAULT 0,
+            loot_retrieved INTEGER DEFAULT 0
+        )
+    """)
+
+    # Tabela CHECKPOINTS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quest_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            order_index INTEGER NOT NULL,
+            completed BOOLEAN DEFAULT 0,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (quest_id) REFERENCES quests(id) ON DELETE CASCADE
+        )
+    """)
+
+    # Tabela MUSIC_SESSIONS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS music_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            checkpoint_id INTEGER NOT NULL,
+            track_name TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            album TEXT,
+            spotify_uri TEXT NOT NULL,
+            played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER,
+            FOREIGN KEY (checkpoint_id) REFERENCES checkpoints(id) ON DELETE CASCADE
+        )
+    """)
+
+    # Tabela USER_STATS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            id INTEGER PRIMARY KEY DEFAULT 1,
+            level INTEGER DEFAULT 1,
+            xp INTEGER DEFAULT 0,
+            xp_to_next_level INTEGER DEFAULT 50,
+            quests_completed INTEGER DEFAULT 0
+        )
+    """)
+
+# 2: colunas adicionadas depois da primeira versão (bancos antigos)
+def _add_late_columns(cursor: sqlite3.Cursor):
+    _add_column(cursor, "quests", "is_syncing", "INTEGER DEFAULT 0")
+    _add_column(cursor, "quests", "loot_retrieved", "INTEGER DEFAULT 0")
+    _add_column(cursor, "user_stats", "xp_to_next_level", "INTEGER DEFAULT 50")
+    _add_column(cursor, "user_stats", "quests_completed", "INTEGER DEFAULT 0")
+
+    # Inicializa user stats se não existir
+    cursor.execute("INSERT OR IGNORE INTO user_stats (id, level, xp, xp_to_next_level, quests_completed) VALUES (1, 1, 0, 50, 0)")
+
+# 3: índices para as buscas por quest/checkpoint
+def _create_lookup_indexes(cursor: sqlite3.Cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_quest_order ON checkpoints(quest_id, order_index)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_music_sessions_checkpoint_played ON music_sessions(checkpoint_id, played_at)")
+
+# 4: paginação por (created_at, id), com ou sem filtro de status
+def _create_quest_listing_indexes(cursor: sqlite3.Cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quests_created ON quests(created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quests_status_created ON quests(status, created_at, id)")
+
+# Recalcula os contadores materializados a partir das tabelas de origem.
+# Com with_archive, o total de músicas do usuário inclui archive.music_sessions.
+# Retorna quantos valores estavam divergentes (0 = tudo consistente)
+def recount_counters(cursor: sqlite3.Cursor, with_archive: bool = False) -> int:
+    fixed = 0
+
+    cursor.execute("""
+        UPDATE checkpoints SET songs_played = (
+            SELECT COUNT(*) FROM music_sessions m WHERE m.checkpoint_id = checkpoints.id
+        )
+        WHERE songs_played IS NOT (
+            SELECT COUNT(*) FROM music_sessions m WHERE m.checkpoint_id = checkpoints.id
+        )
+    """)
+    fixed += cursor.rowcount
+
+    quest_counts = {
+        "total_checkpoints": "SELECT COUNT(*) FROM checkpoints c WHERE c.quest_id = quests.id",
+        "completed_checkpoints": "SELECT COUNT(*) FROM checkpoints c WHERE c.quest_id = quests.id AND c.completed = 1",
+        "songs_played": "SELECT COALESCE(SUM(c.songs_played), 0) FROM checkpoints c WHERE c.quest_id = quests.id",
+    }
+    for column, count in quest_counts.items():
+        cursor.execute(f"UPDATE quests SET {column} = ({count}) WHERE {column} IS NOT ({count})")
+        fixed += cursor.rowcount
+
+    songs = "(SELECT COUNT(*) FROM main.music_sessions)"
+    if with_archive:
+        songs = f"({songs} + (SELECT COUNT(*) FROM archive.music_sessions))"
+    cursor.execute(f"""
+        UPDATE user_stats SET total_songs_played = {songs}
+        WHERE id = 1 AND total_songs_played IS NOT {songs}
+    """)
+    fixed += cursor.rowcount
+
+    return fixed
+
+# 5: contadores materializados mantidos por triggers (stats sem COUNT(*))
+def _create_stat_counters(cursor: sqlite3.Cursor):
+    _add_column(cursor, "user_stats", "total_songs_played", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cursor, "quests", "total_checkpoints", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cursor, "quests", "completed_checkpoints", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cursor, "quests", "songs_played", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cursor, "checkpoints", "songs_played", "INTEGER NOT NULL DEFAULT 0")
+
+    # Checkpoints -> quests
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_checkpoints_insert_counters
+        AFTER INSERT ON checkpoints
+        BEGIN
+            UPDATE quests SET
+                total_checkpoints = total_checkpoints + 1,
+                completed_checkpoints = completed_checkpoints + (NEW.completed = 1),
+                songs_played = songs_played + NEW.songs_played
+            WHERE id = NEW.quest_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_checkpoints_delete_counters
+        AFTER DELETE ON checkpoints
+        BEGIN
+            UPDATE quests SET
+                total_checkpoints = total_checkpoints - 1,
+                completed_checkpoints = completed_checkpoints - (OLD.completed = 1),
+                songs_played = songs_played - OLD.songs_played
+            WHERE id = OLD.quest_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_checkpoints_completed_counters
+        AFTER UPDATE OF completed ON checkpoints
+        WHEN (NEW.completed = 1) IS NOT (OLD.completed = 1)
+        BEGIN
+            UPDATE quests SET
+                completed_checkpoints = completed_checkpoints + (NEW.completed = 1) - (OLD.completed = 1)
+            WHERE id = NEW.quest_id;
+        END
+    """)
+
+    # Music sessions -> checkpoint, quest e user_stats. Quando a sessão some
+    # em cascata o checkpoint já foi removido, e o trigger de delete do
+    # checkpoint desconta as músicas dele da quest
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_music_sessions_insert_counters
+        AFTER INSERT ON music_sessions
+        BEGIN
+            UPDATE checkpoints SET songs_played = songs_played + 1 WHERE id = NEW.checkpoint_id;
+            UPDATE quests SET songs_played = songs_played + 1
+            WHERE id = (SELECT quest_id FROM checkpoints WHERE id = NEW.checkpoint_id);
+            UPDATE user_stats SET total_songs_played = total_songs_played + 1 WHERE id = 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_music_sessions_delete_counters
+        AFTER DELETE ON music_sessions
+        BEGIN
+            UPDATE checkpoints SET songs_played = songs_played - 1 WHERE id = OLD.checkpoint_id;
+            UPDATE quests SET songs_played = songs_played - 1
+            WHERE id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id);
+            UPDATE user_stats SET total_songs_played = total_songs_played - 1 WHERE id = 1;
+        END
+    """)
+
+    # Preenche os contadores com o histórico já existente
+    recount_counters(cursor)
+
+# 6: XP acumulado total (o nível passa a ser derivado dele em forma fechada)
+def _add_total_xp(cursor: sqlite3.Cursor):
+    _add_column(cursor, "user_stats", "total_xp", "INTEGER NOT NULL DEFAULT 0")
+
+    # XP para chegar ao nível atual (50, +25 por nível) + progresso no nível
+    cursor.execute("""
+        UPDATE user_stats
+        SET total_xp = (level - 1) * (100 + 25 * (level - 2)) / 2 + xp
+    """)
+
+# 7: busca textual (FTS5) em quests, checkpoints e músicas. Tabelas de
+# conteúdo externo: o índice não duplica o texto, os triggers o mantêm
+FTS_TABLES = [
+    # (tabela fts, tabela de origem, colunas)
+    ("quests_fts", "quests", ("title", "description")),
+    ("checkpoints_fts", "checkpoints", ("title",)),
+    ("music_sessions_fts", "music_sessions", ("track_name", "artist", "album")),
+]
+
+def _create_search_index(cursor: sqlite3.Cursor):
+    for fts, source, columns in FTS_TABLES:
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"NEW.{column}" for column in columns)
+        old_values = ", ".join(f"OLD.{column}" for column in columns)
+
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {column_list},
+                content = '{source}',
+                content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{source}_fts_insert
+            AFTER INSERT ON {source}
+            BEGIN
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{source}_fts_delete
+            AFTER DELETE ON {source}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{source}_fts_update
+            AFTER UPDATE OF {column_list} ON {source}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+            END
+        """)
+
+        # Indexa o que já existe
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+# Reconstrói os rollups de escuta a partir de music_sessions
+def rebuild_listening_rollups(cursor: sqlite3.Cursor):
+    for table in ("listening_daily", "listening_artists", "listening_tracks"):
+        cursor.execute(f"DELETE FROM {table}")
+
+    cursor.execute("""
+        INSERT INTO listening_daily (quest_id, day, plays, duration_ms)
+        SELECT c.quest_id, date(m.played_at, 'localtime'), COUNT(*), COALESCE(SUM(m.duration_ms), 0)
+        FROM music_sessions m JOIN checkpoints c ON c.id = m.checkpoint_id
+        GROUP BY c.quest_id, date(m.played_at, 'localtime')
+    """)
+    cursor.execute("""
+        INSERT INTO listening_artists (quest_id, artist, plays, duration_ms)
+        SELECT c.quest_id, m.artist, COUNT(*), COALESCE(SUM(m.duration_ms), 0)
+        FROM music_sessions m JOIN checkpoints c ON c.id = m.checkpoint_id
+        GROUP BY c.quest_id, m.artist
+    """)
+    cursor.execute("""
+        INSERT INTO listening_tracks (quest_id, spotify_uri, track_name, artist, plays, duration_ms)
+        SELECT c.quest_id, m.spotify_uri, MAX(m.track_name), MAX(m.artist), COUNT(*), COALESCE(SUM(m.duration_ms), 0)
+        FROM music_sessions m JOIN checkpoints c ON c.id = m.checkpoint_id
+        GROUP BY c.quest_id, m.spotify_uri
+    """)
+
+    cursor.execute("""
+        UPDATE checkpoints SET
+            listened_ms = (SELECT COALESCE(SUM(duration_ms), 0) FROM music_sessions m WHERE m.checkpoint_id = checkpoints.id),
+            first_played_at = (SELECT MIN(played_at) FROM music_sessions m WHERE m.checkpoint_id = checkpoints.id)
+    """)
+    cursor.execute("""
+        UPDATE quests SET
+            listened_ms = (SELECT COALESCE(SUM(c.listened_ms), 0) FROM checkpoints c WHERE c.quest_id = quests.id)
+    """)
+
+# 8: rollups de escuta (por dia, artista e faixa de cada quest) mantidos por triggers
+def _create_listening_rollups(cursor: sqlite3.Cursor):
+    _add_column(cursor, "checkpoints", "listened_ms", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cursor, "checkpoints", "first_played_at", "TIMESTAMP")
+    _add_column(cursor, "quests", "listened_ms", "INTEGER NOT NULL DEFAULT 0")
+
+    # O dia é o local (o backend roda na máquina do usuário)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS listening_daily (
+            quest_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            plays INTEGER NOT NULL DEFAULT 0,
+            duration_ms INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quest_id, day),
+            FOREIGN KEY (quest_id) REFERENCES quests(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_listening_daily_day ON listening_daily(day)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS listening_artists (
+            quest_id INTEGER NOT NULL,
+            artist TEXT NOT NULL,
+            plays INTEGER NOT NULL DEFAULT 0,
+            duration_ms INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quest_id, artist),
+            FOREIGN KEY (quest_id) REFERENCES quests(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS listening_tracks (
+            quest_id INTEGER NOT NULL,
+            spotify_uri TEXT NOT NULL,
+            track_name TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            plays INTEGER NOT NULL DEFAULT 0,
+            duration_ms INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quest_id, spotify_uri),
+            FOREIGN KEY (quest_id) REFERENCES quests(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_music_sessions_insert_rollups
+        AFTER INSERT ON music_sessions
+        BEGIN
+            INSERT INTO listening_daily (quest_id, day, plays, duration_ms)
+            SELECT quest_id, date(NEW.played_at, 'localtime'), 1, COALESCE(NEW.duration_ms, 0)
+            FROM checkpoints WHERE id = NEW.checkpoint_id
+            ON CONFLICT (quest_id, day) DO UPDATE SET
+                plays = plays + 1, duration_ms = duration_ms + excluded.duration_ms;
+
+            INSERT INTO listening_artists (quest_id, artist, plays, duration_ms)
+            SELECT quest_id, NEW.artist, 1, COALESCE(NEW.duration_ms, 0)
+            FROM checkpoints WHERE id = NEW.checkpoint_id
+            ON CONFLICT (quest_id, artist) DO UPDATE SET
+                plays = plays + 1, duration_ms = duration_ms + excluded.duration_ms;
+
+            INSERT INTO listening_tracks (quest_id, spotify_uri, track_name, artist, plays, duration_ms)
+            SELECT quest_id, NEW.spotify_uri, NEW.track_name, NEW.artist, 1, COALESCE(NEW.duration_ms, 0)
+            FROM checkpoints WHERE id = NEW.checkpoint_id
+            ON CONFLICT (quest_id, spotify_uri) DO UPDATE SET
+                plays = plays + 1, duration_ms = duration_ms + excluded.duration_ms;
+
+            UPDATE checkpoints SET
+                listened_ms = listened_ms + COALESCE(NEW.duration_ms, 0),
+                first_played_at = MIN(COALESCE(first_played_at, NEW.played_at), NEW.played_at)
+            WHERE id = NEW.checkpoint_id;
+
+            UPDATE quests SET listened_ms = listened_ms + COALESCE(NEW.duration_ms, 0)
+            WHERE id = (SELECT quest_id FROM checkpoints WHERE id = NEW.checkpoint_id);
+        END
+    """)
+
+    # Remoção avulsa de uma sessão. Na remoção em cascata o checkpoint já
+    # não existe e quem desconta é o trigger de checkpoints abaixo
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_music_sessions_delete_rollups
+        AFTER DELETE ON music_sessions
+        BEGIN
+            UPDATE listening_daily SET plays = plays - 1, duration_ms = duration_ms - COALESCE(OLD.duration_ms, 0)
+            WHERE quest_id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id)
+              AND day = date(OLD.played_at, 'localtime');
+            UPDATE listening_artists SET plays = plays - 1, duration_ms = duration_ms - COALESCE(OLD.duration_ms, 0)
+            WHERE quest_id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id)
+              AND artist = OLD.artist;
+            UPDATE listening_tracks SET plays = plays - 1, duration_ms = duration_ms - COALESCE(OLD.duration_ms, 0)
+            WHERE quest_id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id)
+              AND spotify_uri = OLD.spotify_uri;
+
+            DELETE FROM listening_daily WHERE plays <= 0 AND quest_id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id);
+            DELETE FROM listening_artists WHERE plays <= 0 AND quest_id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id);
+            DELETE FROM listening_tracks WHERE plays <= 0 AND quest_id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id);
+
+            UPDATE checkpoints SET
+                listened_ms = listened_ms - COALESCE(OLD.duration_ms, 0),
+                first_played_at = (SELECT MIN(played_at) FROM music_sessions WHERE checkpoint_id = OLD.checkpoint_id)
+            WHERE id = OLD.checkpoint_id;
+
+            UPDATE quests SET listened_ms = listened_ms - COALESCE(OLD.duration_ms, 0)
+            WHERE id = (SELECT quest_id FROM checkpoints WHERE id = OLD.checkpoint_id);
+        END
+    """)
+
+    # Antes de remover um checkpoint (as sessões ainda existem): desconta
+    # das agregações da quest tudo o que foi ouvido nele
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_checkpoints_delete_rollups
+        BEFORE DELETE ON checkpoints
+        BEGIN
+            UPDATE listening_daily SET
+                plays = plays - (SELECT COUNT(*) FROM music_sessions m
+                                 WHERE m.checkpoint_id = OLD.id AND date(m.played_at, 'localtime') = listening_daily.day),
+                duration_ms = duration_ms - (SELECT COALESCE(SUM(m.duration_ms), 0) FROM music_sessions m
+                                 WHERE m.checkpoint_id = OLD.id AND date(m.played_at, 'localtime') = listening_daily.day)
+            WHERE quest_id = OLD.quest_id
+              AND day IN (SELECT date(played_at, 'localtime') FROM music_sessions WHERE checkpoint_id = OLD.id);
+            UPDATE listening_artists SET
+                plays = plays - (SELECT COUNT(*) FROM music_sessions m
+                                 WHERE m.checkpoint_id = OLD.id AND m.artist = listening_artists.artist),
+                duration_ms = duration_ms - (SELECT COALESCE(SUM(m.duration_ms), 0) FROM music_sessions m
+                                 WHERE m.checkpoint_id = OLD.id AND m.artist = listening_artists.artist)
+            WHERE quest_id = OLD.quest_id
+              AND artist IN (SELECT artist FROM music_sessions WHERE checkpoint_id = OLD.id);
+            UPDATE listening_tracks SET
+                plays = plays - (SELECT COUNT(*) FROM music_sessions m
+                                 WHERE m.checkpoint_id = OLD.id AND m.spotify_uri = listening_tracks.spotify_uri),
+                duration_ms = duration_ms - (SELECT COALESCE(SUM(m.duration_ms), 0) FROM music_sessions m
+                                 WHERE m.checkpoint_id = OLD.id AND m.spotify_uri = listening_tracks.spotify_uri)
+            WHERE quest_id = OLD.quest_id
+              AND spotify_uri IN (SELECT spotify_uri FROM music_sessions WHERE checkpoint_id = OLD.id);
+
+            DELETE FROM listening_daily WHERE quest_id = OLD.quest_id AND plays <= 0;
+            DELETE FROM listening_artists WHERE quest_id = OLD.quest_id AND plays <= 0;
+            DELETE FROM listening_tracks WHERE quest_id = OLD.quest_id AND plays <= 0;
+
+            UPDATE quests SET listened_ms = listened_ms - OLD.listened_ms WHERE id = OLD.quest_id;
+        END
+    """)
+
+    rebuild_listening_rollups(cursor)
+
+# 9: playlist do Spotify de cada quest e faixas já enviadas a ela (sync incremental)
+def _create_playlist_sync(cursor: sqlite3.Cursor):
+    _add_column(cursor, "quests", "spotify_playlist_id", "TEXT")
+    _add_column(cursor, "quests", "spotify_playlist_url", "TEXT")
+    _add_column(cursor, "quests", "spotify_snapshot_id", "TEXT")
+    # Maior music_sessions.id já conferido pelo sync (o próximo só olha depois dele)
+    _add_column(cursor, "quests", "playlist_synced_session_id", "INTEGER NOT NULL DEFAULT 0")
+
+    # Gravada a cada lote enviado: um sync interrompido continua de onde parou
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS playlist_tracks (
+            quest_id INTEGER NOT NULL,
+            spotify_uri TEXT NOT NULL,
+            pushed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (quest_id, spotify_uri),
+            FOREIGN KEY (quest_id) REFERENCES quests(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+
+# 10: fila de jobs em background (ver jobs.py). Datas em UTC (datetime('now'))
+def _create_job_queue(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            dedupe_key TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_at TIMESTAMP NOT NULL DEFAULT (datetime('now')),
+            state TEXT,
+            progress TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT (datetime('now')),
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    # Próximo job a executar
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs(status, run_at, id)")
+    # No máximo um job ativo (na fila ou rodando) por chave
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_key ON jobs(dedupe_key)
+        WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+    """)
+
+# 11: colunas da playlist (migração 9) também no banco de arquivo. Só roda
+# com o arquivo anexado (o init_db anexa antes de migrar); um arquivo criado
+# ou anexado depois recebe as colunas pelo create_archive_schema
+def _add_archive_playlist_sync(cursor: sqlite3.Cursor):
+    cursor.execute("PRAGMA database_list")
+    if not any(row[1] == "archive" for row in cursor.fetchall()):
+        return
+    create_archive_schema(cursor)
+
+# ================
+# ARQUIVO
+#
+# Banco separado (anexado como `archive`) para quests concluídas há muito
+# tempo, com seus checkpoints, músicas e rollups. Mesmas colunas das tabelas
+# quentes, sem triggers: os contadores são copiados como estavam
+
+# Link e cursor da playlist do Spotify: a quest arquivada continua com a
+# mesma playlist (sem criar outra num sync futuro)
+ARCHIVE_PLAYLIST_COLUMNS = [
+    ("spotify_playlist_id", "TEXT"),
+    ("spotify_playlist_url", "TEXT"),
+    ("spotify_snapshot_id", "TEXT"),
+    ("playlist_synced_session_id", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+def create_archive_schema(cursor: sqlite3.Cursor, schema: str = "archive"):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.quests (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP,
+            completed_at TIMESTAMP,
+            status TEXT,
+            is_syncing INTEGER DEFAULT 0,
+            loot_retrieved INTEGER DEFAULT 0,
+            total_checkpoints INTEGER NOT NULL DEFAULT 0,
+            completed_checkpoints INTEGER NOT NULL DEFAULT 0,
+            songs_played INTEGER NOT NULL DEFAULT 0,
+            listened_ms INTEGER NOT NULL DEFAULT 0,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            spotify_playlist_id TEXT,
+            spotify_playlist_url TEXT,
+            spotify_snapshot_id TEXT,
+            playlist_synced_session_id INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Arquivos criados antes da migração 11
+    cursor.execute(f"PRAGMA {schema}.table_info(quests)")
+    existing = {row[1] for row in cursor.fetchall()}
+    for column, definition in ARCHIVE_PLAYLIST_COLUMNS:
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE {schema}.quests ADD COLUMN {column} {definition}")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.checkpoints (
+            id INTEGER PRIMARY KEY,
+            quest_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            order_index INTEGER NOT NULL,
+            completed BOOLEAN DEFAULT 0,
+            completed_at TIMESTAMP,
+            songs_played INTEGER NOT NULL DEFAULT 0,
+            listened_ms INTEGER NOT NULL DEFAULT 0,
+            first_played_at TIMESTAMP
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.music_sessions (
+            id INTEGER PRIMARY KEY,
+            checkpoint_id INTEGER NOT NULL,
+            track_name TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            album TEXT,
+            spotify_uri TEXT NOT NULL,
+            played_at TIMESTAMP,
+            duration_ms INTEGER
+        )
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_checkpoints_quest_order ON checkpoints(quest_id, order_index)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_music_sessions_checkpoint_played ON music_sessions(checkpoint_id, played_at)")
+
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.listening_daily (
+            quest_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            plays INTEGER NOT NULL DEFAULT 0,
+            duration_ms INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quest_id, day)
+        )
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_listening_daily_day ON listening_daily(day)")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.listening_artists (
+            quest_id INTEGER NOT NULL,
+            artist TEXT NOT NULL,
+            plays INTEGER NOT NULL DEFAULT 0,
+            duration_ms INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quest_id, artist)
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.listening_tracks (
+            quest_id INTEGER NOT NULL,
+            spotify_uri TEXT NOT NULL,
+            track_name TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            plays INTEGER NOT NULL DEFAULT 0,
+            duration_ms INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quest_id, spotify_uri)
+        )
+    """)
+    # Faixas já enviadas à playlist: o sync da quest arquivada continua
+    # consistente com o que está no Spotify
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.playlist_tracks (
+            quest_id INTEGER NOT NULL,
+            spotify_uri TEXT NOT NULL,
+            pushed_at TIMESTAMP,
+            PRIMARY KEY (quest_id, spotify_uri)
+        ) WITHOUT ROWID
+    """)
+
+MIGRATIONS = [
+    (1, "tabelas base", _create_base_schema),
+    (2, "colunas is_syncing, loot_retrieved, xp_to_next_level e quests_completed", _add_late_columns),
+    (3, "índices checkpoints(quest_id, order_index) e music_sessions(checkpoint_id, played_at)", _create_lookup_indexes),
+    (4, "índices de listagem quests(created_at, id) e quests(status, created_at, id)", _create_quest_listing_indexes),
+    (5, "contadores materializados de checkpoints e músicas (triggers)", _create_stat_counters),
+    (6, "user_stats.total_xp", _add_total_xp),
+    (7, "busca FTS5 em quests, checkpoints e músicas", _create_search_index),
+    (8, "rollups de escuta por dia, artista e faixa", _create_listening_rollups),
+    (9, "playlist do Spotify por quest e faixas enviadas", _create_playlist_sync),
+    (10, "fila de jobs em background", _create_job_queue),
+    (11, "colunas da playlist do Spotify no banco de arquivo", _add_archive_playlist_sync),
+]
+
+# Versão atual do schema (0 se nunca migrado)
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+# Aplica, em ordem, as migrações pendentes até `target` (ou até a última)
+def run_migrations(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    # Controle manual de transação: DDL também precisa ser atômico
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+
+    try:
+        current = get_schema_version(conn)
+
+        for version, description, migrate in MIGRATIONS:
+            if version <= current or (target is not None and version > target):
+                continue
+
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                migrate(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                logger.error(f"Falha na migração {version}: {description}")
+                raise
+
+            current = version
+            logger.info(f"Migração {version} aplicada: {description}")
+
+        return current
+    finally:
+        conn.isolation_level = previous_isolation
@@ -1,11 +1,13 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 # Tarefa principal
 class QuestCreate(BaseModel):
     title: str
     description: Optional[str] = None
+    # Títulos dos checkpoints, na ordem (criados junto com a quest)
+    checkpoints: List[str] = []
 
 class QuestUpdate(BaseModel):
     title: Optional[str] = None
@@ -20,6 +22,10 @@ class Quest(BaseModel):
     status: str
     is_syncing: bool
     loot_retrieved: bool
+    # Lida do banco de arquivo (só com include_archived)
+    archived: bool = False
+    # Playlist do Spotify mantida pelo sync (POST /quests/{id}/playlist/sync)
+    spotify_playlist_url: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -43,6 +49,15 @@ class CheckpointUpdate(BaseModel):
     title: Optional[str] = None
     order_index: Optional[int] = None
 
+# Lista completa de checkpoints da quest, na nova ordem: com id mantém
+# (e renomeia), sem id cria; os que ficarem de fora são removidos
+class CheckpointListItem(BaseModel):
+    id: Optional[int] = None
+    title: str
+
+class CheckpointListUpdate(BaseModel):
+    checkpoints: List[CheckpointListItem]
+
 class Checkpoint(BaseModel):
     id: int
     quest_id: int
@@ -77,6 +92,17 @@ class CheckpointWithMusic(BaseModel):
     checkpoint: Checkpoint
     music_sessions: List[MusicSession]
 
+class QuestPage(BaseModel):
+    items: List[Quest]
+    next_cursor: Optional[str] = None
+
+class QuestStats(BaseModel):
+    total_checkpoints: int
+    completed_checkpoints: int
+    progress_percentage: float
+    total_time_minutes: float
+    total_songs_played: int
+
 class QuestSummary(BaseModel):
     quest: Quest
     total_checkpoints: int
@@ -93,6 +119,96 @@ class MusicTrackRequest(BaseModel):
     spotify_uri: str
     duration_ms: int
 
+# Envio em lote (histórico offline / importação); played_at opcional
+class MusicTrackBatchItem(MusicTrackRequest):
+    played_at: Optional[datetime] = None
+
+class MusicTrackBatch(BaseModel):
+    tracks: List[MusicTrackBatchItem]
+
+class MusicTrackBatchError(BaseModel):
+    index: int
+    checkpoint_id: int
+    detail: str
+
+class MusicTrackBatchResult(BaseModel):
+    inserted: int
+    ids: List[Optional[int]]
+    errors: List[MusicTrackBatchError]
+
 class PlaylistCreate(BaseModel):
     playlist_name: str
-    track_uris: List[str]
\ No newline at end of file
+    track_uris: List[str]
+
+class SearchResult(BaseModel):
+    type: str
+    id: int
+    quest_id: int
+    checkpoint_id: Optional[int] = None
+    title: str
+    subtitle: Optional[str] = None
+    snippet: str
+    date: Optional[datetime] = None
+    rank: float
+
+class SearchPage(BaseModel):
+    query: str
+    items: List[SearchResult]
+    next_offset: Optional[int] = None
+
+class DailyListening(BaseModel):
+    day: str
+    plays: int
+    minutes: float
+
+class TopArtist(BaseModel):
+    artist: str
+    plays: int
+    minutes: float
+
+class TopTrack(BaseModel):
+    spotify_uri: str
+    track_name: str
+    artist: str
+    plays: int
+    minutes: float
+
+class TopListening(BaseModel):
+    top_artists: List[TopArtist]
+    top_tracks: List[TopTrack]
+
+class CheckpointFocus(BaseModel):
+    checkpoint_id: int
+    title: str
+    order_index: int
+    completed: bool
+    completed_at: Optional[datetime] = None
+    songs_played: int
+    listened_minutes: float
+    first_played_at: Optional[datetime] = None
+    focus_minutes: Optional[float] = None
+
+class QuestAnalytics(BaseModel):
+    quest_id: int
+    total_minutes: float
+    total_songs_played: int
+    daily: List[DailyListening]
+    top_artists: List[TopArtist]
+    top_tracks: List[TopTrack]
+    checkpoints: List[CheckpointFocus]
+
+# Job da fila em background (datas em UTC)
+class Job(BaseModel):
+    id: int
+    type: str
+    status: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Dict
+
+import database as db
+from events import get_event_bus, TRACK_CHANGED, MUSIC_TRACKED
+from spotify_service import get_spotify_service, SpotifyService
+
+logger = logging.getLogger(__name__)
+
+# Intervalos de consulta ao Spotify (segundos)
+PLAYING_INTERVAL = 5
+PAUSED_INTERVAL = 15
+IDLE_INTERVAL = 10
+UNAUTHENTICATED_INTERVAL = 30
+# Margem depois do fim previsto da faixa para pegar a troca de música
+TRACK_END_MARGIN = 0.5
+MIN_INTERVAL = 1
+
+
+class PlaybackTracker:
+    # Único loop que consulta o Spotify, guarda o estado atual da reprodução
+    # e registra as músicas tocadas no checkpoint ativo da quest sincronizada
+
+    def __init__(self, spotify: SpotifyService):
+        self.spotify = spotify
+        self.current: Optional[Dict] = None
+        self.updated_at: Optional[datetime] = None
+        self.last_tracked_uri: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    async def start(self):
+        if self._task:
+            return
+
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Tracker de reprodução iniciado")
+
+    async def stop(self):
+        if not self._task:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+        logger.info("Tracker de reprodução parado")
+
+    # Antecipa a próxima consulta (ex.: depois de play/pause/next)
+    def wake(self):
+        if self._wake:
+            self._wake.set()
+
+    # Estado mais recente para os clientes
+    def snapshot(self) -> Dict:
+        return {
+            "track": self.current,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    async def _run(self):
+        while True:
+            # Limpa antes da consulta: um wake() durante ela antecipa a próxima
+            self._wake.clear()
+            try:
+                interval = await self._poll()
+            except Exception as e:
+                logger.warning(f"Erro no tracker de reprodução: {e}")
+                interval = IDLE_INTERVAL
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # Consulta o Spotify uma vez e retorna quanto esperar até a próxima.
+    # Erros passageiros do Spotify sobem para o _run e o estado atual fica
+    async def _poll(self) -> float:
+        if not await self.spotify.is_authenticated():
+            self._update(None)
+            return UNAUTHENTICATED_INTERVAL
+
+        track = await self.spotify.get_current_track()
+        self._update(track)
+
+        if track and track["is_playing"] and track["spotify_uri"] != self.last_tracked_uri:
+            await self._record(track)
+
+        return self._next_interval(track)
+
+    # Guarda o estado e avisa os clientes quando a faixa ou o play/pause muda
+    def _update(self, track: Optional[Dict]):
+        changed = _playback_key(track) != _playback_key(self.current)
+        self.current = track
+        self.updated_at = datetime.now()
+
+        if changed:
+            get_event_bus().publish(TRACK_CHANGED, self.snapshot())
+
+    # Mais rápido perto do fim da faixa, mais lento quando pausado/parado
+    def _next_interval(self, track: Optional[Dict]) -> float:
+        if not track:
+            return IDLE_INTERVAL
+
+        if not track["is_playing"]:
+            return PAUSED_INTERVAL
+
+        remaining = (track["duration_ms"] - (track.get("progress_ms") or 0)) / 1000
+        if remaining < PLAYING_INTERVAL:
+            return max(MIN_INTERVAL, remaining + TRACK_END_MARGIN)
+
+        return PLAYING_INTERVAL
+
+    # Salva a música no primeiro checkpoint pendente da quest sincronizada
+    async def _record(self, track: Dict):
+        quest = await db.get_syncing_quest()
+        if not quest:
+            return
+
+        checkpoint = await db.get_active_checkpoint(quest["id"])
+        if not checkpoint:
+            return
+
+        session_id = await db.create_music_session(
+            checkpoint["id"],
+            track["track_name"],
+            track["artist"],
+            track["album"] or "",
+            track["spotify_uri"],
+            track["duration_ms"]
+        )
+        self.last_tracked_uri = track["spotify_uri"]
+        get_event_bus().publish(MUSIC_TRACKED, {
+            "id": session_id,
+            "quest_id": quest["id"],
+            "checkpoint_id": checkpoint["id"],
+            "spotify_uri": track["spotify_uri"]
+        })
+        logger.info(f"Música registrada no checkpoint {checkpoint['id']}: {track['track_name']} - {track['artist']}")
+
+
+def _playback_key(track: Optional[Dict]):
+    if not track:
+        return None
+    return track["spotify_uri"], track["is_playing"]
+
+
+# Criar uma instância única do tracker
+playback_tracker = PlaybackTracker(get_spotify_service())
+
+
+def get_playback_tracker() -> PlaybackTracker:
+    return playback_tracker
@@ -0,0 +1,118 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import database as db
+from events import get_event_bus, PLAYLIST_SYNC_PROGRESS
+from jobs import get_job_queue, JobQueue, JobContext, PermanentJobError
+from spotify_service import get_spotify_service, SpotifyService, SpotifyAPIError, PLAYLIST_ADD_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Syncs de playlists diferentes rodando ao mesmo tempo (limite de taxa do Spotify)
+PLAYLIST_SYNC_CONCURRENCY = 2
+PLAYLIST_SYNC_ATTEMPTS = 5
+
+
+class PlaylistSyncManager:
+    # Mantém a playlist do Spotify de cada quest em dia: cria uma vez, depois
+    # envia só as faixas novas em lotes. Roda como job da fila (jobs.py); cada
+    # lote enviado é gravado, então uma nova tentativa (ou o job retomado
+    # depois de reiniciar a API) continua de onde parou
+
+    def __init__(self, spotify: SpotifyService, queue: JobQueue):
+        self.spotify = spotify
+        self.queue = queue
+        queue.register(
+            "playlist_sync", self._handle,
+            concurrency=PLAYLIST_SYNC_CONCURRENCY, max_attempts=PLAYLIST_SYNC_ATTEMPTS
+        )
+
+    # Enfileira o sync da quest. Retorna (job, criado); não cria outro se já
+    # há um na fila ou rodando para a mesma quest
+    async def start_sync(self, quest_id: int, playlist_name: str) -> Tuple[Dict, bool]:
+        return await self.queue.enqueue(
+            "playlist_sync",
+            {"quest_id": quest_id, "playlist_name": playlist_name},
+            dedupe_key=_job_key(quest_id)
+        )
+
+    # Último job de sync da quest
+    async def status(self, quest_id: int) -> Optional[Dict]:
+        return await db.get_latest_job(_job_key(quest_id))
+
+    async def _handle(self, ctx: JobContext) -> Dict:
+        quest_id = ctx.payload["quest_id"]
+        playlist_name = ctx.payload["playlist_name"]
+        job = {"job_id": ctx.id, "quest_id": quest_id, "total": None, "pushed": 0, "playlist_url": None}
+
+        try:
+            try:
+                await self._sync(quest_id, playlist_name, job, ctx)
+            except SpotifyAPIError as e:
+                # Playlist apagada no Spotify: esquece e cria outra uma vez
+                if e.status_code != 404:
+                    raise
+                logger.info(f"Playlist da quest {quest_id} não existe mais no Spotify; criando outra")
+                await db.reset_quest_playlist(quest_id)
+                job["pushed"] = 0
+                await self._sync(quest_id, playlist_name, job, ctx)
+        except SpotifyAPIError as e:
+            if not e.retryable:
+                raise PermanentJobError(str(e))
+            raise
+
+        logger.info(f"Playlist da quest {quest_id} sincronizada: {job['pushed']} faixa(s) nova(s)")
+        return job
+
+    async def _sync(self, quest_id: int, playlist_name: str, job: Dict, ctx: JobContext):
+        state = await db.get_playlist_sync_state(quest_id)
+        if not state:
+            raise PermanentJobError("Quest não encontrada")
+
+        playlist_id = state["spotify_playlist_id"]
+        job["playlist_url"] = state["spotify_playlist_url"]
+        if playlist_id:
+            # Confere se a playlist ainda existe. Faixas que o usuário tirou
+            # dela não voltam: só o que nunca foi enviado é adicionado
+            snapshot_id = await self.spotify.get_playlist_snapshot(playlist_id)
+            if snapshot_id != state["spotify_snapshot_id"]:
+                logger.info(f"Playlist da quest {quest_id} foi alterada no Spotify")
+        else:
+            playlist = await self.spotify.create_empty_playlist(playlist_name)
+            playlist_id = playlist["id"]
+            job["playlist_url"] = playlist.get("external_urls", {}).get("spotify")
+            await db.set_quest_playlist(quest_id, playlist_id, job["playlist_url"])
+
+        uris, until_session_id = await db.get_pending_playlist_tracks(quest_id, state["playlist_synced_session_id"])
+        job["total"] = job["pushed"] + len(uris)
+        await self._progress(ctx, job)
+
+        for batch in _batches(uris, PLAYLIST_ADD_LIMIT):
+            snapshot_id = await self.spotify.add_playlist_items(playlist_id, batch)
+            await db.mark_playlist_tracks_pushed(quest_id, batch, snapshot_id)
+            job["pushed"] += len(batch)
+            await self._progress(ctx, job)
+
+        # Só avança o cursor depois de tudo enviado
+        await db.advance_playlist_cursor(quest_id, until_session_id)
+
+    async def _progress(self, ctx: JobContext, job: Dict):
+        await ctx.progress(job)
+        get_event_bus().publish(PLAYLIST_SYNC_PROGRESS, dict(job))
+
+
+def _job_key(quest_id: int) -> str:
+    return f"playlist_sync:{quest_id}"
+
+
+def _batches(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# Criar uma instância única do gerenciador de sync
+playlist_sync = PlaylistSyncManager(get_spotify_service(), get_job_queue())
+
+
+def get_playlist_sync() -> PlaylistSyncManager:
+    return playlist_sync
@@ -1,11 +1,57 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
-from spotify_service import get_spotify_service
+from spotify_service import get_spotify_service, SpotifyAPIError, PLAYLIST_ADD_LIMIT
+from playback_tracker import get_playback_tracker
+from jobs import get_job_queue, JobContext, PermanentJobError
 from models import PlaylistCreate
 
 router = APIRouter(prefix = "/spotify", tags = ["Spotify"])
 
 spotify = get_spotify_service()
+tracker = get_playback_tracker()
+jobs = get_job_queue()
+
+# ================
+# Jobs do Spotify (rodam na fila; os endpoints só enfileiram)
+
+# O player novo pode demorar a aparecer para a API: repete algumas vezes
+async def _transfer_playback_job(ctx: JobContext) -> dict:
+    if not await spotify.transfer_playback(ctx.payload["device_id"]):
+        raise RuntimeError("Falha ao transferir playback")
+    tracker.wake()
+    return {"device_id": ctx.payload["device_id"]}
+
+# Cria a playlist e adiciona as músicas em lotes. O id da playlist e quantas
+# já foram adicionadas ficam no estado do job: uma nova tentativa continua
+# dali, sem criar outra playlist nem duplicar faixas
+async def _create_playlist_job(ctx: JobContext) -> dict:
+    uris = ctx.payload["track_uris"]
+    state = dict(ctx.state)
+
+    try:
+        if "playlist_id" not in state:
+            playlist = await spotify.create_empty_playlist(ctx.payload["playlist_name"])
+            state = {
+                "playlist_id": playlist["id"],
+                "playlist_url": playlist.get("external_urls", {}).get("spotify"),
+                "added": 0
+            }
+            await ctx.save_state(state)
+
+        for i in range(state["added"], len(uris), PLAYLIST_ADD_LIMIT):
+            await spotify.add_playlist_items(state["playlist_id"], uris[i:i + PLAYLIST_ADD_LIMIT])
+            state["added"] = min(i + PLAYLIST_ADD_LIMIT, len(uris))
+            await ctx.save_state(state)
+            await ctx.progress({"added": state["added"], "total": len(uris)})
+    except SpotifyAPIError as e:
+        if not e.retryable:
+            raise PermanentJobError(str(e))
+        raise
+
+    return {"playlist_url": state["playlist_url"], "total_tracks": len(uris)}
+
+jobs.register("transfer_playback", _transfer_playback_job, concurrency=1, max_attempts=3)
+jobs.register("create_playlist", _create_playlist_job, concurrency=2, max_attempts=5)
 
 # Auth
 @router.get("/auth/login")
@@ -38,7 +84,7 @@ async def spotify_callback(code: str = None, error: str = None):
         )
     
     # Autenticar
-    sucess = spotify.authenticate_with_code(code)
+    sucess = await spotify.authenticate_with_code(code)
 
     if not sucess:
         raise HTTPException(
@@ -53,10 +99,10 @@ async def spotify_callback(code: str = None, error: str = None):
 # Verifica se o user esta autenticado
 @router.get("/auth/status")
 async def check_auth_status():
-    is_auth = spotify.is_authenticated()
+    is_auth = await spotify.is_authenticated()
 
     if is_auth:
-        user_info = spotify.get_user_info()
+        user_info = await spotify.get_user_info()
 
         return {
             "authenticated": True,
@@ -71,97 +117,107 @@ async def check_auth_status():
 # Logout
 @router.post("/auth/logout")
 async def spotify_logout():
-    spotify.logout()
+    await spotify.logout()
+    tracker.wake()
     return {"message": "Desconectado com sucesso"}
 
 # Musica atual
 @router.get("/current")
 async def get_current_playing():
 
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(
             status_code = 401, 
             detail = "Usuário não autenticado"
         )
     
-    track = spotify.get_current_track()
+    # Estado mantido pelo tracker em background (sem chamar o Spotify aqui)
+    snapshot = tracker.snapshot()
+    track = snapshot["track"]
 
     if not track:
         return {
             "playing": False,
-            "message": "Nenhuma música tocando no momento"
+            "message": "Nenhuma música tocando no momento",
+            "updated_at": snapshot["updated_at"]
         }
     
     return {
         "playing": True,
-        "track": track
+        "track": track,
+        "updated_at": snapshot["updated_at"]
         }
 
 @router.post("/volume")
 async def spotify_volume(volume: int):
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(status_code=401, detail="Não autenticado")
-    success = spotify.set_volume(volume)
+    success = await spotify.set_volume(volume)
     return {"success": success}
 
-@router.post("/transfer-playback")
+@router.post("/transfer-playback", status_code=202)
 async def transfer_playback(device_id: str):
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(status_code=401, detail="Não autenticado")
-    success = spotify.transfer_playback(device_id)
-    return {"success": success}
+    # Não enfileira outra para o mesmo device se já há uma pendente
+    job, _ = await jobs.enqueue("transfer_playback", {"device_id": device_id}, dedupe_key=f"transfer_playback:{device_id}")
+    return job
 
 @router.get("/user-tier")
 async def get_user_tier():
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         return {"is_premium": False}
-    try:
-        user = spotify.sp.current_user()
-        return {"is_premium": user.get('product') == 'premium'}
-    except:
+    user = await spotify.get_current_user()
+    if not user:
         return {"is_premium": False}
+    product = user.get('product', 'free')  # "premium" ou "free"
+    return {"tier": product, "is_premium": product == 'premium'}
 
 @router.get("/access-token")
 async def get_access_token():
-    token = spotify.get_access_token()
+    token = await spotify.get_access_token()
     return {"access_token": token}
 
 # Playback Controls
 @router.post("/play")
 async def spotify_play():
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(status_code=401, detail="Não autenticado")
-    success = spotify.play()
+    success = await spotify.play()
+    tracker.wake()
     return {"success": success}
 
 @router.post("/pause")
 async def spotify_pause():
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(status_code=401, detail="Não autenticado")
-    success = spotify.pause()
+    success = await spotify.pause()
+    tracker.wake()
     return {"success": success}
 
 @router.post("/next")
 async def spotify_next():
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(status_code=401, detail="Não autenticado")
-    success = spotify.next_track()
+    success = await spotify.next_track()
+    tracker.wake()
     return {"success": success}
 
 @router.post("/previous")
 async def spotify_previous():
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(status_code=401, detail="Não autenticado")
-    success = spotify.previous_track()
+    success = await spotify.previous_track()
+    tracker.wake()
     return {"success": success}
 
 # Criar playlist
-@router.post("/create-playlist")
+@router.post("/create-playlist", status_code = 202)
 async def create_playlist_from_quest(
     request: PlaylistCreate
 ):
     
-    if not spotify.is_authenticated():
+    if not await spotify.is_authenticated():
         raise HTTPException(
             status_code = 401, 
             detail = "Usuário não autenticado"
@@ -173,19 +229,12 @@ async def create_playlist_from_quest(
             detail = "Lista de músicas vazia"
         )
     
-    playlist_url = spotify.create_playlist(request.playlist_name, request.track_uris)
-
-    if not playlist_url:
-        raise HTTPException(
-            status_code = 500, 
-            detail = "Falha ao criar playlist"
-        )
-    
-    return {
-        "message": "Playlist criada com sucesso!",
-        "playlist_url": playlist_url,
-        "total_tracks": len(request.track_uris)
-    }
+    # Roda em background: acompanhe por GET /jobs/{id} (result.playlist_url)
+    job, _ = await jobs.enqueue(
+        "create_playlist",
+        {"playlist_name": request.playlist_name, "track_uris": request.track_uris}
+    )
+    return job
 
 
     
@@ -1,9 +1,16 @@
-import spotipy
 from spotipy.oauth2 import SpotifyOAuth
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Any, Awaitable, Callable, Tuple
 import os
+import re
+import time
+import asyncio
+import json
+import httpx
 from dotenv import load_dotenv
 import logging
+from metrics import spotify_latency, spotify_responses, spotify_errors
+
+logger = logging.getLogger(__name__)
 
 # Variaveis
 load_dotenv()
@@ -11,12 +18,17 @@ SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", "http://127.0.0.1:8000/spotify/auth/callback")
 
+SPOTIFY_API_URL = "https://api.spotify.com/v1"
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+# Arquivo onde o token fica salvo (mesmo formato do cache do spotipy)
+TOKEN_CACHE_PATH = ".spotify_cache"
 
-# Scopes 
+# Scopes
 SCOPES = [
-    "user-read-currently-playing",  
-    "user-read-playback-state",      
-    "playlist-modify-public",        
+    "user-read-currently-playing",
+    "user-read-playback-state",
+    "playlist-modify-public",
     "playlist-modify-private",
     "user-modify-playback-state",
     "streaming",
@@ -24,33 +36,317 @@ SCOPES = [
     "user-read-private"
 ]
 
+# Cliente HTTP: timeouts e conexões keep-alive reutilizadas
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=5)
+
+# Retentativas em 429/5xx (respeitando Retry-After)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+MAX_RETRY_DELAY = 30.0
+
+# Renovação do token: em background antes de expirar; inline só se já estiver expirando
+TOKEN_REFRESH_MARGIN = 300
+TOKEN_EXPIRY_MARGIN = 60
+TOKEN_RETRY_DELAY = 30
+
+# Máximo de faixas por chamada de "adicionar à playlist"
+PLAYLIST_ADD_LIMIT = 100
+
+# TTL do cache por recurso (segundos)
+USER_TTL = 300
+PLAYBACK_TTL = 1
+
+# Trechos com id no caminho (trocados por {id} nas métricas)
+_ID_SEGMENT = re.compile(r"/(playlists|users|tracks|albums|artists)/[^/]+")
+
+
+class SpotifyAPIError(Exception):
+    # Falha em uma chamada à API do Spotify (depois das retentativas)
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    # Vale tentar de novo mais tarde (rede, 429 ou 5xx); 4xx não muda sozinho
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+class _TTLCache:
+    # Cache em memória com TTL por chave. Chamadas simultâneas para a mesma
+    # chave compartilham uma única busca (single-flight)
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._generation = 0
+
+    async def get(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._values.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if not task:
+            # A busca roda numa task própria: cancelar quem pediu primeiro
+            # não cancela quem está esperando a mesma chave
+            task = asyncio.ensure_future(self._load(key, ttl, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(self._loaded)
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation
+        try:
+            value = await fetch()
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+        # Invalidado durante a busca: entrega o valor, mas não guarda
+        if generation == self._generation:
+            self._values[key] = (time.monotonic() + ttl, value)
+        return value
+
+    @staticmethod
+    def _loaded(task: asyncio.Task):
+        # Evita o aviso de exceção não lida quando ninguém mais esperava
+        if not task.cancelled():
+            task.exception()
+
+    # Remove as chaves informadas (ou tudo)
+    def invalidate(self, *keys: str):
+        self._generation += 1
+        if not keys:
+            self._values.clear()
+            self._inflight.clear()
+            return
+        for key in keys:
+            self._values.pop(key, None)
+            self._inflight.pop(key, None)
+
+
+class TokenManager:
+    # Mantém o token OAuth em memória, renova em background antes de expirar
+    # e grava o arquivo de cache de forma atômica
+
+    def __init__(self, http: Callable[[], httpx.AsyncClient], cache_path: str = TOKEN_CACHE_PATH):
+        self._http = http
+        self.cache_path = cache_path
+        self._token: Optional[Dict] = None
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._refresh_lock = asyncio.Lock()
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self._ensure_loaded()
+        if self._task:
+            return
+
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if not self._task:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    # Token atual (só memória, a não ser que esteja para expirar)
+    async def get_access_token(self) -> Optional[str]:
+        await self._ensure_loaded()
+
+        if self._token and self._expires_in() < TOKEN_EXPIRY_MARGIN:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Erro ao renovar token do Spotify: {e}")
+
+        if not self._token or self._expires_in() <= 0:
+            return None
+        return self._token["access_token"]
+
+    # Guarda um token novo (ex.: depois do login)
+    async def set_token(self, token_info: Dict):
+        token_info.setdefault("expires_at", int(time.time()) + token_info["expires_in"])
+        self._token = token_info
+        self._loaded = True
+        await asyncio.to_thread(self._persist, token_info)
+        self._notify()
+
+    # Esquece o token (logout). O estado em memória muda na hora; o arquivo
+    # é removido numa thread
+    async def clear(self):
+        self._token = None
+        self._loaded = True
+        self._notify()
+        await asyncio.to_thread(self._remove_cache)
+
+    # Renova com o refresh_token (uma renovação por vez)
+    async def refresh(self):
+        async with self._refresh_lock:
+            token = self._token
+            if not token or self._expires_in() >= TOKEN_REFRESH_MARGIN:
+                # Outra chamada já renovou (ou não há o que renovar)
+                return
+
+            response = await self._http().post(
+                SPOTIFY_TOKEN_URL,
+                data={"grant_type": "refresh_token", "refresh_token": token["refresh_token"]},
+                auth=(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+            )
+            if response.status_code != 200:
+                raise SpotifyAPIError(f"Falha ao renovar token: {response.text}", response.status_code)
+
+            refreshed = response.json()
+            # O Spotify nem sempre devolve um refresh_token novo
+            refreshed.setdefault("refresh_token", token["refresh_token"])
+            refreshed.setdefault("scope", token.get("scope"))
+            refreshed["expires_at"] = int(time.time()) + refreshed["expires_in"]
+
+            # Logout durante a renovação: descarta
+            if self._token is not token:
+                return
+
+            self._token = refreshed
+            await asyncio.to_thread(self._persist, refreshed)
+            logger.info("Token do Spotify renovado")
+
+    def _expires_in(self) -> float:
+        return self._token["expires_at"] - time.time()
+
+    def _notify(self):
+        if self._changed:
+            self._changed.set()
+
+    # Lê o arquivo uma única vez, na primeira necessidade
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+
+        async with self._load_lock:
+            if not self._loaded:
+                self._token = await asyncio.to_thread(self._read_cache)
+                self._loaded = True
+
+    def _read_cache(self) -> Optional[Dict]:
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                token_info = json.load(f)
+            return token_info if "access_token" in token_info else None
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Erro ao ler cache do Spotify: {e}")
+            return None
+
+    def _remove_cache(self):
+        try:
+            os.remove(self.cache_path)
+            logger.info("Cache do Spotify removido.")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Erro ao remover cache do Spotify: {e}")
+
+    # Escreve num temporário e troca de uma vez: nunca deixa um arquivo pela metade
+    def _persist(self, token_info: Dict):
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(token_info, f)
+        os.replace(tmp_path, self.cache_path)
+
+    # Espera o token mudar por até `timeout` segundos. Usa asyncio.wait em vez
+    # de wait_for para não engolir o cancelamento vindo do stop()
+    async def _wait_changed(self, timeout: float) -> bool:
+        waiter = asyncio.ensure_future(self._changed.wait())
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=timeout)
+        finally:
+            waiter.cancel()
+        return bool(done)
+
+    async def _refresh_loop(self):
+        while True:
+            self._changed.clear()
+
+            if not self._token:
+                await self._changed.wait()
+                continue
+
+            delay = self._expires_in() - TOKEN_REFRESH_MARGIN
+            if delay > 0 and await self._wait_changed(delay):
+                continue  # token trocado: recalcula
+
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Erro ao renovar token do Spotify: {e}")
+                await asyncio.sleep(TOKEN_RETRY_DELAY)
+
+
 class SpotifyService:
     # Gerenciar a conexao com o spotify
-    
+
     def __init__(self):
         self.sp_oauth = None
-        self.sp = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache = _TTLCache()
+        self.tokens = TokenManager(lambda: self.client)
         self._initialize_oauth()
-    
+
     def _initialize_oauth(self):
 
         if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
             return
-        
+
         try:
             self.sp_oauth = SpotifyOAuth(
                 client_id=SPOTIFY_CLIENT_ID,
                 client_secret=SPOTIFY_CLIENT_SECRET,
                 redirect_uri=SPOTIFY_REDIRECT_URI,
                 scope=" ".join(SCOPES),
-                cache_path=".spotify_cache",
+                cache_path=TOKEN_CACHE_PATH,
                 show_dialog=True
             )
-            logging.info("Spotify OAuth inicializado com sucesso!")
+            logger.info("Spotify OAuth inicializado com sucesso!")
 
         except Exception as e:
-            logging.info(f"Erro ao inicializar Spotify OAuth: {e}")
-    
+            logger.warning(f"Erro ao inicializar Spotify OAuth: {e}")
+
+    # Cliente HTTP compartilhado (criado no primeiro uso)
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=SPOTIFY_API_URL,
+                timeout=HTTP_TIMEOUT,
+                limits=HTTP_LIMITS,
+                event_hooks={"request": [_start_timer], "response": [_observe_response]}
+            )
+        return self._client
+
+    # Carrega o token e inicia a renovação em background (lifespan)
+    async def start(self):
+        if self.sp_oauth:
+            await self.tokens.start()
+
+    async def close(self):
+        await self.tokens.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     def get_auth_url(self) -> str:
 
         if not self.sp_oauth:
@@ -58,69 +354,97 @@ class SpotifyService:
                 "OAuth não inicializado. Verifique se as credenciais "
                 "SPOTIFY_CLIENT_ID e SPOTIFY_CLIENT_SECRET estão no arquivo .env"
             )
-        
+
         return self.sp_oauth.get_authorize_url()
-    
-    def authenticate_with_code(self, code: str) -> bool:
+
+    async def authenticate_with_code(self, code: str) -> bool:
 
         if not self.sp_oauth:
             return False
-        
+
         try:
-            token_info = self.sp_oauth.get_access_token(code)
-            self.sp = spotipy.Spotify(auth=token_info['access_token'])
-            logging.info("Autenticação Spotify concluída!")
+            response = await self.client.post(
+                SPOTIFY_TOKEN_URL,
+                data={
+                    "grant_type": "authorization_code",
+                    "code": code,
+                    "redirect_uri": SPOTIFY_REDIRECT_URI
+                },
+                auth=(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+            )
+            if response.status_code != 200:
+                raise SpotifyAPIError(response.text, response.status_code)
+
+            await self.tokens.set_token(response.json())
+            self._cache.invalidate()
+            logger.info("Autenticação Spotify concluída!")
 
             return True
         except Exception as e:
-            logging.info(f"Erro na autenticação: {e}")
+            logger.warning(f"Erro na autenticação: {e}")
             return False
-    
-    def transfer_playback(self, device_id: str):
-        if self.sp:
-            try:
-                self.sp.transfer_playback(device_id, force_play=True)
-                return True
-            except Exception as e:
-                logging.info(f"Erro ao transferir playback: {e}")
-                return False
-        return False
 
-    def get_access_token(self) -> Optional[str]:
+    async def get_access_token(self) -> Optional[str]:
         if not self.sp_oauth:
             return None
-        token_info = self.sp_oauth.get_cached_token()
-        if token_info:
-            return token_info['access_token']
-        return None
+        return await self.tokens.get_access_token()
 
-    def is_authenticated(self) -> bool:
-        
-        if not self.sp_oauth:
-            return False
-        
-        # Tentar pegar token do cache
-        token_info = self.sp_oauth.get_cached_token()
-        
-        if token_info:
-            self.sp = spotipy.Spotify(auth=token_info['access_token'])
+    async def is_authenticated(self) -> bool:
+        return await self.get_access_token() is not None
+
+    # Chamada à API com retentativas em 429/5xx e erros de rede
+    async def _request(self, method: str, path: str, **kwargs) -> Optional[Dict]:
+        token = await self.get_access_token()
+        if not token:
+            raise SpotifyAPIError("Usuário não autenticado", 401)
+
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = await self.client.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError as e:
+                spotify_errors.inc(_endpoint(path))
+                if attempt == MAX_RETRIES:
+                    raise SpotifyAPIError(f"Erro de conexão com o Spotify: {e}")
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                await asyncio.sleep(_retry_delay(response, attempt))
+                continue
+
+            if response.status_code >= 400:
+                raise SpotifyAPIError(
+                    f"Spotify respondeu {response.status_code}: {response.text}",
+                    response.status_code
+                )
+
+            if response.status_code == 204 or not response.content:
+                return None
+            return response.json()
+
+    async def transfer_playback(self, device_id: str):
+        try:
+            await self._request("PUT", "/me/player", json={"device_ids": [device_id], "play": True})
+            self._cache.invalidate("playback")
             return True
-        
-        return False
-    
-    def get_current_track(self) -> Optional[Dict]:
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao transferir playback: {e}")
+            return False
+
+    async def get_current_track(self) -> Optional[Dict]:
 
-        if not self.sp:
-            return None
-        
         try:
-            current = self.sp.current_playback()
-            
+            current = await self._cache.get(
+                "playback", PLAYBACK_TTL, lambda: self._request("GET", "/me/player")
+            )
+
             if not current or not current.get('item'):
                 return None
-            
+
             track = current['item']
-            
+
             return {
                 "track_name": track['name'],
                 "artist": ", ".join([artist['name'] for artist in track['artists']]),
@@ -131,120 +455,157 @@ class SpotifyService:
                 "progress_ms": current.get('progress_ms', 0),
                 "is_playing": current['is_playing']
             }
-        
-        except Exception as e:
-            logging.info(f"Erro ao buscar música atual: {e}")
+
+        except SpotifyAPIError as e:
+            # Falha passageira (rede, 429, 5xx) não quer dizer que nada está
+            # tocando: quem chamou mantém o último estado conhecido
+            if e.retryable:
+                raise
+            logger.warning(f"Erro ao buscar música atual: {e}")
             return None
-    
-    def play(self):
-        if self.sp:
-            try:
-                self.sp.start_playback()
-                return True
-            except Exception as e:
-                logging.info(f"Erro ao dar play: {e}")
-                return False
-        return False
 
-    def pause(self):
-        if self.sp:
-            try:
-                self.sp.pause_playback()
-                return True
-            except Exception as e:
-                logging.info(f"Erro ao pausar: {e}")
-                return False
-        return False
+    async def play(self):
+        try:
+            await self._request("PUT", "/me/player/play")
+            self._cache.invalidate("playback")
+            return True
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao dar play: {e}")
+            return False
 
-    def next_track(self):
-        if self.sp:
-            try:
-                self.sp.next_track()
-                return True
-            except Exception as e:
-                logging.info(f"Erro ao pular: {e}")
-                return False
-        return False
+    async def pause(self):
+        try:
+            await self._request("PUT", "/me/player/pause")
+            self._cache.invalidate("playback")
+            return True
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao pausar: {e}")
+            return False
 
-    def previous_track(self):
-        if self.sp:
-            try:
-                self.sp.previous_track()
-                return True
-            except Exception as e:
-                logging.info(f"Erro ao voltar: {e}")
-                return False
-        return False
-    
-    def set_volume(self, volume_percent: int):
-        if self.sp:
-            try:
-                self.sp.volume(volume_percent)
-                return True
-            except Exception as e:
-                logging.info(f"Erro ao ajustar volume: {e}")
-                return False
-        return False
-    
-    def create_playlist(self, name: str, track_uris: list) -> Optional[str]:
+    async def next_track(self):
+        try:
+            await self._request("POST", "/me/player/next")
+            self._cache.invalidate("playback")
+            return True
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao pular: {e}")
+            return False
 
-        if not self.sp:
-            return None
-        
+    async def previous_track(self):
         try:
-            # Pegar ID do usuário
-            user = self.sp.current_user()
-            user_id = user['id']
-            
-            # Criar playlist
-            playlist = self.sp.user_playlist_create(
-                user=user_id,
-                name=name,
-                public=False, 
-                description="Criada pelo CodeQuest"
-            )
-            
+            await self._request("POST", "/me/player/previous")
+            self._cache.invalidate("playback")
+            return True
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao voltar: {e}")
+            return False
+
+    async def set_volume(self, volume_percent: int):
+        try:
+            await self._request("PUT", "/me/player/volume", params={"volume_percent": volume_percent})
+            self._cache.invalidate("playback")
+            return True
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao ajustar volume: {e}")
+            return False
+
+    # Cria uma playlist privada vazia e retorna o objeto do Spotify
+    async def create_empty_playlist(self, name: str) -> Dict:
+        user = await self.get_current_user()
+        if not user:
+            raise SpotifyAPIError("Usuário não encontrado", 401)
+
+        return await self._request(
+            "POST",
+            f"/users/{user['id']}/playlists",
+            json={
+                "name": name,
+                "public": False,
+                "description": "Criada pelo CodeQuest"
+            }
+        )
+
+    # snapshot_id atual da playlist (SpotifyAPIError 404 se ela foi apagada)
+    async def get_playlist_snapshot(self, playlist_id: str) -> Optional[str]:
+        result = await self._request("GET", f"/playlists/{playlist_id}", params={"fields": "snapshot_id"})
+        return result.get("snapshot_id") if result else None
+
+    # Adiciona até PLAYLIST_ADD_LIMIT faixas e retorna o snapshot_id da playlist
+    async def add_playlist_items(self, playlist_id: str, track_uris: List[str]) -> Optional[str]:
+        result = await self._request("POST", f"/playlists/{playlist_id}/tracks", json={"uris": track_uris})
+        return result.get("snapshot_id") if result else None
+
+    async def create_playlist(self, name: str, track_uris: List[str]) -> Optional[str]:
+
+        try:
+            playlist = await self.create_empty_playlist(name)
+
             # Adicionar músicas (max 100 por vez)
-            if track_uris:
-                # Spotipy aceita no máximo 100 
-                for i in range(0, len(track_uris), 100):
-                    batch = track_uris[i:i+100]
-                    self.sp.playlist_add_items(playlist['id'], batch)
-            
-            logging.info(f"Playlist '{name}' criada com sucesso!")
+            for i in range(0, len(track_uris), PLAYLIST_ADD_LIMIT):
+                await self.add_playlist_items(playlist['id'], track_uris[i:i + PLAYLIST_ADD_LIMIT])
+
+            logger.info(f"Playlist '{name}' criada com sucesso!")
             return playlist['external_urls']['spotify']
-        
-        except Exception as e:
-            logging.info(f"Erro ao criar playlist: {e}")
-            return None
-    
-    def get_user_info(self) -> Optional[Dict]:
 
-        if not self.sp:
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao criar playlist: {e}")
             return None
-        
+
+    # Perfil bruto do usuário (/me)
+    async def get_current_user(self) -> Optional[Dict]:
         try:
-            user = self.sp.current_user()
-            return {
-                "display_name": user.get('display_name', 'Usuário'),
-                "email": user.get('email'),
-                "profile_url": user.get('external_urls', {}).get('spotify'),
-                "image": user.get('images', [{}])[0].get('url') if user.get('images') else None
-            }
-        except Exception as e:
-            logging.info(f"Erro ao buscar info do usuário: {e}")
+            return await self._cache.get("user", USER_TTL, lambda: self._request("GET", "/me"))
+        except SpotifyAPIError as e:
+            logger.warning(f"Erro ao buscar info do usuário: {e}")
             return None
-    
-    def logout(self):
-        self.sp = None
-        # Remove cache file if exists
+
+    async def get_user_info(self) -> Optional[Dict]:
+
+        user = await self.get_current_user()
+        if not user:
+            return None
+
+        return {
+            "display_name": user.get('display_name', 'Usuário'),
+            "email": user.get('email'),
+            "profile_url": user.get('external_urls', {}).get('spotify'),
+            "image": user.get('images', [{}])[0].get('url') if user.get('images') else None
+        }
+
+    async def logout(self):
+        self._cache.invalidate()
+        await self.tokens.clear()
+
+
+# Espera pedida pelo Spotify (Retry-After) ou backoff exponencial
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
         try:
-            if os.path.exists(".spotify_cache"):
-                os.remove(".spotify_cache")
-                logging.info("Cache do Spotify removido.")
-        except Exception as e:
-            logging.error(f"Erro ao remover cache do Spotify: {e}")
-            
+            return min(float(retry_after), MAX_RETRY_DELAY)
+        except ValueError:
+            pass
+    return RETRY_BACKOFF * 2 ** attempt
+
+
+# Métricas (e log em debug) de cada chamada HTTP (API e token), por endpoint sem os ids
+async def _start_timer(request: httpx.Request):
+    request.extensions["started_at"] = time.perf_counter()
+
+
+async def _observe_response(response: httpx.Response):
+    request = response.request
+    endpoint = _endpoint(request.url.path)
+    duration = time.perf_counter() - request.extensions["started_at"]
+    spotify_latency.observe(duration, request.method, endpoint)
+    spotify_responses.inc(endpoint, str(response.status_code))
+    logger.debug("Spotify %s %s -> %s (%.0f ms)", request.method, endpoint, response.status_code, duration * 1000)
+
+
+def _endpoint(path: str) -> str:
+    if path.startswith("/v1/"):
+        path = path[3:]
+    return _ID_SEGMENT.sub(r"/\1/{id}", path)
 
 
 # Criar uma instância única do serviço
@@ -259,7 +620,7 @@ def format_track_info(track_data: Dict) -> str:
 
     if not track_data:
         return "Nenhuma música tocando"
-    
+
     status = "Tocando" if track_data.get('is_playing') else "Pausado"
 
-    return f"{status}: {track_data['track_name']} - {track_data['artist']}"
\ No newline at end of file
+    return f"{status}: {track_data['track_name']} - {track_data['artist']}"
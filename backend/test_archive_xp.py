@@ -0,0 +1,50 @@
+import os
+import asyncio
+import tempfile
+
+# Banco temporário (antes de importar o database)
+_tmp = tempfile.mkdtemp(prefix="codequest-test-")
+os.environ["DATABASE_PATH"] = os.path.join(_tmp, "codequest.db")
+os.environ["ARCHIVE_DATABASE_PATH"] = os.path.join(_tmp, "codequest-archive.db")
+
+import database as db
+
+
+async def _archive_then_recompute():
+    db.init_db()
+    try:
+        # Duas quests concluídas, com checkpoints concluídos e loot resgatado
+        for title in ("Quest A", "Quest B"):
+            quest_id = await db.create_quest(title, checkpoints=["a", "b"])
+            for checkpoint in await db.get_checkpoints_by_quest(quest_id):
+                await db.complete_checkpoint_with_xp(checkpoint["id"])
+            await db.complete_quest(quest_id)
+            await db.update_quest_loot_retrieved(quest_id, True)
+
+        before = await db.get_user_stats()
+
+        await asyncio.sleep(0.01)
+        archived = await db.archive_quests(0)
+        assert archived["quests"] == 2, archived
+
+        after = await db.recompute_xp()
+        return before, after
+    finally:
+        await db.pool.close()
+
+
+def test_recompute_xp_counts_archived_quests():
+    before, after = asyncio.run(_archive_then_recompute())
+
+    print(f"Antes: total_xp={before['total_xp']} quests_completed={before['quests_completed']}")
+    print(f"Depois: total_xp={after['total_xp']} quests_completed={after['quests_completed']}")
+
+    assert before["total_xp"] > 0
+    assert after["total_xp"] == before["total_xp"]
+    assert after["quests_completed"] == before["quests_completed"] == 2
+    assert after["level"] == before["level"]
+
+
+if __name__ == "__main__":
+    test_recompute_xp_counts_archived_quests()
+    print("OK")
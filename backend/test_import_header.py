@@ -0,0 +1,51 @@
+import os
+import json
+import asyncio
+import tempfile
+
+# Banco temporário (antes de importar o database)
+_tmp = tempfile.mkdtemp(prefix="codequest-test-")
+os.environ["DATABASE_PATH"] = os.path.join(_tmp, "codequest.db")
+os.environ["ARCHIVE_DATABASE_PATH"] = os.path.join(_tmp, "codequest-archive.db")
+
+from transfer import NdjsonImporter, EXPORT_FORMAT, EXPORT_VERSION
+
+# Cabeçalhos inválidos: todos devem virar erro de validação (400 na API)
+MALFORMED_HEADERS = [
+    [],
+    None,
+    "codequest-ndjson",
+    42,
+    {"format": "outro", "version": EXPORT_VERSION},
+    {"format": EXPORT_FORMAT, "version": EXPORT_VERSION + 1},
+]
+
+
+def _line(record_type, data) -> bytes:
+    return json.dumps({"type": record_type, "data": data}).encode()
+
+
+async def _feed_header(data):
+    importer = NdjsonImporter()
+    try:
+        await importer.feed(_line("header", data))
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def test_malformed_header_is_rejected():
+    for data in MALFORMED_HEADERS:
+        error = asyncio.run(_feed_header(data))
+        print(f"Cabeçalho {data!r}: {error}")
+        assert error == "Formato de exportação não suportado", data
+
+
+def test_valid_header_is_accepted():
+    assert asyncio.run(_feed_header({"format": EXPORT_FORMAT, "version": EXPORT_VERSION})) is None
+
+
+if __name__ == "__main__":
+    test_malformed_header_is_rejected()
+    test_valid_header_is_accepted()
+    print("OK")
@@ -0,0 +1,212 @@
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import database as db
+
+logger = logging.getLogger(__name__)
+
+# ================
+# EXPORTAÇÃO / IMPORTAÇÃO (NDJSON)
+#
+# Uma linha JSON por registro: {"type": ..., "data": {...}}. A primeira linha
+# é o cabeçalho; depois vêm quests, checkpoints, músicas e user_stats, nessa
+# ordem (pais antes dos filhos), incluindo as do banco de arquivo. Contadores,
+# rollups e o índice de busca não são exportados: os triggers os recriam na
+# importação.
+
+EXPORT_FORMAT = "codequest-ndjson"
+EXPORT_VERSION = 1
+
+# Linhas lidas do cursor por vez na exportação
+EXPORT_FETCH_SIZE = 500
+# Linhas gravadas por transação na importação
+IMPORT_BATCH_SIZE = 1000
+# Erros detalhados devolvidos no resultado da importação
+MAX_REPORTED_ERRORS = 100
+
+# (tipo, tabela, colunas exportadas)
+EXPORT_TABLES = [
+    ("quest", "quests", ["id", "title", "description", "created_at", "completed_at", "status", "is_syncing", "loot_retrieved"]),
+    ("checkpoint", "checkpoints", ["id", "quest_id", "title", "order_index", "completed", "completed_at"]),
+    ("music_session", "music_sessions", ["id", "checkpoint_id", "track_name", "artist", "album", "spotify_uri", "played_at", "duration_ms"]),
+    ("user_stats", "user_stats", ["total_xp", "level", "xp", "xp_to_next_level", "quests_completed"]),
+]
+
+
+def _line(record_type: str, data: Dict) -> bytes:
+    return (json.dumps({"type": record_type, "data": data}, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+# Gera o banco inteiro linha a linha. Tudo sai de uma única transação de
+# leitura (snapshot consistente) e a memória usada não depende do tamanho.
+# O download segue o ritmo do cliente: usa uma conexão própria, não um
+# leitor do pool
+async def export_ndjson() -> AsyncIterator[bytes]:
+    async with db.pool.dedicated() as conn:
+        await conn.execute("BEGIN")
+        try:
+            async with conn.execute("SELECT MAX(version) FROM schema_version") as cursor:
+                schema_version = (await cursor.fetchone())[0]
+
+            yield _line("header", {
+                "format": EXPORT_FORMAT,
+                "version": EXPORT_VERSION,
+                "schema_version": schema_version,
+                "exported_at": datetime.now().isoformat()
+            })
+
+            for record_type, table, columns in EXPORT_TABLES:
+                names = ", ".join(columns)
+                sql = f"SELECT {names} FROM main.{table} ORDER BY rowid"
+                # Quests arquivadas saem junto (voltam como quests normais na importação)
+                if table in db.ARCHIVE_COLUMNS:
+                    sql = f"SELECT {names} FROM main.{table} UNION ALL SELECT {names} FROM archive.{table}"
+
+                async with conn.execute(sql) as cursor:
+                    while True:
+                        rows = await cursor.fetchmany(EXPORT_FETCH_SIZE)
+                        if not rows:
+                            break
+                        yield b"".join(_line(record_type, dict(row)) for row in rows)
+        finally:
+            await conn.execute("COMMIT")
+
+
+class NdjsonImporter:
+    # Importa um export linha a linha, gravando em lotes (uma transação por
+    # lote). Os ids são remapeados, então dá para importar num banco que já
+    # tem dados; só os mapas de quests/checkpoints ficam em memória
+
+    def __init__(self, restore_stats: bool = False, batch_size: int = IMPORT_BATCH_SIZE):
+        self.restore_stats = restore_stats
+        self.batch_size = batch_size
+        self.quest_ids: Dict[int, int] = {}
+        self.checkpoint_ids: Dict[int, int] = {}
+        self.counts = {"quest": 0, "checkpoint": 0, "music_session": 0, "user_stats": 0}
+        self.errors: List[Dict] = []
+        self.error_count = 0
+        self._pending_type: Optional[str] = None
+        self._pending: List[tuple] = []
+        self._line_number = 0
+
+    def _error(self, detail: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": self._line_number, "detail": detail})
+
+    async def feed(self, line: bytes):
+        self._line_number += 1
+        if not line.strip():
+            return
+
+        try:
+            record = json.loads(line)
+            record_type, data = record["type"], record["data"]
+        except (ValueError, KeyError, TypeError):
+            self._error("Linha inválida")
+            return
+
+        if record_type == "header":
+            if not isinstance(data, dict) or data.get("format") != EXPORT_FORMAT or data.get("version") != EXPORT_VERSION:
+                raise ValueError("Formato de exportação não suportado")
+            return
+
+        # Os filhos dependem dos ids novos dos pais: grava o que está pendente
+        if record_type != self._pending_type:
+            await self.flush()
+            self._pending_type = record_type
+
+        try:
+            row = self._row(record_type, data)
+        except (KeyError, TypeError, ValueError) as e:
+            self._error(f"Registro {record_type} inválido: {e}")
+            return
+
+        if row is not None:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                await self.flush()
+
+    # Converte o registro na tupla a gravar (None se deve ser ignorado)
+    def _row(self, record_type: str, data: Dict) -> Optional[tuple]:
+        if record_type == "quest":
+            return (
+                data["id"], data["title"], data.get("description"), data.get("created_at"),
+                data.get("completed_at"), data.get("status") or "active", int(bool(data.get("loot_retrieved")))
+            )
+
+        if record_type == "checkpoint":
+            quest_id = self.quest_ids.get(data["quest_id"])
+            if quest_id is None:
+                raise ValueError(f"quest {data['quest_id']} não importada")
+            return (
+                data["id"], quest_id, data["title"], data["order_index"],
+                int(bool(data.get("completed"))), data.get("completed_at")
+            )
+
+        if record_type == "music_session":
+            checkpoint_id = self.checkpoint_ids.get(data["checkpoint_id"])
+            if checkpoint_id is None:
+                raise ValueError(f"checkpoint {data['checkpoint_id']} não importado")
+            return (
+                checkpoint_id, data["track_name"], data["artist"], data.get("album") or "",
+                data["spotify_uri"], data.get("played_at"), data.get("duration_ms")
+            )
+
+        if record_type == "user_stats":
+            if not self.restore_stats:
+                return None
+            return (int(data["total_xp"]), int(data["quests_completed"]))
+
+        raise ValueError("tipo desconhecido")
+
+    # Grava o lote pendente numa transação
+    async def flush(self):
+        if not self._pending:
+            return
+
+        rows, record_type = self._pending, self._pending_type
+        self._pending = []
+
+        if record_type == "quest":
+            new_ids = await db.import_quests([row[1:] for row in rows])
+            self.quest_ids.update(zip((row[0] for row in rows), new_ids))
+        elif record_type == "checkpoint":
+            new_ids = await db.import_checkpoints([row[1:] for row in rows])
+            self.checkpoint_ids.update(zip((row[0] for row in rows), new_ids))
+        elif record_type == "music_session":
+            await db.import_music_sessions(rows)
+        elif record_type == "user_stats":
+            total_xp, quests_completed = rows[-1]
+            await db.restore_user_stats(total_xp, quests_completed)
+
+        self.counts[record_type] += len(rows)
+
+    def result(self) -> Dict:
+        return {
+            "imported": self.counts,
+            "error_count": self.error_count,
+            "errors": self.errors
+        }
+
+
+# Consome o corpo da requisição em pedaços, sem carregar o arquivo inteiro
+async def import_ndjson(chunks: AsyncIterator[bytes], restore_stats: bool = False) -> Dict:
+    importer = NdjsonImporter(restore_stats=restore_stats)
+    buffer = b""
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            await importer.feed(line)
+
+    if buffer:
+        await importer.feed(buffer)
+    await importer.flush()
+
+    result = importer.result()
+    logger.info(f"Importação concluída: {result['imported']} ({result['error_count']} erro(s))")
+    return result
@@ -20,11 +20,12 @@ import QuestCard from './components/QuestCard';
 import CreateQuestModal from './components/CreateQuestModal';
 import QuestDetail from './components/QuestDetail';
 import RetroLoading from './components/RetroLoading';
-import { questsAPI, spotifyAPI, musicAPI } from './api/api';
+import { questsAPI, spotifyAPI, subscribeEvents } from './api/api';
 import t from './utils/i18n';
 
 function App() {
   const [quests, setQuests] = useState([]);
+  const [questStats, setQuestStats] = useState({});
   const [loading, setLoading] = useState(true);
   const [initialBoot, setInitialBoot] = useState(true);
   const [showCreateModal, setShowCreateModal] = useState(false);
@@ -33,7 +34,6 @@ function App() {
   const [isExpanded, setIsExpanded] = useState(false);
   const [isSyncActive, setIsSyncActive] = useState(false);
   const [syncedQuest, setSyncedQuest] = useState(null);
-  const [lastTrackedUri, setLastTrackedUri] = useState(null);
   const [spotifyAuth, setSpotifyAuth] = useState(null); // Auth State lifted/duplicated for View Control
   const [completedPage, setCompletedPage] = useState(0);
   
@@ -64,9 +64,10 @@ function App() {
     fetchCurrentTrack(); 
     checkSpotifyAuth(); 
 
-    const interval = setInterval(() => {
-        fetchCurrentTrack();
-    }, 5000); 
+    // Backend avisa quando a faixa ou o play/pause muda
+    const unsubscribe = subscribeEvents({
+      track_changed: (data) => applyTrack(data.track)
+    });
     
     // Initial boot delay
     const bootTimer = setTimeout(() => {
@@ -74,7 +75,7 @@ function App() {
     }, 2500);
 
     return () => {
-      clearInterval(interval);
+      unsubscribe();
       clearTimeout(bootTimer);
     };
   }, []);
@@ -115,24 +116,19 @@ function App() {
     return () => clearInterval(interval);
   }, [isPlaying, currentTrack?.spotify_uri]);
 
-  // GLOBAL TRACKING LOOP
-  useEffect(() => {
-    if (isSyncActive && syncedQuest) {
-      const interval = setInterval(() => {
-        globalCheckTracking();
-      }, 15000); // Check every 15s
-      
-      globalCheckTracking();
-      return () => clearInterval(interval);
-    }
-  }, [isSyncActive, syncedQuest?.id, syncedQuestData?.checkpoints]);
-
   // Periodic refresh of synced quest data
   useEffect(() => {
     if (isSyncActive && syncedQuest) {
-      const interval = setInterval(refreshSyncedQuestData, 30000); // Heavy refresh every 30s
+      // Refresh when the backend tracks a song or completes a checkpoint of this quest
+      const refreshIfSynced = (data) => {
+        if (data.quest_id === syncedQuest.id) refreshSyncedQuestData();
+      };
+      const unsubscribe = subscribeEvents({
+        music_tracked: refreshIfSynced,
+        checkpoint_completed: refreshIfSynced
+      });
       refreshSyncedQuestData();
-      return () => clearInterval(interval);
+      return () => unsubscribe();
     }
   }, [isSyncActive, syncedQuest?.id]);
 
@@ -146,42 +142,13 @@ function App() {
     }
   };
 
-  const globalCheckTracking = async () => {
-    if (!isSyncActive || !syncedQuest) return;
-    
-    try {
-      const resp = await spotifyAPI.getCurrentTrack();
-      if (resp.playing && resp.track) {
-        setCurrentTrack(resp.track);
-        setIsPlaying(resp.track.is_playing);
-        
-        // Use the freshest syncedQuestData if available
-        const data = syncedQuestData || await questsAPI.getById(syncedQuest.id);
-        const activeCheckpoint = data.checkpoints.find(c => !c.completed);
-        
-        if (activeCheckpoint && resp.track.spotify_uri !== lastTrackedUri) {
-          await musicAPI.track({
-            checkpoint_id: activeCheckpoint.id,
-            track_name: resp.track.track_name,
-            artist: resp.track.artist,
-            album: resp.track.album,
-            spotify_uri: resp.track.spotify_uri,
-            duration_ms: resp.track.duration_ms
-          });
-          setLastTrackedUri(resp.track.spotify_uri);
-          refreshSyncedQuestData();
-        }
-      }
-    } catch (error) {
-      console.error('Global tracking error:', error);
-    }
-  };
-
   const loadQuests = async () => {
     setLoading(true);
     try {
-      const resp = await questsAPI.getAll();
+      const summaries = await questsAPI.getSummary();
+      const resp = summaries.map(s => s.quest);
       setQuests(resp);
+      setQuestStats(Object.fromEntries(summaries.map(s => [s.quest.id, s])));
       
       // Sync local state objects with updated list data
       if (selectedQuest) {
@@ -208,22 +175,26 @@ function App() {
     setSelectedQuest(quest);
   };
 
+  const applyTrack = (track) => {
+    if (track) {
+      setCurrentTrack(track);
+      setIsPlaying(track.is_playing);
+      if (track.progress_ms !== undefined && track.duration_ms) {
+        // Atomic update of progress and reference time
+        setPlaybackProgress((track.progress_ms / track.duration_ms) * 100);
+      }
+    } else {
+      setIsPlaying(false);
+      setCurrentTrack(null);
+      setPlaybackProgress(0);
+    }
+    setLastCheck(Date.now());
+  };
+
   const fetchCurrentTrack = async () => {
     try {
       const resp = await spotifyAPI.getCurrentTrack();
-      if (resp.playing && resp.track) {
-        setCurrentTrack(resp.track);
-        setIsPlaying(resp.track.is_playing);
-        if (resp.track.progress_ms !== undefined && resp.track.duration_ms) {
-          // Atomic update of progress and reference time
-          setPlaybackProgress((resp.track.progress_ms / resp.track.duration_ms) * 100);
-        }
-      } else {
-        setIsPlaying(false);
-        setCurrentTrack(null);
-        setPlaybackProgress(0);
-      }
-      setLastCheck(Date.now());
+      applyTrack(resp.playing ? resp.track : null);
     } catch (error) {
       console.error('Error fetching track:', error);
     }
@@ -443,7 +414,7 @@ function App() {
                     <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-3">
                       {quests.filter(q => q.status !== 'completed').map((quest) => (
                         <div key={quest.id} onClick={() => setSelectedQuest(quest)} className="cursor-pointer no-drag">
-                          <QuestCard quest={quest} />
+                          <QuestCard quest={quest} stats={questStats[quest.id]} />
                         </div>
                       ))}
                     </div>
@@ -489,7 +460,7 @@ function App() {
                         .slice(completedPage * 3, (completedPage + 1) * 3)
                         .map((quest) => (
                           <div key={quest.id} onClick={() => setSelectedQuest(quest)} className="cursor-pointer no-drag grayscale hover:grayscale-0 transition-all duration-500">
-                            <QuestCard quest={quest} />
+                            <QuestCard quest={quest} stats={questStats[quest.id]} />
                           </div>
                       ))}
                     </div>
@@ -513,8 +484,6 @@ function App() {
                 setSyncedQuest={setSyncedQuest}
                 syncedQuestData={syncedQuestData}
                 refreshSyncedQuestData={refreshSyncedQuestData}
-                lastTrackedUri={lastTrackedUri}
-                setLastTrackedUri={setLastTrackedUri}
               />
             )}
           </div>
@@ -533,8 +502,6 @@ function App() {
                  setSyncedQuest={setSyncedQuest}
                  syncedQuestData={syncedQuestData}
                  refreshSyncedQuestData={refreshSyncedQuestData}
-                 lastTrackedUri={lastTrackedUri}
-                 setLastTrackedUri={setLastTrackedUri}
                />
           </div>
         )}
@@ -6,7 +6,7 @@ import {
   Pause, 
   SkipForward
 } from 'lucide-react';
-import { userAPI, spotifyAPI } from './api/api';
+import { userAPI, spotifyAPI, subscribeEvents } from './api/api';
 import Tooltip from './components/Tooltip';
 import { initSpotifyPlayer } from './utils/SpotifyPlayer';
 import AudioUnlockModal from './components/AudioUnlockModal';
@@ -47,10 +47,27 @@ export default function PlayerWindow() {
   // Initial Data Load
   useEffect(() => {
     loadData();
-    const interval = setInterval(loadData, 8000); 
-    return () => clearInterval(interval);
+    // Auth/tier only change on login; stats and playback arrive as events
+    const interval = setInterval(loadData, 30000);
+    const unsubscribe = subscribeEvents({
+      xp_changed: loadStats,
+      music_tracked: loadStats,
+      track_changed: (data) => setIsPlaying(!!data.track?.is_playing)
+    });
+    return () => {
+      clearInterval(interval);
+      unsubscribe();
+    };
   }, []);
 
+  const loadStats = async () => {
+    try {
+      setStats(await userAPI.getStats());
+    } catch (error) {
+      console.error('CodeQuest: Erro ao carregar stats:', error);
+    }
+  };
+
   const loadData = async () => {
     try {
       const [statsData, authStatus, tierData, currentPlayback] = await Promise.all([
@@ -101,7 +118,7 @@ export default function PlayerWindow() {
         // Auto-transfer whenever ready
         spotifyAPI.transferPlayback(id)
           .then(res => {
-             console.log("CodeQuest: Transferência automática:", res.success);
+             console.log("CodeQuest: Transferência automática:", res.status);
           })
           .catch(err => console.error("CodeQuest: Erro na transferência:", err));
       },
@@ -13,16 +13,23 @@ const api = axios.create({
 // Quest
 export const questsAPI = {
 
-    // Criar nova
-    create: async (title, description = '') => {
-        const response = await api.post('/quests', { title, description })
+    // Criar nova (checkpoints: títulos, na ordem, criados junto)
+    create: async (title, description = '', checkpoints = []) => {
+        const response = await api.post('/quests', { title, description, checkpoints })
 
         return response.data
     },
 
-    // Listar todas
-    getAll: async () => {
-        const response = await api.get('/quests')
+    // Listar uma página ({ items, next_cursor }); params: status, limit, cursor
+    getAll: async (params = {}) => {
+        const response = await api.get('/quests', { params })
+
+        return response.data
+    },
+
+    // Resumo de todas (checkpoints, progresso e músicas) em uma chamada
+    getSummary: async () => {
+        const response = await api.get('/quests/summary')
 
         return response.data
     },
@@ -62,6 +69,20 @@ export const questsAPI = {
         return response.data
     },
 
+    // Sincronizar playlist da quest no Spotify (só envia faixas novas)
+    syncPlaylist: async (id) => {
+        const response = await api.post(`/quests/${id}/playlist/sync`)
+
+        return response.data
+    },
+
+    // Estado do sync da playlist
+    getPlaylistSync: async (id) => {
+        const response = await api.get(`/quests/${id}/playlist/sync`)
+
+        return response.data
+    },
+
     // Alternar sync
     sync: async (id, isSyncing) => {
         const response = await api.post(`/quests/${id}/sync?is_syncing=${isSyncing}`)
@@ -135,6 +156,13 @@ export const checkpointsAPI = {
         return response.data
     },
 
+    // Substituir a lista inteira ([{ id?, title }] na nova ordem); retorna a lista final
+    replaceAll: async (questId, checkpoints) => {
+        const response = await api.put(`/quests/${questId}/checkpoints`, { checkpoints })
+
+        return response.data
+    },
+
     // Adicionar checkpoint a uma quest existente
     add: async (questId, title, orderIndex) => {
         const response = await api.post(`/checkpoints?quest_id=${questId}`, {
@@ -224,6 +252,26 @@ export const spotifyAPI = {
     },
 }
 
+// ==============
+// Jobs
+
+export const jobsAPI = {
+
+    // Estado de um job em background
+    get: async (id) => {
+        const response = await api.get(`/jobs/${id}`)
+
+        return response.data
+    },
+
+    // Jobs recentes (filtros opcionais)
+    list: async (status, type) => {
+        const response = await api.get('/jobs', { params: { status, type } })
+
+        return response.data
+    },
+}
+
 // ==============
 // Music track
 
@@ -238,6 +286,101 @@ export const musicAPI = {
 
 }
 
+// ==============
+// Analytics de escuta
+
+export const analyticsAPI = {
+
+    // Minutos ouvidos por dia
+    getDaily: async (days = 30) => {
+        const response = await api.get('/analytics/daily', { params: { days } })
+
+        return response.data
+    },
+
+    // Artistas e faixas mais ouvidos
+    getTop: async (limit = 10) => {
+        const response = await api.get('/analytics/top', { params: { limit } })
+
+        return response.data
+    },
+
+    // Analytics de uma quest (por dia, mais ouvidos e foco por checkpoint)
+    getQuest: async (questId, params = {}) => {
+        const response = await api.get(`/quests/${questId}/analytics`, { params })
+
+        return response.data
+    },
+
+}
+
+// ==============
+// Busca
+
+export const searchAPI = {
+
+    // Busca por tipo e relevância ({ query, items, next_offset }); params: type, limit, offset
+    search: async (q, params = {}) => {
+        const response = await api.get('/search', { params: { q, ...params } })
+
+        return response.data
+    },
+
+}
+
+// ==============
+// Eventos (SSE)
+
+// Uma única conexão SSE por janela, compartilhada por todos os assinantes:
+// abre na primeira assinatura e fecha quando a última é cancelada
+let eventSource = null
+let subscriberCount = 0
+const eventHandlers = new Map() // tipo -> Set de handlers
+
+const dispatchEvent = (type) => (event) => {
+    const data = JSON.parse(event.data).data
+    eventHandlers.get(type)?.forEach((handler) => handler(data))
+}
+
+// Assina o stream do backend; handlers = { track_changed: (data) => ..., ... }
+// Retorna a função que cancela a assinatura
+export const subscribeEvents = (handlers) => {
+    if (!eventSource) {
+        eventSource = new EventSource(`${API_URL}/events`)
+        eventHandlers.clear()
+    }
+    subscriberCount += 1
+
+    // Uma função própria por assinatura: o mesmo handler assinado duas vezes
+    // não é removido junto
+    const entries = Object.entries(handlers).map(([type, handler]) => [type, (data) => handler(data)])
+
+    entries.forEach(([type, listener]) => {
+        if (!eventHandlers.has(type)) {
+            eventHandlers.set(type, new Set())
+            eventSource.addEventListener(type, dispatchEvent(type))
+        }
+        eventHandlers.get(type).add(listener)
+    })
+
+    let active = true
+    return () => {
+        if (!active) return
+        active = false
+
+        entries.forEach(([type, listener]) => {
+            eventHandlers.get(type)?.delete(listener)
+        })
+
+        subscriberCount -= 1
+        if (subscriberCount === 0) {
+            eventSource.close()
+            eventSource = null
+            eventHandlers.clear()
+        }
+    }
+}
+
 // ==============
 // Health check
 
@@ -1,7 +1,7 @@
 import { useState } from 'react';
 import { Scroll, Plus, Trash2, X, Sword } from 'lucide-react';
 import GameModal from './GameModal';
-import { questsAPI, checkpointsAPI } from '../api/api';
+import { questsAPI } from '../api/api';
 import t from '../utils/i18n';
 
 export default function CreateQuestModal({ isOpen, onClose, onCreated }) {
@@ -41,13 +41,7 @@ export default function CreateQuestModal({ isOpen, onClose, onCreated }) {
     setLoading(true);
     try {
       console.log('[CreateQuestModal] Registering Mission:', title);
-      const questResponse = await questsAPI.create(title, description);
-      const questId = questResponse.id;
-      
-      console.log('[CreateQuestModal] Registering Objectives...');
-      for (let i = 0; i < validCheckpoints.length; i++) {
-        await checkpointsAPI.create(questId, validCheckpoints[i], i + 1);
-      }
+      await questsAPI.create(title, description, validCheckpoints);
       
       setSuccess(true);
       console.log('[CreateQuestModal] MISSION_ACCEPTED! Showing animation...');
@@ -5,7 +5,7 @@ import {
   LogIn,
   Power
 } from 'lucide-react';
-import { spotifyAPI, userAPI } from '../api/api';
+import { spotifyAPI, userAPI, subscribeEvents } from '../api/api';
 import t from '../utils/i18n';
 import UserProfileModal from './UserProfileModal';
 
@@ -18,9 +18,13 @@ export default function Header({ themeColor, setThemeColor, onLogin, spotifyAuth
     // checkSpotifyAuth(); // Handled by parent
     loadStats();
     
-    // Refresh stats every 30s
-    const interval = setInterval(loadStats, 30000);
-    return () => clearInterval(interval);
+    // Refresh stats when XP, songs or quest status change
+    const unsubscribe = subscribeEvents({
+      xp_changed: loadStats,
+      music_tracked: loadStats,
+      quest_status_changed: loadStats
+    });
+    return () => unsubscribe();
   }, []);
 
   // Reload stats whenever profile is opened
@@ -1,31 +1,8 @@
 import { CheckSquare, Clock, ShieldCheck, ShieldAlert, Disc, Music, Zap, RefreshCw } from 'lucide-react';
 import t from '../utils/i18n';
-import { checkpointsAPI } from '../api/api';
-import { useState, useEffect } from 'react';
 
-export default function QuestCard({ quest, onClick }) {
-  const [stats, setStats] = useState(null); 
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    const fetchStats = async () => {
-      try {
-        setLoading(true);
-        const data = await checkpointsAPI.getByQuestId(quest.id);
-        
-        setStats(data)
-        
-      } catch (error) {
-        console.error('Error fetching stats:', error);
-        setStats(null);
-
-      } finally {
-        setLoading(false);
-      }
-    };
-    
-    fetchStats();
-  }, [quest.id]);
+export default function QuestCard({ quest, stats, onClick }) {
+  const loading = !stats;
 
   const totalCount = stats?.total_checkpoints || 0;
   const completedCount = stats?.completed_checkpoints || 0;
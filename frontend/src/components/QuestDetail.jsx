@@ -23,7 +23,7 @@ import {
   Dot
 } from 'lucide-react';
 import GameModal from './GameModal';
-import { questsAPI, checkpointsAPI, spotifyAPI, musicAPI } from '../api/api';
+import { questsAPI, checkpointsAPI, spotifyAPI, musicAPI, jobsAPI } from '../api/api';
 import t from '../utils/i18n';
 
 export default function QuestDetail({ 
@@ -36,9 +36,7 @@ export default function QuestDetail({
   syncedQuest,
   setSyncedQuest,
   syncedQuestData,
-  refreshSyncedQuestData,
-  lastTrackedUri,
-  setLastTrackedUri
+  refreshSyncedQuestData
 }) {
   const [questData, setQuestData] = useState(null);
   const [currentTrack, setCurrentTrack] = useState(null);
@@ -205,10 +203,14 @@ export default function QuestDetail({
             return;
           }
           
-          const uris = data.playlist.map(m => m.spotify_uri);
-          const result = await spotifyAPI.createPlaylist(`CodeQuest - ${quest.title}`, uris);
+          // Sync roda como job: espera terminar (envia só as faixas novas)
+          let job = await questsAPI.syncPlaylist(quest.id);
+          while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            job = await jobsAPI.get(job.id);
+          }
           
-          if (result.playlist_url) {
+          if (job.status === 'succeeded' && job.result?.playlist_url) {
             try {
               await questsAPI.retrieveLoot(quest.id);
               if (refreshSyncedQuestData) await refreshSyncedQuestData();
@@ -253,25 +255,11 @@ export default function QuestDetail({
         description: editDescription
       });
 
-      const originalIds = effectiveQuestData.checkpoints.map(c => c.id);
-      const currentIds = editCheckpoints.map(c => c.id).filter(id => id);
-      const toDelete = originalIds.filter(id => !currentIds.includes(id));
-
-      for (const id of toDelete) {
-        await checkpointsAPI.delete(id);
-      }
-
-      for (const [index, cp] of editCheckpoints.entries()) {
-        if (cp.id) {
-          await checkpointsAPI.update(cp.id, {
-            title: cp.title,
-            order_index: index + 1
-          });
-        } else {
-          // Create new
-          await checkpointsAPI.add(quest.id, cp.title, index + 1);
-        }
-      }
+      // Remove, renomeia, reordena e cria numa única chamada
+      await checkpointsAPI.replaceAll(
+        quest.id,
+        editCheckpoints.map(cp => (cp.id ? { id: cp.id, title: cp.title } : { title: cp.title }))
+      );
 
        setIsEditing(false);
        if (refreshSyncedQuestData) await refreshSyncedQuestData();